@@ -0,0 +1,9 @@
+# app_paths.py
+"""Đường dẫn dùng chung phía GUI, không kéo theo gói live_worker (vaccine_data nạp cả bảng dữ liệu lớn)."""
+import os
+import sys
+
+
+def get_base_path():
+    """Thư mục của file .exe khi đóng gói, thư mục mã nguồn gốc khi chạy từ source."""
+    return os.path.dirname(os.path.abspath(sys.argv[0] if hasattr(sys, 'frozen') else __file__))
@@ -0,0 +1,205 @@
+# batch_analyze.py
+"""
+Phân tích hàng loạt (không cần giao diện PySide6) các trang chi tiết VNCDC đã lưu.
+
+Ví dụ:
+    python batch_analyze.py ./saved_pages -o ket_qua.jsonl
+    python batch_analyze.py archive.zip -o ket_qua.csv --as-of page --workers 4
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from utils import VaccineAnalysisUtils
+from html_parser import HTMLVaccineParser
+from services.analysis_service import AnalysisService, imap_bounded
+from vaccine_record import VaccineRecord
+
+HTML_EXTENSIONS = (".html", ".htm", ".aspx")
+
+CSV_COLUMNS = ["source", "patient_name", "patient_dob", "description", "date", "status_tags", "due", "warning", "error"]
+
+
+def _is_html_name(name):
+    return name.lower().endswith(HTML_EXTENSIONS)
+
+
+def _decode(data):
+    if isinstance(data, str):
+        return data
+    return data.decode("utf-8", errors="replace")
+
+
+def iter_saved_pages(source):
+    """Yields (source_name, html_text) from a directory, a .zip or a tar archive."""
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for file_name in sorted(files):
+                if _is_html_name(file_name):
+                    path = os.path.join(root, file_name)
+                    with open(path, "rb") as f:
+                        yield os.path.relpath(path, source), _decode(f.read())
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and _is_html_name(info.filename):
+                    yield info.filename, _decode(archive.read(info))
+    elif tarfile.is_tarfile(source):
+        with tarfile.open(source) as archive:
+            for member in archive:
+                if member.isfile() and _is_html_name(member.name):
+                    yield member.name, _decode(archive.extractfile(member).read())
+    elif os.path.isfile(source):
+        with open(source, "rb") as f:
+            yield os.path.basename(source), _decode(f.read())
+    else:
+        raise FileNotFoundError(f"Không tìm thấy nguồn dữ liệu: {source}")
+
+
+# --- Worker process state (built once per process) ---
+_PARSER = None
+_SERVICE = None
+
+def _init_worker():
+    global _PARSER, _SERVICE
+    _PARSER = HTMLVaccineParser(VaccineAnalysisUtils.normalize_vaccine_name)
+    _SERVICE = AnalysisService()
+
+
+def _parse_date(date_str):
+    try:
+        return datetime.strptime(date_str.strip().replace(" ", ""), "%d/%m/%Y").date()
+    except (AttributeError, ValueError):
+        return None
+
+
+def analyze_page(job):
+    """Parses one saved detail page and runs the rule engine on it."""
+    source_name, html_text, as_of = job
+    record = {"source": source_name, "patient_name": None, "patient_dob": None,
+              "analysis_date": None, "administered_count": 0, "missing": [], "due": [], "warning": None, "error": None}
+    try:
+        _, display_list, patient_name, patient_dob_str, system_date_str, vaccine_err = _PARSER.parse(html_text)
+        record["patient_name"] = patient_name
+        record["patient_dob"] = patient_dob_str
+
+        if as_of == "page":
+            analysis_date = _parse_date(system_date_str) or AnalysisService.get_analysis_date()
+        else:
+            analysis_date = as_of
+        record["analysis_date"] = analysis_date.strftime("%d/%m/%Y")
+
+        raw_vaccine_list = [VaccineRecord.parse(name, dose, date_text) for name, dose, date_text in display_list]
+        raw_vaccine_list = [r for r in raw_vaccine_list if r is not None]
+        result = _SERVICE.analyze({"name": patient_name, "birth": patient_dob_str or ""}, raw_vaccine_list, analysis_date)
+
+        record["administered_count"] = len(result["administered"])
+        record["missing"] = [
+            {"description": m["description"], "date": m["date_str"], "status_tags": m["status_tags"]}
+            for m in result["missing"]
+        ]
+        record["due"] = [m["description"] for m in AnalysisService.get_due_items(result, analysis_date)]
+        record["warning"] = vaccine_err
+        record["error"] = result.get("error")
+    except Exception as e:
+        record["error"] = f"Lỗi xử lý trang: {e}"
+    return record
+
+
+def _write_jsonl(records, out):
+    for record in records:
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        yield record
+
+
+def _write_csv(records, out):
+    writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    for record in records:
+        base = {"source": record["source"], "patient_name": record["patient_name"],
+                "patient_dob": record["patient_dob"], "warning": record["warning"] or "",
+                "error": record["error"] or ""}
+        due = set(record["due"])
+        if not record["missing"]:
+            writer.writerow({**base, "description": "", "date": "", "status_tags": "", "due": ""})
+        for item in record["missing"]:
+            writer.writerow({**base, "description": item["description"], "date": item["date"],
+                             "status_tags": ";".join(item["status_tags"]),
+                             "due": "1" if item["description"] in due else ""})
+        yield record
+
+
+def run(source, output=None, fmt=None, as_of="today", workers=None, chunksize=8):
+    if as_of == "today":
+        as_of_value = AnalysisService.get_analysis_date()
+    elif as_of == "page":
+        as_of_value = "page"
+    else:
+        as_of_value = _parse_date(as_of)
+        if as_of_value is None:
+            raise ValueError(f"Ngày phân tích không hợp lệ (cần dd/mm/yyyy): {as_of}")
+
+    if fmt is None:
+        fmt = "csv" if output and output.lower().endswith(".csv") else "jsonl"
+
+    jobs = ((name, html_text, as_of_value) for name, html_text in iter_saved_pages(source))
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+
+    out = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+    started = time.perf_counter()
+    count = errors = 0
+    executor = None
+    try:
+        if workers <= 1:
+            _init_worker()
+            records = map(analyze_page, jobs)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+            # Đọc trang dần dần: tối đa 2 chunk mỗi tiến trình đang chờ/đang chạy (executor.map đọc hết trước)
+            records = imap_bounded(executor, analyze_page, jobs, chunksize, window=workers * 2)
+
+        writer = _write_csv if fmt == "csv" else _write_jsonl
+        for record in writer(records, out):
+            count += 1
+            if record["error"]:
+                errors += 1
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+        if output:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Đã phân tích {count} bệnh nhân ({errors} lỗi) trong {elapsed:.2f}s - {rate:.1f} bệnh nhân/giây", file=sys.stderr)
+    return count, errors, elapsed
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Phân tích hàng loạt các trang chi tiết VNCDC đã lưu (tblVacxin).")
+    arg_parser.add_argument("source", help="Thư mục, file .zip hoặc .tar(.gz) chứa các trang HTML đã lưu")
+    arg_parser.add_argument("-o", "--output", help="File kết quả (.jsonl hoặc .csv). Mặc định: stdout")
+    arg_parser.add_argument("-f", "--format", choices=["jsonl", "csv"], help="Định dạng kết quả (mặc định theo đuôi file)")
+    arg_parser.add_argument("--as-of", default="today",
+                            help="Ngày phân tích: 'today' (mặc định), 'page' (ngày hệ thống trong trang) hoặc dd/mm/yyyy")
+    arg_parser.add_argument("-w", "--workers", type=int, default=None, help="Số tiến trình (mặc định: số CPU, 1 = không song song)")
+    arg_parser.add_argument("--chunksize", type=int, default=8, help="Số trang gửi cho mỗi tiến trình một lần")
+    args = arg_parser.parse_args(argv)
+
+    try:
+        run(args.source, args.output, args.format, args.as_of, args.workers, args.chunksize)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
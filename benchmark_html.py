@@ -0,0 +1,211 @@
+# benchmark_html.py
+"""
+So sánh tốc độ trích xuất HTML của VNCDC: đường BeautifulSoup ban đầu với live_worker.html_extract (lxml).
+
+Đo 3 đường trên cùng các trang:
+- search:   bảng doiTuongSearchResult (utils.extract_subject_info vs html_extract.extract_subjects)
+- vaccines: bảng tblVacxin của worker (utils.extract_vaccine_info vs html_extract.extract_vaccines)
+- parser:   html_parser.HTMLVaccineParser.parse_bs4 vs parse (trang chi tiết)
+Kết quả của hai đường được so khớp; khác nhau -> exit code 1.
+
+Ví dụ:
+    python benchmark_html.py ./saved_pages -r 20
+    python benchmark_html.py --rows 40 --padding-kb 300 -o html_bench.json   # trang giả lập
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from bs4 import BeautifulSoup
+
+import config_data
+from batch_analyze import iter_saved_pages
+from html_parser import HTMLVaccineParser
+from live_worker import html_extract
+from live_worker.utils import extract_subject_info, extract_vaccine_info
+from utils import VaccineAnalysisUtils
+
+REPORT_VERSION = 1
+
+
+class _NullQueue:
+    def put(self, message):
+        pass
+
+
+# --- Đường BeautifulSoup ban đầu (như process_worker trước khi chuyển sang lxml) ---
+
+def bs4_extract_subjects(html_content):
+    soup = BeautifulSoup(html_content, 'lxml')
+    table = soup.find("table", id=html_extract.SEARCH_TABLE_ID)
+    if not table:
+        return None
+    subjects = []
+    for row_tag in table.find("tbody").find_all("tr"):
+        subject_info = extract_subject_info(row_tag, _NullQueue())
+        if subject_info and subject_info.get('id'):
+            subjects.append(subject_info)
+    return subjects
+
+
+def bs4_extract_vaccines(html_content):
+    soup = BeautifulSoup(html_content, 'lxml')
+    table = soup.find("table", id=html_extract.VACCINE_TABLE_ID)
+    if not table:
+        return None
+    vaccines = []
+    for row_tag in table.find("tbody").find_all("tr"):
+        vaccine_info = extract_vaccine_info(row_tag)
+        if vaccine_info:
+            vaccines.append(vaccine_info)
+    return vaccines
+
+
+# --- Trang giả lập ---
+
+_VACCINES = ["Hexaxim", "Rotateq", "Synflorix", "Vaxigrip Tetra", "MVVac", "Priorix", "Varivax", "Gardasil 9"]
+
+
+def _padding(rnd, kb):
+    """Phần thân trang không liên quan (menu, script, bảng khác) cho giống trang thật."""
+    chunks, size = [], 0
+    while size < kb * 1024:
+        chunk = (f'<div class="menu-item"><a href="/m/{rnd.randint(1, 9999)}">Mục {rnd.randint(1, 999)}</a>'
+                 f'<span class="sublabel">Nhãn</span></div>\n')
+        chunks.append(chunk)
+        size += len(chunk)
+    return "".join(chunks)
+
+
+def synthetic_search_page(rnd, rows, padding_kb):
+    body = "".join(
+        f'<tr data-id="{1680000 + i},0"><td>{i + 1}</td><td><b>Nguyễn Văn {i}</b></td><td>Nam</td>'
+        f'<td>Xã {i}</td><td>{rnd.randint(1950, 2024)}</td></tr>\n' for i in range(rows))
+    return (f'<html><head><title>Tìm kiếm</title></head><body>{_padding(rnd, padding_kb)}'
+            f'<table id="doiTuongSearchResult" class="table"><thead><tr><th>STT</th><th>Tên</th></tr></thead>'
+            f'<tbody>{body}</tbody></table>{_padding(rnd, padding_kb // 4)}</body></html>')
+
+
+def synthetic_detail_page(rnd, rows, padding_kb):
+    start = date(2020, 1, 1)
+    body = "".join(
+        f'<tr><td>{i + 1}</td><td>{rnd.choice(_VACCINES)}<span class="sublabel">(Dịch vụ)</span></td>'
+        f'<td>{rnd.randint(1, 4)}</td><td>Cơ sở</td>'
+        f'<td>{(start + timedelta(days=30 * i)).strftime("%d/%m/%Y")}</td></tr>\n' for i in range(rows))
+    inputs = (f'<input id="{config_data.HTML_PATIENT_NAME_ID}" value=" Trần Thị B " />'
+              f'<input id="{config_data.HTML_PATIENT_DOB_ID}" value="01/02/2019" />'
+              f'<input id="{config_data.HTML_SYSTEM_DATE_ID}" value="15/10/2026" />')
+    return (f'<html><head><title>Chi tiết</title></head><body>{inputs}{_padding(rnd, padding_kb)}'
+            f'<table id="{config_data.HTML_VACCINE_TABLE_ID}"><thead><tr><th>STT</th></tr></thead>'
+            f'<tbody>{body}</tbody></table>{_padding(rnd, padding_kb // 4)}</body></html>')
+
+
+def synthetic_pages(count, rows, padding_kb, seed=0):
+    rnd = random.Random(seed)
+    pages = []
+    for i in range(count):
+        pages.append((f"synthetic_search_{i}", synthetic_search_page(rnd, rows, padding_kb)))
+        pages.append((f"synthetic_detail_{i}", synthetic_detail_page(rnd, rows, padding_kb)))
+    return pages
+
+
+# --- Đo ---
+
+def _time(func, html_content, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(html_content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None or elapsed < best else best
+    return best, result
+
+
+def run_benchmark(pages, repeat=10):
+    parser = HTMLVaccineParser(VaccineAnalysisUtils.normalize_vaccine_name)
+    paths = {
+        "search": (bs4_extract_subjects, html_extract.extract_subjects, html_extract.SEARCH_TABLE_ID),
+        "vaccines": (bs4_extract_vaccines, html_extract.extract_vaccines, html_extract.VACCINE_TABLE_ID),
+        "parser": (parser.parse_bs4, parser.parse, config_data.HTML_VACCINE_TABLE_ID),
+    }
+    totals = {name: {"pages": 0, "bs4_ms": 0.0, "lxml_ms": 0.0, "mismatches": []} for name in paths}
+    total_bytes = 0
+
+    for source, html_content in pages:
+        total_bytes += len(html_content)
+        for name, (slow, fast, marker) in paths.items():
+            if marker not in html_content:
+                continue
+            slow_time, slow_result = _time(slow, html_content, repeat)
+            fast_time, fast_result = _time(fast, html_content, repeat)
+            entry = totals[name]
+            entry["pages"] += 1
+            entry["bs4_ms"] += slow_time * 1000
+            entry["lxml_ms"] += fast_time * 1000
+            if slow_result != fast_result:
+                entry["mismatches"].append(source)
+
+    for entry in totals.values():
+        pages_count = entry["pages"] or 1
+        entry["bs4_ms_per_page"] = round(entry["bs4_ms"] / pages_count, 4)
+        entry["lxml_ms_per_page"] = round(entry["lxml_ms"] / pages_count, 4)
+        entry["speedup"] = round(entry["bs4_ms"] / entry["lxml_ms"], 2) if entry["lxml_ms"] else None
+        entry["bs4_ms"] = round(entry["bs4_ms"], 4)
+        entry["lxml_ms"] = round(entry["lxml_ms"], 4)
+
+    return {
+        "version": REPORT_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"pages": len(pages), "repeat": repeat, "total_kb": round(total_bytes / 1024, 1)},
+        "paths": totals,
+    }
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="So sánh trích xuất HTML VNCDC: BeautifulSoup vs lxml.")
+    arg_parser.add_argument("sources", nargs="*", help="Thư mục / .zip / .tar.gz / file HTML đã lưu. Bỏ trống: dùng trang giả lập")
+    arg_parser.add_argument("-r", "--repeat", type=int, default=10, help="Số lần đo mỗi trang (lấy lần nhanh nhất)")
+    arg_parser.add_argument("--pages", type=int, default=5, help="Số trang giả lập mỗi loại")
+    arg_parser.add_argument("--rows", type=int, default=20, help="Số hàng mỗi bảng giả lập")
+    arg_parser.add_argument("--padding-kb", type=int, default=200, help="Dung lượng phần trang không liên quan (KB)")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("-o", "--output", help="Ghi báo cáo JSON ra file (mặc định: stdout)")
+    args = arg_parser.parse_args(argv)
+
+    if args.sources:
+        pages = [page for source in args.sources for page in iter_saved_pages(source)]
+    else:
+        pages = synthetic_pages(args.pages, args.rows, args.padding_kb, args.seed)
+    if not pages:
+        print("Không có trang HTML nào để đo.", file=sys.stderr)
+        return 2
+
+    report = run_benchmark(pages, args.repeat)
+    mismatched = False
+    for name, entry in report["paths"].items():
+        if not entry["pages"]:
+            continue
+        print(f"[{name}] {entry['pages']} trang - bs4 {entry['bs4_ms_per_page']:.3f} ms/trang, "
+              f"lxml {entry['lxml_ms_per_page']:.3f} ms/trang (x{entry['speedup']})", file=sys.stderr)
+        for source in entry["mismatches"]:
+            mismatched = True
+            print(f"KHÁC KẾT QUẢ: [{name}] {source}", file=sys.stderr)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
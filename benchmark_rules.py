@@ -0,0 +1,319 @@
+# benchmark_rules.py
+"""
+Benchmark bộ máy quy tắc (process_all_vaccine_rules + apply_spacing_and_sort) với dữ liệu giả lập.
+
+Mỗi kịch bản sinh lịch sử tiêm giả lập có thể lặp lại (theo seed), đo thời gian toàn bộ
+phân tích và đo riêng từng checker trong series_checkers, group_checkers_alternative,
+group_checkers_special. Kết quả ghi ra JSON để so sánh giữa các lần chạy.
+
+Ví dụ:
+    python benchmark_rules.py -n 300 -o bench.json
+    python benchmark_rules.py -n 300 --baseline bench.json --tolerance 0.25
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from utils import VaccineAnalysisUtils
+from rule_checker_utils import AdministeredIndex
+from rule_processor import process_all_vaccine_rules
+from post_processor import apply_spacing_and_sort
+from services.analysis_service import AnalysisService
+
+REPORT_VERSION = 1
+CHECKER_MODULES = ("series_checkers", "group_checkers_alternative", "group_checkers_special")
+
+
+# --- Sinh dữ liệu giả lập ---
+
+def _record(name, dose, when):
+    return {"vaccine_name": name, "dose": str(dose), "date": when.strftime("%d/%m/%Y")}
+
+
+def _series(rnd, name, dob, ages_days, analysis_date, dropout=0.1):
+    """Các mũi của một phác đồ tại các tuổi (ngày) cho trước, dừng ngẫu nhiên hoặc khi vượt ngày phân tích."""
+    records = []
+    for dose, age_days in enumerate(ages_days, start=1):
+        when = dob + timedelta(days=age_days + rnd.randint(-3, 14))
+        if when > analysis_date or rnd.random() < dropout:
+            break
+        records.append(_record(name, dose, when))
+    return records
+
+
+def gen_infant(rnd, analysis_date):
+    """Trẻ 2-24 tháng: 6in1, Rota, phế cầu, đôi khi MVVAC."""
+    dob = analysis_date - timedelta(days=rnd.randint(60, 730))
+    records = []
+    records += _series(rnd, rnd.choice(["Infanrix Hexa", "Hexaxim", "DPT-VGB-HIB (SII)"]), dob, [60, 90, 120, 540], analysis_date)
+    records += _series(rnd, rnd.choice(["Rota Teq", "Rotarix 1.5ml", "Rotavin-M1"]), dob, [60, 90, 120], analysis_date)
+    records += _series(rnd, rnd.choice(["Prevenar 13", "Synflorix", "Vaxneuvance"]), dob, [60, 120, 180, 365], analysis_date)
+    records += _series(rnd, "MVVAC", dob, [270], analysis_date, dropout=0.3)
+    return dob, records
+
+
+def gen_adult_flu(rnd, analysis_date):
+    """Người lớn 18-80 tuổi: cúm nhắc lại hằng năm, đôi khi Pneumovax 23."""
+    dob = analysis_date - timedelta(days=rnd.randint(18 * 365, 80 * 365))
+    records = []
+    years = rnd.randint(0, 8)
+    for i in range(years):
+        when = analysis_date - timedelta(days=365 * (years - i) + rnd.randint(-30, 30))
+        records.append(_record(rnd.choice(["Vaxigrip Tetra 0.5ml", "Influvac Tetra 2023/2024", "GC Flu"]), i + 1, when))
+    if rnd.random() < 0.3:
+        records.append(_record("PNEUMO 23", 1, analysis_date - timedelta(days=rnd.randint(30, 2000))))
+    return dob, records
+
+
+def gen_pneumo_mixed(rnd, analysis_date):
+    """Trẻ 6 tháng-6 tuổi tiêm phế cầu, có thể xen kẽ nhiều loại hoặc đã tiêm Pneumovax 23."""
+    dob = analysis_date - timedelta(days=rnd.randint(180, 6 * 365))
+    records = []
+    kinds = rnd.sample(["Prevenar 13", "Synflorix", "Vaxneuvance"], rnd.choice([1, 1, 2, 3]))
+    for dose, age_days in enumerate([60, 120, 180, 365], start=1):
+        when = dob + timedelta(days=age_days + rnd.randint(0, 30))
+        if when > analysis_date or rnd.random() < 0.15:
+            break
+        records.append(_record(rnd.choice(kinds), dose, when))
+    if rnd.random() < 0.2 and (analysis_date - dob).days > 2 * 365:
+        records.append(_record("Pneumovax 23", 1, analysis_date - timedelta(days=rnd.randint(1, 180))))
+    return dob, records
+
+
+def gen_mvvac_mmr(rnd, analysis_date):
+    """Trẻ 9 tháng-10 tuổi: MVVAC, MMR-II/Priorix, thủy đậu."""
+    dob = analysis_date - timedelta(days=rnd.randint(270, 10 * 365))
+    records = []
+    records += _series(rnd, "MVVAC", dob, [270], analysis_date, dropout=0.2)
+    records += _series(rnd, rnd.choice(["MMR-II", "Priorix", "MMR II & Diluent inj 0.5ml"]), dob, [365, 365 * 4], analysis_date, dropout=0.2)
+    records += _series(rnd, rnd.choice(["Varivax", "Varilrix"]), dob, [365, 365 * 4], analysis_date, dropout=0.3)
+    return dob, records
+
+
+SCENARIOS = {
+    "infant": gen_infant,
+    "adult_flu": gen_adult_flu,
+    "pneumo_mixed": gen_pneumo_mixed,
+    "mvvac_mmr": gen_mvvac_mmr,
+}
+
+# Tên dùng để làm dài lịch sử (--extra-records), mô phỏng bệnh nhân có nhiều lần tiêm khác
+FILLER_NAMES = ["Typhim Vi", "MENACTRA", "VA - MENGOC - BC", "Avaxim 80U", "HAVAX", "Imojev", "JEEV 3mcg/0,5ml", "Morcvax"]
+
+
+def generate_patients(scenario, count, analysis_date, seed=0, extra_records=0):
+    """Sinh `count` bệnh nhân (patient_info, raw_vaccine_list) cho một kịch bản, ổn định theo seed."""
+    generator = SCENARIOS[scenario]
+    patients = []
+    for i in range(count):
+        rnd = random.Random(f"{scenario}:{seed}:{i}")
+        dob, records = generator(rnd, analysis_date)
+        age_days = max((analysis_date - dob).days, 1)
+        for _ in range(extra_records):
+            when = dob + timedelta(days=rnd.randint(0, age_days))
+            records.append(_record(rnd.choice(FILLER_NAMES), rnd.randint(1, 3), when))
+        rnd.shuffle(records)
+        patients.append(({"name": f"{scenario}-{i}", "birth": dob.strftime("%d/%m/%Y")}, records))
+    return patients
+
+
+# --- Đo thời gian ---
+
+def build_administered_map(raw_vaccine_list):
+    """Giống bước 2 của AnalysisService.analyze: gom bản ghi theo tên chuẩn hóa, sắp theo ngày."""
+    administered_map = defaultdict(list)
+    for record in raw_vaccine_list:
+        name, dose_text, date_text = record["vaccine_name"], record["dose"], record["date"]
+        try:
+            dose_int = int(dose_text)
+        except ValueError:
+            dose_int = 0
+        date_obj = datetime.strptime(date_text, "%d/%m/%Y").date()
+        administered_map[VaccineAnalysisUtils.normalize_vaccine_name(name)].append((dose_int, date_obj, name, dose_text, date_text))
+    for records in administered_map.values():
+        records.sort(key=lambda x: x[1])
+    return administered_map
+
+
+def _stats_ms(samples):
+    """Tổng hợp thời gian (giây) -> ms."""
+    if not samples:
+        return {"count": 0, "total_ms": 0.0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(samples)
+    p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+    return {
+        "count": len(ordered),
+        "total_ms": round(sum(ordered) * 1000, 4),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 6),
+        "p50_ms": round(statistics.median(ordered) * 1000, 6),
+        "p95_ms": round(ordered[p95_index] * 1000, 6),
+        "max_ms": round(ordered[-1] * 1000, 6),
+    }
+
+
+def run_scenario(service, patients, analysis_date, repeat=3):
+    """
+    Đo một kịch bản: thời gian toàn bộ analyze(), riêng process_all_vaccine_rules, riêng
+    apply_spacing_and_sort, và từng checker (gọi trực tiếp theo thứ tự của RulePlan).
+    """
+    plan = service.rule_plan
+    prepared = []
+    for patient_info, raw_vaccine_list in patients:
+        dob = datetime.strptime(patient_info["birth"], "%d/%m/%Y").date()
+        prepared.append((patient_info, raw_vaccine_list, dob, build_administered_map(raw_vaccine_list)))
+
+    analyze_samples, rules_samples, spacing_samples = [], [], []
+    checker_samples = defaultdict(list)
+    checker_items = defaultdict(int)
+
+    for _ in range(repeat):
+        for patient_info, raw_vaccine_list, dob, administered_map in prepared:
+            start = time.perf_counter()
+            service.analyze(patient_info, raw_vaccine_list, analysis_date)
+            analyze_samples.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            missing_raw = process_all_vaccine_rules(administered_map, plan, dob, analysis_date)
+            rules_samples.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            apply_spacing_and_sort(missing_raw, administered_map, service.vaccine_rules, analysis_date, live_index=service.live_index)
+            spacing_samples.append(time.perf_counter() - start)
+
+            # Index mới (cache trống) để mỗi checker tự chịu chi phí gộp bản ghi như khi chạy thật
+            checker_index = AdministeredIndex(administered_map)
+            for rule_key, rule_details, checker in plan.checkers:
+                if checker is None:
+                    continue
+                missing_items = []
+                start = time.perf_counter()
+                checker(rule_key, rule_details, checker_index, missing_items, dob, analysis_date, plan.rules)
+                checker_samples[(checker.__module__, checker.__name__, rule_key)].append(time.perf_counter() - start)
+                checker_items[(checker.__module__, checker.__name__, rule_key)] += len(missing_items)
+
+    checkers = []
+    by_module = defaultdict(float)
+    for (module, func_name, rule_key), samples in checker_samples.items():
+        entry = {"module": module, "checker": func_name, "rule_key": rule_key,
+                 "items_appended": checker_items[(module, func_name, rule_key)]}
+        entry.update(_stats_ms(samples))
+        checkers.append(entry)
+        by_module[module] += entry["total_ms"]
+    checkers.sort(key=lambda e: e["total_ms"], reverse=True)
+
+    return {
+        "patients": len(prepared),
+        "records": sum(len(p[1]) for p in prepared),
+        "analyze": _stats_ms(analyze_samples),
+        "process_all_vaccine_rules": _stats_ms(rules_samples),
+        "apply_spacing_and_sort": _stats_ms(spacing_samples),
+        "modules_total_ms": {m: round(by_module.get(m, 0.0), 4) for m in CHECKER_MODULES},
+        "checkers": checkers,
+    }
+
+
+def run_benchmark(scenarios=None, patients=200, repeat=3, seed=0, extra_records=0, analysis_date=None):
+    service = AnalysisService()
+    if service.rule_plan is None:
+        raise RuntimeError("Không khởi tạo được quy tắc vắc-xin.")
+    analysis_date = analysis_date or date.today()
+    scenarios = scenarios or list(SCENARIOS)
+
+    report = {
+        "version": REPORT_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "analysis_date": analysis_date.isoformat(),
+        "params": {"patients": patients, "repeat": repeat, "seed": seed, "extra_records": extra_records},
+        "rule_count": len(service.rule_plan.rule_keys),
+        "rule_keys": list(service.rule_plan.rule_keys),
+        "scenarios": {},
+    }
+    for scenario in scenarios:
+        generated = generate_patients(scenario, patients, analysis_date, seed, extra_records)
+        report["scenarios"][scenario] = run_scenario(service, generated, analysis_date, repeat)
+    return report
+
+
+def compare_reports(current, baseline, tolerance=0.25):
+    """Trả về danh sách (kịch bản, chỉ số, baseline_ms, current_ms) bị chậm hơn baseline quá `tolerance`."""
+    regressions = []
+    for scenario, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(scenario)
+        if not base:
+            continue
+        for metric in ("analyze", "process_all_vaccine_rules", "apply_spacing_and_sort"):
+            old, new = base[metric]["mean_ms"], result[metric]["mean_ms"]
+            if old > 0 and new > old * (1 + tolerance):
+                regressions.append((scenario, metric, old, new))
+        old_checkers = {(c["checker"], c["rule_key"]): c for c in base.get("checkers", [])}
+        for entry in result["checkers"]:
+            old_entry = old_checkers.get((entry["checker"], entry["rule_key"]))
+            # Bỏ qua các checker quá nhanh: nhiễu đo lớn hơn chênh lệch thật
+            if old_entry and old_entry["mean_ms"] >= 0.005 and entry["mean_ms"] > old_entry["mean_ms"] * (1 + tolerance):
+                regressions.append((scenario, f"{entry['checker']}[{entry['rule_key']}]", old_entry["mean_ms"], entry["mean_ms"]))
+    return regressions
+
+
+def _print_summary(report, out=sys.stderr):
+    for scenario, result in report["scenarios"].items():
+        print(f"[{scenario}] {result['patients']} bệnh nhân, {result['records']} mũi - "
+              f"analyze {result['analyze']['mean_ms']:.3f} ms/bn (p95 {result['analyze']['p95_ms']:.3f}), "
+              f"rules {result['process_all_vaccine_rules']['mean_ms']:.3f}, "
+              f"spacing {result['apply_spacing_and_sort']['mean_ms']:.3f}", file=out)
+        for entry in result["checkers"][:3]:
+            print(f"    {entry['checker']}[{entry['rule_key']}]: {entry['mean_ms']:.4f} ms/lần", file=out)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark bộ máy quy tắc vắc-xin với dữ liệu giả lập.")
+    arg_parser.add_argument("-s", "--scenario", action="append", choices=list(SCENARIOS),
+                            help="Kịch bản cần chạy (lặp lại để chọn nhiều). Mặc định: tất cả")
+    arg_parser.add_argument("-n", "--patients", type=int, default=200, help="Số bệnh nhân mỗi kịch bản")
+    arg_parser.add_argument("-r", "--repeat", type=int, default=3, help="Số lần lặp lại mỗi bệnh nhân")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--extra-records", type=int, default=0, help="Thêm N mũi tiêm khác vào mỗi lịch sử")
+    arg_parser.add_argument("--as-of", help="Ngày phân tích dd/mm/yyyy (mặc định: hôm nay)")
+    arg_parser.add_argument("-o", "--output", help="Ghi báo cáo JSON ra file (mặc định: stdout)")
+    arg_parser.add_argument("--baseline", help="Báo cáo JSON trước đó để so sánh")
+    arg_parser.add_argument("--tolerance", type=float, default=0.25, help="Mức chậm hơn cho phép so với baseline (0.25 = 25%%)")
+    args = arg_parser.parse_args(argv)
+
+    analysis_date = None
+    if args.as_of:
+        try:
+            analysis_date = datetime.strptime(args.as_of, "%d/%m/%Y").date()
+        except ValueError:
+            print(f"Lỗi: ngày phân tích không hợp lệ: {args.as_of}", file=sys.stderr)
+            return 2
+
+    report = run_benchmark(args.scenario, args.patients, args.repeat, args.seed, args.extra_records, analysis_date)
+    _print_summary(report)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, args.tolerance)
+        for scenario, metric, old, new in regressions:
+            print(f"CHẬM HƠN: [{scenario}] {metric}: {old:.4f} -> {new:.4f} ms", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
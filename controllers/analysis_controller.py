@@ -1,17 +1,23 @@
 import os
 from datetime import date, timedelta
 from PySide6.QtCore import Slot, Qt, QUrl
-from PySide6.QtWidgets import QListWidgetItem, QTableWidgetItem, QMessageBox
-from PySide6.QtGui import QColor, QBrush, QDesktopServices, QFont
-import qtawesome as qta
+from PySide6.QtWidgets import QListWidgetItem, QMessageBox
+from PySide6.QtGui import QDesktopServices
 
 from ui_pyside.toast import ToastNotification
+from ui_pyside.analysis_table_models import ROW_DATA_ROLE
 from ui_pyside.add_vaccine_dialog import AddVaccineDialog
 from .base_controller import BaseController
 
+# Số đối tượng tối đa được tải trước lịch sử sau một lần tìm SĐT
+PREFETCH_LIMIT = 10
+
 class AnalysisController(BaseController):
     def __init__(self, main_controller):
         super().__init__(main_controller)
+        # Tải trước lịch sử các đối tượng cùng SĐT: doi_tuong_id -> {"info": subject, "result": kết quả phân tích}
+        self.prefetched = {}
+        self.shown_patient_id = None
 
     def setup_connections(self):
         # Note: view_history_btn and add_vaccine_btn were removed from UI
@@ -26,6 +32,14 @@ class AnalysisController(BaseController):
         
         self.services['worker'].signals.vaccines_loaded.connect(self.on_vaccines_loaded)
         self.services['worker'].signals.add_vaccine_failed.connect(self.on_add_vaccine_failed)
+        self.services['worker'].signals.history_failed.connect(self.on_history_failed)
+        # Cache lịch sử: ghi mọi lần tải thành công, xoá khi vừa thêm mũi tiêm
+        self.services['worker'].signals.history_loaded.connect(self.services['history_cache'].put)
+        self.services['worker'].signals.vaccine_added.connect(self.services['history_cache'].invalidate)
+        self.services['worker'].signals.history_loaded.connect(self.on_history_prefetched)
+        self.services['worker'].signals.vaccine_added.connect(self.on_vaccine_added)
+        self.services['worker'].signals.history_stale.connect(self.services['history_cache'].invalidate)
+        self.services['worker'].signals.history_stale.connect(self.on_vaccine_added)
 
     @Slot(QListWidgetItem)
     def handle_list_double_click(self, item):
@@ -36,23 +50,107 @@ class AnalysisController(BaseController):
         if not self.state['current_patient_id']:
             ToastNotification.show_message(self.view, "Chưa chọn đối tượng.", type="warning")
             return
-        self.view.analysis_tab.set_loading(True, "Đang tải dữ liệu tiêm chủng...")
-        self.state['last_failed_task'] = {"type": "get_vaccines", "payload": {"doi_tuong_id": self.state['current_patient_id']}}
-        self.services['worker'].request_history(self.state['current_patient_id'])
+        patient_id = self.state['current_patient_id']
+        self.state['shown_history'] = None
+        cached = self.services['history_cache'].get(patient_id)
+        if cached is not None and self.state['current_patient_info']:
+            # Hiện ngay kết quả từ cache, worker vẫn tải bản mới ở nền để cập nhật
+            records, age = cached
+            self.main.on_worker_log(f"Dùng lịch sử đã lưu của ID {patient_id} ({int(age // 60)} phút trước), đang làm mới...")
+            self.show_analysis(records, notify=False)
+            self.state['shown_history'] = records
+        else:
+            self.view.analysis_tab.set_loading(True, "Đang tải dữ liệu tiêm chủng...")
+        self.state['last_failed_task'] = {"type": "get_vaccines", "payload": {"doi_tuong_id": patient_id}}
+        self.services['worker'].request_history(patient_id)
 
     @Slot(list)
     def on_vaccines_loaded(self, vaccine_list):
         self.view.analysis_tab.set_loading(False)
+        self.main.clear_failed_task("get_vaccines")
         # Note: view_history_btn was removed from UI
-        
+
+        shown = self.state['shown_history']
+        self.state['shown_history'] = None
+        if shown is not None and list(shown) == list(vaccine_list):
+            # Bản tải mới không khác cache đang hiển thị: không phân tích lại
+            return
+        self.show_analysis(vaccine_list)
+
+    def show_analysis(self, vaccine_list, notify=True):
         if self.state['current_patient_info']:
-            result = self.services['analysis'].analyze(self.state['current_patient_info'], vaccine_list)
+            profile = self.view.debug_tab.profile_checkbox.isChecked()
+            result = self.services['analysis'].analyze(self.state['current_patient_info'], vaccine_list, profile=profile)
             self.state['analysis_results'] = result
+            self.shown_patient_id = self.state['current_patient_id']
+            if self.shown_patient_id in self.prefetched:
+                self.prefetched[self.shown_patient_id]["result"] = result
             if result.get("error"):
                 ToastNotification.show_message(self.view, result["error"], type="error")
             else:
                 self.update_ui_with_results(result)
-                ToastNotification.show_message(self.view, "Đã phân tích dữ liệu.", type="success")
+                if notify:
+                    ToastNotification.show_message(self.view, "Đã phân tích dữ liệu.", type="success")
+
+    # --- Tải trước lịch sử (bật trong tab Cấu hình) ---
+    def prefetch_histories(self, subjects):
+        """Tải (qua worker, tác vụ nền) và phân tích sẵn lịch sử của các đối tượng cùng SĐT."""
+        for subject in subjects[:PREFETCH_LIMIT]:
+            subject_id = subject.get('id')
+            if not subject_id or subject_id in self.prefetched:
+                continue
+            self.prefetched[subject_id] = {"info": subject, "result": None}
+            cached = self.services['history_cache'].get(subject_id)
+            if cached is not None:
+                self._analyze_prefetched(subject_id, cached[0])
+            else:
+                self.services['worker'].request_history(subject_id, background=True)
+
+    def clear_prefetch(self):
+        self.services['worker'].cancel_background()
+        self.prefetched.clear()
+
+    def _analyze_prefetched(self, subject_id, vaccine_list):
+        entry = self.prefetched[subject_id]
+        entry["result"] = self.services['analysis'].analyze(entry["info"], vaccine_list)
+
+    def show_prefetched(self, subject_id):
+        """Hiện kết quả đã phân tích sẵn của đối tượng; False nếu chưa có."""
+        entry = self.prefetched.get(subject_id)
+        if not entry or not entry["result"] or entry["result"].get("error"):
+            return False
+        self.state['analysis_results'] = entry["result"]
+        self.shown_patient_id = subject_id
+        self.update_ui_with_results(entry["result"])
+        return True
+
+    @Slot(str, list, bool)
+    def on_history_prefetched(self, subject_id, vaccine_list, empty_table=False):
+        entry = self.prefetched.get(subject_id)
+        if entry is None or entry["result"] is not None:
+            return
+        self._analyze_prefetched(subject_id, vaccine_list)
+        # Người dùng đã chọn đối tượng này trong lúc đang tải trước: hiện luôn
+        if subject_id == self.state['current_patient_id'] and self.shown_patient_id != subject_id:
+            self.show_prefetched(subject_id)
+
+    @Slot(str)
+    def on_vaccine_added(self, subject_id):
+        # Đã (hoặc có thể đã) thêm xong: không bao giờ tự gửi lại lần thêm này
+        self.main.clear_failed_task("add_vaccine")
+        # Kết quả phân tích sẵn đã cũ; lần tải lại sau khi thêm mũi tiêm sẽ điền lại
+        if subject_id in self.prefetched:
+            self.prefetched[subject_id]["result"] = None
+
+    @Slot(str, str)
+    def on_history_failed(self, doi_tuong_id, message):
+        self.view.analysis_tab.set_loading(False)
+        if self.state['shown_history'] is not None:
+            # Vẫn giữ kết quả từ cache trên màn hình
+            self.state['shown_history'] = None
+            ToastNotification.show_message(self.view, "Không làm mới được lịch sử, đang hiển thị dữ liệu đã lưu.", type="warning")
+        else:
+            ToastNotification.show_message(self.view, f"Lỗi tải lịch sử tiêm: {message}", type="error")
 
     def update_ui_with_results(self, data):
         admin_list = data.get("administered", [])
@@ -60,84 +158,9 @@ class AnalysisController(BaseController):
         
         # Profile status update removed - profile panel was eliminated
 
-        # --- Update Administered Table (History) ---
-        self.view.analysis_tab.admin_table.setSortingEnabled(False) # Optimize reload
-        self.view.analysis_tab.admin_table.setRowCount(len(admin_list))
-        
-        brush_secondary = QBrush(QColor("#334155")) # Slate 700 for text
-        brush_dim = QBrush(QColor("#64748B"))       # Slate 500 for date/dose
-        
-        for row, item in enumerate(admin_list):
-            name_item = QTableWidgetItem(str(item['name']))
-            name_item.setData(Qt.ItemDataRole.UserRole, item)
-            name_item.setForeground(brush_secondary)
-            name_item.setIcon(qta.icon('fa5s.check-circle', color='#10B981')) # Green Check
-            
-            dose_item = QTableWidgetItem(str(item['dose']))
-            dose_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            dose_item.setForeground(brush_dim)
-            
-            date_item = QTableWidgetItem(str(item['date']))
-            date_item.setForeground(brush_dim)
-            date_item.setIcon(qta.icon('fa5s.calendar-alt', color='#94A3B8'))
-            
-            self.view.analysis_tab.admin_table.setItem(row, 0, name_item)
-            self.view.analysis_tab.admin_table.setItem(row, 1, dose_item)
-            self.view.analysis_tab.admin_table.setItem(row, 2, date_item)
-        
-        self.view.analysis_tab.admin_table.setSortingEnabled(True)
-
-        # --- Update Missing Table (Action Plan) ---
-        self.view.analysis_tab.missing_table.setSortingEnabled(False)
-        self.view.analysis_tab.missing_table.setRowCount(len(missing_list))
-        
-        bold_font = QFont()
-        bold_font.setBold(True)
-        
-        for row, item in enumerate(missing_list):
-            desc_text = str(item['description'])
-            date_str = str(item['date_str'])
-            tags = item.get("status_tags", [])
-            color_group = self.services['data'].get_status_tags_for_missing_item(tags)
-            
-            # Detailed Semantic Mapping
-            if "due" in tags:
-                # Urgent/Due -> Bold Blue
-                color_code = "#0284C7" # Sky 600
-                icon_name = "fa5s.syringe"
-                is_bold = True
-            elif "warning" == color_group:
-                # Warning -> Amber
-                color_code = "#D97706" # Amber 600
-                icon_name = "fa5s.exclamation-triangle"
-                is_bold = False
-            elif any(t.startswith("error") for t in tags):
-                # Error -> Red
-                color_code = "#DC2626" # Red 600
-                icon_name = "fa5s.times-circle"
-                is_bold = False
-            else:
-                # Info/Future -> Slate
-                color_code = "#475569" # Slate 600
-                icon_name = "fa5s.clock"
-                is_bold = False
-            
-            desc_item = QTableWidgetItem(desc_text)
-            desc_item.setIcon(qta.icon(icon_name, color=color_code))
-            desc_item.setForeground(QBrush(QColor(color_code)))
-            if is_bold: desc_item.setFont(bold_font)
-            
-            date_item = QTableWidgetItem(date_str)
-            date_item.setForeground(QBrush(QColor(color_code)))
-            if is_bold: date_item.setFont(bold_font)
-            
-            desc_item.setToolTip(desc_text)
-            
-            desc_item.setData(Qt.ItemDataRole.UserRole, item)
-            self.view.analysis_tab.missing_table.setItem(row, 0, desc_item)
-            self.view.analysis_tab.missing_table.setItem(row, 1, date_item)
-            
-        self.view.analysis_tab.missing_table.setSortingEnabled(True)
+        # --- Update tables: models over the result dicts, icons/brushes come from the shared cache ---
+        self.view.analysis_tab.admin_model.set_rows(admin_list)
+        self.view.analysis_tab.missing_model.set_rows(missing_list)
             
         self.view.analysis_tab.admin_search.clear()
         self.view.analysis_tab.missing_search.clear()
@@ -160,20 +183,14 @@ class AnalysisController(BaseController):
     @Slot(str)
     def on_add_vaccine_failed(self, message):
         self.view.analysis_tab.set_loading(False)
+        # Người dùng tự quyết định thêm lại (có thể mũi tiêm đã được lưu, xem LOST_ADD_MESSAGE)
+        self.main.clear_failed_task("add_vaccine")
         ToastNotification.show_message(self.view, f"Lỗi thêm mũi tiêm: {message}", type="error")
 
     @Slot(str)
     def on_admin_search_changed(self, text):
         term = self.services['data'].remove_vietnamese_accents(text.strip().lower())
-        table = self.view.analysis_tab.admin_table
-        for i in range(table.rowCount()):
-            item = table.item(i, 0)
-            should_show = True
-            if item:
-                cell_text = self.services['data'].remove_vietnamese_accents(item.text().lower())
-                if term and term not in cell_text:
-                    should_show = False
-            table.setRowHidden(i, not should_show)
+        self.view.analysis_tab.admin_proxy.set_search_term(term)
 
     @Slot(str)
     def on_missing_search_changed(self, text):
@@ -181,19 +198,7 @@ class AnalysisController(BaseController):
 
     def refresh_missing_table_visibility(self):
         search_term = self.services['data'].remove_vietnamese_accents(self.view.analysis_tab.missing_search.text().strip().lower())
-        table = self.view.analysis_tab.missing_table
-        
-        for i in range(table.rowCount()):
-            item = table.item(i, 0)
-            if not item: continue
-            
-            visible_by_search = True
-            if search_term:
-                cell_text = self.services['data'].remove_vietnamese_accents(item.text().lower())
-                if search_term not in cell_text:
-                    visible_by_search = False
-            
-            table.setRowHidden(i, not visible_by_search)
+        self.view.analysis_tab.missing_proxy.set_search_term(search_term)
 
     @Slot()
     def handle_export_vaccinated(self):
@@ -201,14 +206,8 @@ class AnalysisController(BaseController):
             ToastNotification.show_message(self.view, "Không có dữ liệu đã tiêm để xuất.", type="warning")
             return
             
-        items_to_export = []
-        table = self.view.analysis_tab.admin_table
-        for r in range(table.rowCount()):
-            if not table.isRowHidden(r):
-                item = table.item(r, 0)
-                if item:
-                    data = item.data(Qt.ItemDataRole.UserRole)
-                    if data: items_to_export.append(data)
+        # Các dòng đang hiển thị (sau lọc), theo thứ tự đang sắp xếp
+        items_to_export = [data for data in self.view.analysis_tab.admin_proxy.visible_row_data() if data]
         
         if not items_to_export:
              ToastNotification.show_message(self.view, "Danh sách trống.", type="warning")
@@ -238,13 +237,10 @@ class AnalysisController(BaseController):
         
         if selected_rows:
             for index in selected_rows:
-                item_data = self.view.analysis_tab.missing_table.item(index.row(), 0).data(Qt.ItemDataRole.UserRole)
+                item_data = index.siblingAtColumn(0).data(ROW_DATA_ROLE)
                 if item_data: items_to_export.append(item_data)
         else:
-            for r in range(self.view.analysis_tab.missing_table.rowCount()):
-                if not self.view.analysis_tab.missing_table.isRowHidden(r):
-                    item_data = self.view.analysis_tab.missing_table.item(r, 0).data(Qt.ItemDataRole.UserRole)
-                    if item_data: items_to_export.append(item_data)
+            items_to_export = [data for data in self.view.analysis_tab.missing_proxy.visible_row_data() if data]
         
         if not items_to_export:
              ToastNotification.show_message(self.view, "Không có dữ liệu phù hợp.", type="warning")
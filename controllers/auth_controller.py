@@ -46,6 +46,18 @@ class AuthController(BaseController):
         self.view.analysis_tab.set_loading(True, "Đang xóa cookies và đăng nhập lại...")
         self.perform_login(is_retry=True)
 
+    def adopt_startup_login(self, status, result=None):
+        """
+        Nhận lại lần đăng nhập mà StartupOrchestrator đã bắt đầu trước khi controller được tạo.
+        status: None (worker chưa sẵn sàng - on_worker_ready sẽ lo), "pending", "done" (result = (ok, message)), "skipped".
+        """
+        if status == "pending":
+            self.view.analysis_tab.set_loading(True, "Đang đăng nhập hệ thống...")
+        elif status == "done":
+            self.on_login_finished(*result)
+        elif status == "skipped":
+            self.perform_login(is_retry=False)
+
     @Slot()
     def on_worker_ready(self):
         self.view.analysis_tab.set_loading(True, "Đang đăng nhập hệ thống...")
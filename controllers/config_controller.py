@@ -1,5 +1,4 @@
 import threading
-import requests
 import json
 import os
 import qtawesome as qta
@@ -8,6 +7,7 @@ from PySide6.QtWidgets import QApplication
 from ui_pyside.toast import ToastNotification
 from ui_pyside.styles import AppTheme
 from live_worker.vaccine_data import get_base_path
+from rule_profiler import RuleProfiler
 from .base_controller import BaseController
 
 class ConfigController(BaseController):
@@ -22,6 +22,8 @@ class ConfigController(BaseController):
         self.view.config_tab.save_btn.clicked.connect(self.handle_save_config)
         self.view.config_tab.update_vaccine_btn.clicked.connect(self.handle_update_vaccine_list)
         self.view.debug_tab.generate_btn.clicked.connect(self.handle_generate_debug)
+        self.view.debug_tab.log_level_combo.currentTextChanged.connect(self.on_worker_log_level_changed)
+        self.view.config_tab.prefetch_checkbox.toggled.connect(self.on_prefetch_toggled)
         self.view.theme_toggle_btn.clicked.connect(self.handle_theme_toggle)
         
         self.vaccine_update_success.connect(self.on_vaccine_update_success)
@@ -39,6 +41,21 @@ class ConfigController(BaseController):
         self.apply_app_theme(self.current_theme)
         self.update_theme_icon()
 
+        # Mức log worker (worker đọc lệnh này ngay khi khởi động)
+        self.view.debug_tab.log_level_combo.setCurrentText(creds.get("worker_log_level", "INFO"))
+        self.view.config_tab.prefetch_checkbox.setChecked(creds.get("prefetch_histories", "0") == "1")
+
+    @Slot(str)
+    def on_worker_log_level_changed(self, level):
+        self.services['config'].set_value("worker_log_level", level)
+        self.services['worker'].set_log_level(level)
+
+    @Slot(bool)
+    def on_prefetch_toggled(self, checked):
+        self.services['config'].set_value("prefetch_histories", "1" if checked else "0")
+        if not checked:
+            self.main.analysis_ctrl.clear_prefetch()
+
     def apply_app_theme(self, theme_name):
         app = QApplication.instance()
         app.setStyleSheet(AppTheme.get_stylesheet(theme_name))
@@ -86,6 +103,7 @@ class ConfigController(BaseController):
 
     def _run_vaccine_update(self):
         try:
+            import requests  # chạy ở luồng nền, chỉ khi bấm cập nhật
             url = "https://tiemchung.vncdc.gov.vn/Vacxin/DsVacxinKhongCovid"
             response = requests.get(url, timeout=30)
             response.raise_for_status()
@@ -119,4 +137,8 @@ class ConfigController(BaseController):
         self.view.debug_tab.log_viewer.appendPlainText("--- User Generated Report ---")
         if self.state['analysis_results']: 
             self.view.debug_tab.log_viewer.appendPlainText(str(self.state['analysis_results']))
+            profile = self.state['analysis_results'].get("profile")
+            if profile:
+                self.view.debug_tab.log_viewer.appendPlainText("--- Rule Profiling ---")
+                self.view.debug_tab.log_viewer.appendPlainText(RuleProfiler.format_report(profile))
         ToastNotification.show_message(self.view, "Đã tạo báo cáo debug.", type="info")
\ No newline at end of file
@@ -1,8 +1,9 @@
 from datetime import datetime, date
-from PySide6.QtCore import Slot, Qt
+from PySide6.QtCore import Slot, Qt, QModelIndex
 from PySide6.QtGui import QShortcut, QKeySequence
-from PySide6.QtWidgets import QMessageBox, QTableWidgetItem
+from PySide6.QtWidgets import QMessageBox
 from ui_pyside.toast import ToastNotification
+from ui_pyside.analysis_table_models import ROW_DATA_ROLE
 from ui_pyside.dialogs.add_patient_dialog import AddPatientDialog
 from ui_pyside.dialogs.vaccine_selection_dialog import VaccineSelectionDialog
 from .base_controller import BaseController
@@ -13,7 +14,7 @@ class HISController(BaseController):
 
     def setup_connections(self):
         self.view.analysis_tab.schedule_btn.clicked.connect(self.handle_schedule_appointment)
-        self.view.analysis_tab.missing_table.itemDoubleClicked.connect(self.handle_missing_item_double_click)
+        self.view.analysis_tab.missing_table.doubleClicked.connect(self.handle_missing_item_double_click)
         
         self.f10_shortcut = QShortcut(QKeySequence("F10"), self.view)
         self.f10_shortcut.activated.connect(self.handle_schedule_appointment)
@@ -103,14 +104,13 @@ class HISController(BaseController):
             self.view.analysis_tab.schedule_btn.style().unpolish(self.view.analysis_tab.schedule_btn)
             self.view.analysis_tab.schedule_btn.style().polish(self.view.analysis_tab.schedule_btn)
 
-    @Slot(QTableWidgetItem)
-    def handle_missing_item_double_click(self, item):
+    @Slot(QModelIndex)
+    def handle_missing_item_double_click(self, index):
         if not self.state['matched_his_visit']:
             ToastNotification.show_message(self.view, "Vui lòng kiểm tra và khớp hồ sơ HIS trước (Nút F10).", type="warning")
             return
             
-        row = item.row()
-        data_item = self.view.analysis_tab.missing_table.item(row, 0).data(Qt.ItemDataRole.UserRole)
+        data_item = index.siblingAtColumn(0).data(ROW_DATA_ROLE)
         
         if not data_item: return
         
@@ -179,15 +179,15 @@ class HISController(BaseController):
     def handle_schedule_appointment(self):
         table = self.view.analysis_tab.missing_table
         selected_rows = table.selectionModel().selectedRows()
-        target_item = None
+        target_index = None
         
         if selected_rows:
-            target_item = table.item(selected_rows[0].row(), 0)
-        elif table.rowCount() > 0:
+            target_index = selected_rows[0]
+        elif table.model().rowCount() > 0:
             table.selectRow(0)
-            target_item = table.item(0, 0)
+            target_index = table.model().index(0, 0)
             
-        if target_item:
-            self.handle_missing_item_double_click(target_item)
+        if target_index is not None:
+            self.handle_missing_item_double_click(target_index)
         else:
             ToastNotification.show_message(self.view, "Danh sách cần tiêm đang trống.", type="warning")
\ No newline at end of file
@@ -1,6 +1,6 @@
 import atexit
 from datetime import datetime, date
-from PySide6.QtCore import QObject, Slot
+from PySide6.QtCore import QObject, Slot, Signal
 
 from services.image_exporter import ImageExportService
 from services.data_formatter import DataFormattingService
@@ -9,6 +9,7 @@ from services.worker_service import WorkerService
 from services.analysis_service import AnalysisService
 from services.patient_service import PatientService
 from services.vaccine_service import VaccineService
+from services.history_cache_service import HistoryCacheService, DEFAULT_TTL_HOURS, DEFAULT_SEARCH_TTL_MINUTES
 
 from .auth_controller import AuthController
 from .search_controller import SearchController
@@ -17,7 +18,11 @@ from .his_controller import HISController
 from .config_controller import ConfigController
 
 class MainController(QObject):
-    def __init__(self, main_window):
+    # Log từ các luồng nền (truy vấn HIS) được chuyển về luồng giao diện qua signal
+    db_log = Signal(str)
+
+    def __init__(self, main_window, services=None):
+        """services: các service đã được StartupOrchestrator khởi tạo sẵn (config, worker, analysis)."""
         super().__init__()
         self.view = main_window
         
@@ -27,12 +32,14 @@ class MainController(QObject):
             'current_patient_info': {},
             'matched_his_visit': None,
             'analysis_results': None,
-            'last_failed_task': None
+            'last_failed_task': None,
+            # Lịch sử lấy từ cache đang hiển thị (bỏ qua phân tích lại nếu bản tải mới giống hệt)
+            'shown_history': None
         }
 
         # --- Initialize Services ---
         self.services = {}
-        self.init_services()
+        self.init_services(services)
         
         # --- Initialize Sub-Controllers ---
         self.auth_ctrl = AuthController(self)
@@ -54,18 +61,36 @@ class MainController(QObject):
         # --- Initial Data Load ---
         self.config_ctrl.load_initial_data()
         
-        # --- Start Worker ---
-        self.services['worker'].start_worker()
+        # --- Start Worker (không làm gì nếu StartupOrchestrator đã khởi động) ---
+        self.services['worker'].start_worker(
+            self.services['config'].get_value("worker_concurrency"),
+            self.services['config'].get_value("worker_standby", "1") != "0"
+        )
         atexit.register(self.cleanup)
 
-    def init_services(self):
+    def init_services(self, prebuilt=None):
+        prebuilt = prebuilt or {}
+        self.services.update(prebuilt)
         self.services['data'] = DataFormattingService()
         self.services['image'] = ImageExportService()
-        self.services['config'] = ConfigService()
-        self.services['worker'] = WorkerService()
-        self.services['analysis'] = AnalysisService()
-        self.services['db_patient'] = PatientService(logger_callback=self.on_worker_log)
-        self.services['db_vaccine'] = VaccineService(logger_callback=self.on_worker_log)
+        if 'config' not in prebuilt:
+            self.services['config'] = ConfigService()
+        if 'worker' not in prebuilt:
+            self.services['worker'] = WorkerService()
+        if 'analysis' not in prebuilt:
+            self.services['analysis'] = AnalysisService()
+        self.services['history_cache'] = HistoryCacheService(
+            self.services['config'].get_value("history_cache_ttl_hours", DEFAULT_TTL_HOURS),
+            logger_callback=self.on_worker_log,
+            search_ttl_minutes=self.services['config'].get_value("search_cache_ttl_minutes", DEFAULT_SEARCH_TTL_MINUTES)
+        )
+        self.db_log.connect(self.on_worker_log)
+        self.services['db_patient'] = PatientService(logger_callback=self.db_log.emit)
+        self.services['db_vaccine'] = VaccineService(logger_callback=self.db_log.emit)
+        # Mở sẵn kết nối HIS ở nền, các service dùng chung pool
+        # (khi chạy qua StartupOrchestrator thì việc này đã bắt đầu từ lúc hiện splash)
+        if not prebuilt:
+            self.services['db_patient'].prewarm_connections()
 
     def setup_ui_components(self):
         # 1. Vaccination Tab (Legacy/Registration)
@@ -77,7 +102,8 @@ class MainController(QObject):
         # 2. Analysis Tab (New: Assigned List)
         self.view.analysis_tab.view_assigned.set_service(self.services['db_patient'])
         self.view.analysis_tab.view_assigned.request_vncdc_search.connect(self.search_ctrl.handle_vncdc_search_request)
-        # Load initial data for Assigned list
+        self.view.analysis_tab.view_assigned.log_message.connect(self.on_worker_log)
+        # Load initial data for Assigned list (chạy nền, bảng được điền khi có kết quả)
         self.view.analysis_tab.view_assigned.load_data()
 
     def setup_global_connections(self):
@@ -87,6 +113,12 @@ class MainController(QObject):
     def on_worker_log(self, message):
         self.view.debug_tab.log_viewer.appendPlainText(f"[SYSTEM] {message}")
 
+    def clear_failed_task(self, *task_types):
+        """Tác vụ đã có kết quả: không chạy lại nó sau lần đăng nhập tới."""
+        task = self.state['last_failed_task']
+        if task and task.get("type") in task_types:
+            self.state['last_failed_task'] = None
+
     def retry_last_task(self):
         if self.state['last_failed_task']:
             self.view.analysis_tab.set_loading(True, "Thử lại tác vụ...")
@@ -118,4 +150,6 @@ class MainController(QObject):
     def cleanup(self):
         # Save config on exit
         self.services['config'].save_config_file()
-        self.services['worker'].stop_worker()
\ No newline at end of file
+        self.services['worker'].stop_worker()
+        self.services['history_cache'].close()
+        PatientService.close_pool()
\ No newline at end of file
@@ -1,6 +1,5 @@
 from PySide6.QtCore import Slot, QSize
 from PySide6.QtWidgets import QListWidgetItem
-import qtawesome as qta
 from ui_pyside.toast import ToastNotification
 from ui_pyside.analysis_tab import PatientResultItem
 from .base_controller import BaseController
@@ -9,6 +8,8 @@ class SearchController(BaseController):
     def __init__(self, main_controller):
         super().__init__(main_controller)
         self.search_results_map = {}
+        # Kết quả lấy từ cache đang hiển thị (bỏ qua nếu lần tìm lại ở nền trả về giống hệt)
+        self.shown_results = None
 
     def setup_connections(self):
         # Input connections
@@ -23,6 +24,8 @@ class SearchController(BaseController):
         
         # Worker signals
         self.services['worker'].signals.search_finished.connect(self.on_search_finished)
+        self.services['worker'].signals.search_failed.connect(self.on_search_failed)
+        self.services['worker'].signals.search_loaded.connect(self.services['history_cache'].put_subjects)
 
     @Slot()
     def handle_search_click(self):
@@ -37,14 +40,48 @@ class SearchController(BaseController):
         # Clear previous state (list stays visible - just cleared)
         self.view.analysis_tab.result_list.clear()
         self.search_results_map.clear()
+        self.shown_results = None
         
-        self.view.analysis_tab.set_loading(True, f"Đang tìm kiếm SĐT: {phone}...")
+        # Lịch sử của đối tượng cũ không còn cần nữa: huỷ nếu worker chưa tải xong
+        self.services['worker'].cancel_channel("history")
+        self.main.analysis_ctrl.clear_prefetch()
+
+        cached = self.services['history_cache'].get_subjects(phone)
+        if cached:
+            # Hiện ngay kết quả đã lưu, worker vẫn tìm lại ở nền để cập nhật
+            self.main.on_worker_log(f"Dùng kết quả tìm kiếm đã lưu cho SĐT {phone}, đang làm mới...")
+            self.show_results(cached)
+            self.shown_results = cached
+        else:
+            self.view.analysis_tab.set_loading(True, f"Đang tìm kiếm SĐT: {phone}...")
         self.state['last_failed_task'] = {"type": "search_phone", "payload": {"phone": phone}}
         self.services['worker'].request_search(phone)
 
     @Slot(list)
     def on_search_finished(self, results):
         self.view.analysis_tab.set_loading(False)
+        self.main.clear_failed_task("search_phone")
+        shown = self.shown_results
+        self.shown_results = None
+        if shown is not None:
+            # Không đổi (hoặc tìm lại lỗi): giữ nguyên danh sách đang hiển thị
+            if not results or results == shown:
+                return
+            self.show_results(results, keep_selection=True)
+            return
+        self.show_results(results)
+
+    @Slot(str)
+    def on_search_failed(self, message):
+        self.view.analysis_tab.set_loading(False)
+        if self.shown_results is not None:
+            # Vẫn giữ kết quả từ cache trên màn hình
+            self.shown_results = None
+            ToastNotification.show_message(self.view, "Không làm mới được kết quả tìm kiếm, đang hiển thị dữ liệu đã lưu.", type="warning")
+        else:
+            ToastNotification.show_message(self.view, f"Lỗi tìm kiếm: {message}", type="error")
+
+    def show_results(self, results, keep_selection=False):
         self.view.analysis_tab.result_list.clear()
         self.search_results_map.clear()
         
@@ -82,6 +119,13 @@ class SearchController(BaseController):
             self.view.analysis_tab.result_list.setCurrentRow(0)
         else:
             ToastNotification.show_message(self.view, f"Tìm thấy {len(results)} kết quả.", type="success")
+            if keep_selection:
+                for idx, subject in self.search_results_map.items():
+                    if subject['id'] == self.state['current_patient_id']:
+                        self.view.analysis_tab.result_list.setCurrentRow(idx)
+                        break
+            if self.services['config'].get_value("prefetch_histories") == "1":
+                self.main.analysis_ctrl.prefetch_histories(results)
 
     @Slot(int)
     def _handle_push_clicked(self, row_index):
@@ -107,6 +151,8 @@ class SearchController(BaseController):
         if subject:
             self.state['current_patient_id'] = subject['id']
             self.state['current_patient_info'] = subject
+            # Đã tải trước lịch sử (nếu bật): hiện kết quả phân tích ngay
+            self.main.analysis_ctrl.show_prefetched(subject['id'])
             
             # Auto-check HIS match (no longer updating profile since it's removed)
             self.main.his_ctrl.check_his_patient_match()
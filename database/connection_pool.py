@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import deque
+
+# Mặc định, có thể ghi đè bằng DB_POOL_SETTINGS trong db_config.py
+DEFAULT_MAX_SIZE = 4
+DEFAULT_IDLE_TIMEOUT = 300        # giây: đóng kết nối rảnh quá lâu
+DEFAULT_HEALTH_CHECK_AFTER = 30   # giây: kết nối rảnh lâu hơn mức này được kiểm tra lại trước khi dùng
+DEFAULT_ACQUIRE_TIMEOUT = 15      # giây: chờ tối đa khi pool đã đầy
+
+
+class PooledConnection:
+    """
+    Bọc một pyodbc connection lấy từ pool.
+    Mọi thuộc tính/hàm được chuyển tiếp cho kết nối thật; close() trả kết nối về pool
+    nên các service vẫn giữ nguyên mẫu `finally: if conn: conn.close()`.
+    """
+    __slots__ = ("_pool", "_conn")
+
+    def __init__(self, pool, conn):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_conn", conn)
+
+    def __getattr__(self, name):
+        conn = object.__getattribute__(self, "_conn")
+        if conn is None:
+            raise RuntimeError("Kết nối đã được trả về pool.")
+        return getattr(conn, name)
+
+    def __setattr__(self, name, value):
+        # vd: conn.autocommit = False
+        setattr(self._conn, name, value)
+
+    def close(self):
+        conn = self._conn
+        if conn is None:
+            return
+        object.__setattr__(self, "_conn", None)
+        self._pool.release(conn)
+
+
+class ConnectionPool:
+    """
+    Pool kết nối dùng chung giữa các luồng.
+    - max_size: tổng số kết nối (đang dùng + rảnh); acquire() chờ khi đã đầy.
+    - Kết nối rảnh quá idle_timeout bị đóng; rảnh quá health_check_after thì chạy SELECT 1
+      trước khi cấp, hỏng thì mở kết nối mới thay thế.
+    - Khi trả về: rollback phần chưa commit và đặt lại autocommit; lỗi -> bỏ kết nối đó.
+    """
+
+    def __init__(self, connect_func, max_size=DEFAULT_MAX_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 health_check_after=DEFAULT_HEALTH_CHECK_AFTER, acquire_timeout=DEFAULT_ACQUIRE_TIMEOUT, logger=None):
+        self.connect_func = connect_func
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.acquire_timeout = acquire_timeout
+        self.logger = logger
+        self._idle = deque()  # (conn, last_used) - dùng lại kết nối mới nhất trước
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def log(self, message):
+        if self.logger:
+            self.logger(message)
+        else:
+            print(f"[DB-POOL] {message}")
+
+    def acquire(self):
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._cond:
+            expired = self._pop_expired()
+            while True:
+                if self._closed:
+                    raise RuntimeError("Pool kết nối đã đóng.")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Hết thời gian chờ kết nối CSDL (pool đầy: {self.max_size}).")
+                self._cond.wait(remaining)
+        self._close_quietly(expired)
+
+        # Slot đã được giữ cho luồng này: kiểm tra/mở kết nối ngoài lock
+        if conn is not None and time.monotonic() - last_used > self.health_check_after and not self._is_alive(conn):
+            self.log("Kết nối CSDL không còn hoạt động, đang kết nối lại...")
+            self._close_quietly([conn])
+            conn = None
+        if conn is None:
+            try:
+                conn = self.connect_func()
+            except Exception:
+                self._release_slot()
+                raise
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        try:
+            conn.rollback()
+            conn.autocommit = False
+        except Exception:
+            # Kết nối hỏng (mất mạng, server restart...) - không đưa lại vào pool
+            self._close_quietly([conn])
+            self._release_slot()
+            return
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                closing = [conn]
+            else:
+                self._idle.append((conn, time.monotonic()))
+                closing = self._pop_expired()
+            self._cond.notify()
+        self._close_quietly(closing)
+
+    def prewarm(self, count=1):
+        """Mở sẵn tối đa `count` kết nối (gọi từ luồng nền lúc khởi động)."""
+        opened = []
+        try:
+            for _ in range(count):
+                opened.append(self.acquire())
+        except Exception as e:
+            self.log(f"Không thể mở sẵn kết nối CSDL: {e}")
+        for pooled in opened:
+            pooled.close()
+
+    def close_all(self):
+        with self._cond:
+            self._closed = True
+            closing = [conn for conn, _ in self._idle]
+            self._size -= len(closing)
+            self._idle.clear()
+            self._cond.notify_all()
+        self._close_quietly(closing)
+
+    def stats(self):
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle), "in_use": self._size - len(self._idle), "max_size": self.max_size}
+
+    def _pop_expired(self):
+        """Lấy ra các kết nối rảnh quá idle_timeout (gọi khi đang giữ lock)."""
+        expired = []
+        cutoff = time.monotonic() - self.idle_timeout
+        # Kết nối cũ nhất nằm đầu deque
+        while self._idle and self._idle[0][1] < cutoff:
+            expired.append(self._idle.popleft()[0])
+        self._size -= len(expired)
+        if expired:
+            self._cond.notify(len(expired))
+        return expired
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _is_alive(conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(conns):
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
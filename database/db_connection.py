@@ -1,4 +1,3 @@
-import pyodbc
 from db_config import DB_CONFIG
 
 class DbConnection:
@@ -11,4 +10,6 @@ class DbConnection:
             f"UID={DB_CONFIG['UID']};"
             f"PWD={DB_CONFIG['PWD']};"
         )
+        # Import khi mở kết nối đầu tiên (thường ở luồng nền prewarm), không chặn lúc khởi động
+        import pyodbc
         return pyodbc.connect(conn_str)
\ No newline at end of file
@@ -12,4 +12,11 @@ APP_SETTINGS = {
     'USER_NAME': 'PythonTool',
     'DEFAULT_KHOA_ID': 63,
     'DEFAULT_PHONG_ID': 59
-}
\ No newline at end of file
+}
+# Pool kết nối CSDL (xem database/connection_pool.py)
+DB_POOL_SETTINGS = {
+    'max_size': 4,
+    'idle_timeout': 300,
+    'health_check_after': 30,
+    'acquire_timeout': 15
+}
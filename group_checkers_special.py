@@ -17,9 +17,11 @@ def check_mmr_equivalent_group(rule_key, rule_details, administered_map, missing
     mvvac_records = get_administered_dose_records(mvvac_names_norm, administered_map)
 
     if mvvac_records:
-        mmr2_names_from_config = rule_details.get("raw_names_members", {}).get("MMR2", [])
-        mmr2_normalizer = VaccineAnalysisUtils.normalize_vaccine_name
-        mmr2_names_norm = list(set([mmr2_normalizer(n) for n in mmr2_names_from_config]))
+        mmr2_names_norm = rule_details.get("names_norm_members", {}).get("MMR2")
+        if mmr2_names_norm is None: # Quy tắc chưa qua process_raw_vaccine_rules_data
+            mmr2_names_from_config = rule_details.get("raw_names_members", {}).get("MMR2", [])
+            mmr2_normalizer = VaccineAnalysisUtils.normalize_vaccine_name
+            mmr2_names_norm = list(set([mmr2_normalizer(n) for n in mmr2_names_from_config]))
         
         mmr2_records = get_administered_dose_records(mmr2_names_norm, administered_map)
         num_mmr2_doses = len(mmr2_records)
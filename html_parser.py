@@ -1,13 +1,46 @@
 # html_parser.py
-from bs4 import BeautifulSoup
 from collections import defaultdict
 from datetime import datetime, date, timezone, timedelta # <<< THÊM timezone, timedelta
 import config_data # For HTML element IDs
+from vaccine_record import VaccineRecord
+from live_worker import html_extract
 
 class HTMLVaccineParser:
     def __init__(self, normalize_func):
         self.normalize_vaccine_name = normalize_func
 
+    @staticmethod
+    def _default_system_date():
+        # Lấy ngày hiện tại theo GMT+7 nếu không có trong HTML
+        utc_now = datetime.now(timezone.utc)
+        gmt7_now = utc_now.astimezone(timezone(timedelta(hours=7)))
+        return gmt7_now.strftime("%d/%m/%Y")
+
+    @staticmethod
+    def _find_input(root, input_id):
+        found = root.xpath("//input[@id=$iid]", iid=input_id) if root is not None else []
+        return found[0] if found else None
+
+    def _extract_patient_info_lxml(self, root):
+        """Như _extract_patient_info nhưng trên cây lxml."""
+        values = []
+        for ids in ((config_data.HTML_PATIENT_NAME_ID,),
+                    (config_data.HTML_PATIENT_DOB_ID, config_data.HTML_PATIENT_DOB_HF_ID),
+                    (config_data.HTML_SYSTEM_DATE_ID, config_data.HTML_SYSTEM_DATE_HF_ID)):
+            # Chỉ dùng id dự phòng khi không có thẻ input chính (giống bản BeautifulSoup)
+            tag = None
+            for input_id in ids:
+                tag = self._find_input(root, input_id)
+                if tag is not None:
+                    break
+            value = tag.get('value') if tag is not None else None
+            values.append(value.strip() if value is not None else None)
+
+        patient_name, patient_dob_str, system_date_str = values
+        if system_date_str is None:
+            system_date_str = self._default_system_date()
+        return patient_name, patient_dob_str, system_date_str
+
     def _extract_patient_info(self, soup):
         patient_name = None
         patient_dob_str = None
@@ -29,30 +62,37 @@ class HTMLVaccineParser:
         if system_date_input and 'value' in system_date_input.attrs:
             system_date_str = system_date_input['value'].strip()
         else:
-            # Lấy ngày hiện tại theo GMT+7 nếu không có trong HTML
-            utc_now = datetime.now(timezone.utc)
-            gmt7_now = utc_now.astimezone(timezone(timedelta(hours=7)))
-            system_date_str = gmt7_now.strftime("%d/%m/%Y") # <<< THAY ĐỔI Ở ĐÂY
+            system_date_str = self._default_system_date()
         
         return patient_name, patient_dob_str, system_date_str
 
-    def _extract_vaccine_records(self, soup):
-        vaccine_table = soup.find('table', id=config_data.HTML_VACCINE_TABLE_ID)
-        administered_vaccine_details_map = defaultdict(list)
-        administered_for_display = []
-        error_msg_vaccine = None
+    def _vaccine_display_rows_lxml(self, root):
+        """(danh sách (tên, mũi, ngày), lỗi) từ tblVacxin trên cây lxml."""
+        table = html_extract.find_table(None, config_data.HTML_VACCINE_TABLE_ID, root=root) if root is not None else None
+        if table is None:
+            return [], "Không tìm thấy bảng vắc-xin (id='tblVacxin')."
+        has_tbody, rows = html_extract.table_rows(table)
+        if not has_tbody:
+            return [], "Không tìm thấy tbody trong bảng vắc-xin."
+        if not rows:
+            return [], "Không tìm thấy hàng nào (tr) trong tbody."
+        return [r for r in map(html_extract.display_row, rows) if r], None
 
+    def _vaccine_display_rows(self, soup):
+        """Bản BeautifulSoup của _vaccine_display_rows_lxml (giữ để đối chiếu/benchmark)."""
+        vaccine_table = soup.find('table', id=config_data.HTML_VACCINE_TABLE_ID)
         if not vaccine_table:
-            return administered_vaccine_details_map, administered_for_display, "Không tìm thấy bảng vắc-xin (id='tblVacxin')."
+            return [], "Không tìm thấy bảng vắc-xin (id='tblVacxin')."
         
         tbody = vaccine_table.find('tbody')
         if not tbody:
-            return administered_vaccine_details_map, administered_for_display, "Không tìm thấy tbody trong bảng vắc-xin."
+            return [], "Không tìm thấy tbody trong bảng vắc-xin."
 
         rows = tbody.find_all('tr')
         if not rows:
-            return administered_vaccine_details_map, administered_for_display, "Không tìm thấy hàng nào (tr) trong tbody."
+            return [], "Không tìm thấy hàng nào (tr) trong tbody."
 
+        display_rows = []
         for row_idx, row in enumerate(rows):
             cols = row.find_all('td')
             if len(cols) > 4:
@@ -68,23 +108,27 @@ class HTMLVaccineParser:
                 
                 dose_text_raw = cols[2].text.strip()
                 date_text_raw = cols[4].text.strip()
-                
-                if vaccine_name_raw and date_text_raw:
-                    normalized_name = self.normalize_vaccine_name(vaccine_name_raw)
-                    administered_for_display.append((vaccine_name_raw, dose_text_raw, date_text_raw))
-                    try:
-                        dose_number_int = int(dose_text_raw)
-                    except ValueError:
-                        dose_number_int = 0
-                    
-                    try:
-                        date_obj = datetime.strptime(date_text_raw.replace(" ",""), "%d/%m/%Y").date()
-                        administered_vaccine_details_map[normalized_name].append(
-                            (dose_number_int, date_obj, vaccine_name_raw, dose_text_raw, date_text_raw)
-                        )
-                    except ValueError:
-                        print(f"Cảnh báo: Định dạng ngày không hợp lệ '{date_text_raw}' cho vắc xin {vaccine_name_raw}")
-                        pass
+                display_rows.append((vaccine_name_raw, dose_text_raw, date_text_raw))
+        return display_rows, None
+
+    def _extract_vaccine_records(self, display_rows, table_error=None):
+        administered_vaccine_details_map = defaultdict(list)
+        administered_for_display = []
+        error_msg_vaccine = None
+
+        if table_error:
+            return administered_vaccine_details_map, administered_for_display, table_error
+
+        for vaccine_name_raw, dose_text_raw, date_text_raw in display_rows:
+            if vaccine_name_raw and date_text_raw:
+                administered_for_display.append((vaccine_name_raw, dose_text_raw, date_text_raw))
+                record = VaccineRecord.parse(vaccine_name_raw, dose_text_raw, date_text_raw)
+                if record is None:
+                    print(f"Cảnh báo: Định dạng ngày không hợp lệ '{date_text_raw}' cho vắc xin {vaccine_name_raw}")
+                    continue
+                # Tên chuẩn hoá theo normalize_func của parser (mặc định giống record.norm_name)
+                normalized_name = self.normalize_vaccine_name(vaccine_name_raw)
+                administered_vaccine_details_map[normalized_name].append(record.administered_tuple())
         
         for norm_name in administered_vaccine_details_map:
             administered_vaccine_details_map[norm_name].sort(key=lambda x: x[1])
@@ -95,7 +139,16 @@ class HTMLVaccineParser:
         return administered_vaccine_details_map, administered_for_display, error_msg_vaccine
 
     def parse(self, html_content):
+        """Parse trang chi tiết bằng lxml (nhanh); kết quả giống parse_bs4."""
+        root = html_extract.parse_document(html_content)
+        patient_name, patient_dob_str, system_date_str = self._extract_patient_info_lxml(root)
+        vaccine_map, display_list, vaccine_err = self._extract_vaccine_records(*self._vaccine_display_rows_lxml(root))
+        return vaccine_map, display_list, patient_name, patient_dob_str, system_date_str, vaccine_err
+
+    def parse_bs4(self, html_content):
+        """Đường BeautifulSoup ban đầu (đối chiếu trong benchmark_html.py)."""
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html_content, 'lxml')
         patient_name, patient_dob_str, system_date_str = self._extract_patient_info(soup)
-        vaccine_map, display_list, vaccine_err = self._extract_vaccine_records(soup)
-        return vaccine_map, display_list, patient_name, patient_dob_str, system_date_str, vaccine_err
\ No newline at end of file
+        vaccine_map, display_list, vaccine_err = self._extract_vaccine_records(*self._vaccine_display_rows(soup))
+        return vaccine_map, display_list, patient_name, patient_dob_str, system_date_str, vaccine_err
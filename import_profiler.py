@@ -0,0 +1,144 @@
+# import_profiler.py
+"""
+Đo thời gian import giống `python -X importtime`, nhưng chạy được cả trong bản đóng gói
+(không truyền được cờ -X) và xuất báo cáo JSON để so sánh giữa các phiên bản.
+
+Cài một finder đứng đầu sys.meta_path; finder này nhờ các finder còn lại tìm spec rồi bọc loader
+để đo exec_module. "self" là thời gian chạy thân module, "cumulative" gồm cả các import lồng bên trong.
+Dùng qua: python main_pyside.py --import-times [report.json]
+"""
+import importlib.abc
+import sys
+import threading
+import time
+
+REPORT_VERSION = 1
+
+
+class _TimedLoader:
+    """Bọc loader gốc: đo exec_module rồi trả loader gốc lại cho module."""
+
+    def __init__(self, loader, profiler, name):
+        self._loader = loader
+        self._profiler = profiler
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        # importlib.resources / pkgutil.get_data cần loader thật
+        module.__loader__ = self._loader
+        if getattr(module, "__spec__", None) is not None:
+            module.__spec__.loader = self._loader
+        self._profiler._enter()
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._leave(self._name, time.perf_counter() - start)
+
+
+class ImportProfiler(importlib.abc.MetaPathFinder):
+    """
+    Ghi thời gian import của mọi module được nạp trong khi đang install().
+    records: tên module -> [self giây, cumulative giây, thứ tự nạp, độ sâu lồng]
+    """
+
+    def __init__(self):
+        self.records = {}
+        self._local = threading.local()
+        self._order = 0
+        self.started = None
+        self.total = None
+
+    # --- Cài / gỡ ---
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+        self.started = time.perf_counter()
+        return self
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+        self.total = time.perf_counter() - self.started
+
+    # --- MetaPathFinder ---
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self:
+                continue
+            find = getattr(finder, "find_spec", None)
+            if find is None:
+                continue
+            spec = find(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        # Loader kiểu cũ (chỉ có load_module) thì để nguyên, không đo
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self, fullname)
+        return spec
+
+    # --- Ngăn xếp import lồng nhau (theo luồng) ---
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self):
+        self._stack().append(0.0)  # thời gian của các import con
+
+    def _leave(self, name, elapsed):
+        stack = self._stack()
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        self._order += 1
+        self.records[name] = [elapsed - children, elapsed, self._order, len(stack)]
+
+    # --- Kết quả ---
+    def as_dict(self, top=None):
+        rows = [
+            {"module": name, "self_ms": round(self_s * 1000, 3), "cumulative_ms": round(cum_s * 1000, 3), "depth": depth}
+            for name, (self_s, cum_s, _, depth) in sorted(self.records.items(), key=lambda item: item[1][2])
+        ]
+        top_level_ms = sum(r["cumulative_ms"] for r in rows if r["depth"] == 0)
+        rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+        return {
+            "total_ms": round((self.total if self.total is not None else time.perf_counter() - self.started) * 1000, 3),
+            "imports_ms": round(top_level_ms, 3),
+            "modules": len(rows),
+            "entries": rows[:top] if top else rows,
+        }
+
+    @staticmethod
+    def format_report(profile, title="Import"):
+        """Bảng văn bản (giống -X importtime nhưng sắp theo cumulative giảm dần)."""
+        lines = [f"{title}: {profile['total_ms']:.1f} ms, {profile['modules']} module "
+                 f"(import cấp ngoài cùng: {profile['imports_ms']:.1f} ms)",
+                 f"{'self ms':>10}{'cumul ms':>11}  module"]
+        for row in profile["entries"]:
+            lines.append(f"{row['self_ms']:>10.2f}{row['cumulative_ms']:>11.2f}  {'  ' * row['depth']}{row['module']}")
+        return "\n".join(lines)
+
+
+def build_report(sections, argv=None):
+    """Báo cáo JSON (cùng dạng với benchmark_*.py) từ {tên phần: as_dict()}."""
+    import platform
+    from datetime import datetime
+    return {
+        "version": REPORT_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "frozen": bool(getattr(sys, "frozen", False)),
+        "argv": list(argv or sys.argv),
+        "sections": sections,
+    }
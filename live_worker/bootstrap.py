@@ -0,0 +1,30 @@
+# live_worker/bootstrap.py
+"""
+Điểm vào gọn nhẹ của tiến trình worker (target của multiprocessing.Process).
+
+GUI chỉ import module này (thư viện chuẩn), còn process_worker cùng requests/lxml/html_extract
+chỉ được import bên trong tiến trình con. Khi spawn (Windows), tiến trình con chỉ nạp lại
+main_pyside (đã để import GUI trong hàm) và gói live_worker, không kéo PySide6/controllers theo.
+
+standby=True: worker dự phòng nóng - nạp sẵn module rồi chờ {"type": "activate"} trên in_queue,
+sau đó chạy như worker bình thường (kết nối kênh message, gửi "ready"). None trên in_queue: thoát.
+"""
+
+ACTIVATE = "activate"
+
+
+def run_worker(in_queue, out_queue, max_concurrency=None, standby=False):
+    from live_worker.process_worker import playwright_process_worker
+
+    if standby:
+        while True:
+            message = in_queue.get()
+            if message is None:
+                return
+            if isinstance(message, dict) and message.get("type") == ACTIVATE:
+                break
+
+    if max_concurrency:
+        playwright_process_worker(in_queue, out_queue, max_concurrency)
+    else:
+        playwright_process_worker(in_queue, out_queue)
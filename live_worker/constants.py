@@ -25,10 +25,22 @@ USER_INTERACTION_LOG = Path(__file__).parent.parent / "user_interaction.log" # (
 MAX_RETRIES = 3
 RETRY_DELAY = 5  # giây
 
+# Số tác vụ VNCDC chạy song song trong worker (mỗi tác vụ một session, chung cookie đăng nhập).
+# Giữ nhỏ để không tạo tải lớn lên cổng; ghi đè bằng worker_concurrency trong config.txt
+MAX_CONCURRENT_TASKS = 3
+
 # Timeout (dùng cho requests)
 LOGIN_TIMEOUT = 60  # giây (Đổi sang giây cho requests)
 FORM_TIMEOUT = 30   # giây (Đổi sang giây cho requests)
 
+# Phiên đăng nhập VNCDC (.ASPXAUTH, hết hạn trượt phía máy chủ). Worker chủ động đăng nhập lại
+# trước khi chạy tác vụ nếu phiên đã rảnh quá SESSION_IDLE_TIMEOUT hoặc đã cũ quá SESSION_MAX_AGE.
+# GUI ping mỗi 10 phút nên khi ứng dụng đang mở, phiên gần như không bao giờ rảnh tới ngưỡng này.
+SESSION_IDLE_TIMEOUT = 20 * 60  # giây
+SESSION_MAX_AGE = 8 * 3600      # giây
+# Cookie đăng nhập được lưu lại để lần mở ứng dụng sau không phải đăng nhập lại
+SESSION_STATE_FILE = "vncdc_session.json"
+
 # --- XÓA CÁC TIMEOUT CỦA PLAYWRIGHT ---
 # REDIRECT_TIMEOUT = 15000
 # TABLE_TIMEOUT = 15000
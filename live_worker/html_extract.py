@@ -0,0 +1,228 @@
+# live_worker/html_extract.py
+"""
+Trích xuất nhanh các bảng của VNCDC bằng lxml, không dựng cây BeautifulSoup cho cả trang.
+- Khi cắt được an toàn, chỉ parse đoạn <table id=...>...</table>; nếu không thì parse cả trang.
+- Kết quả giữ đúng định dạng của đường BeautifulSoup cũ
+  (utils.extract_subject_info / extract_vaccine_info, html_parser.HTMLVaccineParser).
+So sánh tốc độ với BeautifulSoup: benchmark_html.py
+"""
+import threading
+
+from lxml import etree
+
+SEARCH_TABLE_ID = "doiTuongSearchResult"
+VACCINE_TABLE_ID = "tblVacxin"
+
+# Parser lxml không nên dùng chung giữa các luồng của worker -> mỗi luồng một parser
+_local = threading.local()
+
+
+def _parser():
+    parser = getattr(_local, "parser", None)
+    if parser is None:
+        parser = _local.parser = etree.HTMLParser()
+    return parser
+
+
+def parse_document(html_content):
+    """Parse HTML (str/bytes) thành cây lxml; None nếu rỗng/không parse được."""
+    if not html_content:
+        return None
+    try:
+        return etree.fromstring(html_content, _parser())
+    except ValueError:
+        # Chuỗi unicode có khai báo encoding: parse dạng bytes
+        return etree.fromstring(html_content.encode("utf-8"), etree.HTMLParser(encoding="utf-8"))
+    except etree.XMLSyntaxError:
+        return None
+
+
+def _table_fragment(html_content, table_id):
+    """
+    Cắt đoạn <table ...id="table_id"...>...</table> ra khỏi trang.
+    Trả về None nếu không chắc chắn (không thấy id, bảng lồng nhau...) để gọi parse cả trang.
+    """
+    lowered = html_content.lower()
+    table_id = table_id.lower()
+    for marker in (f'id="{table_id}"', f"id='{table_id}'"):
+        pos = lowered.find(marker)
+        if pos != -1:
+            break
+    else:
+        return None
+
+    start = lowered.rfind("<table", 0, pos)
+    end = lowered.find("</table>", pos)
+    if start == -1 or end == -1:
+        return None
+    # id phải nằm trong chính thẻ mở <table>, và không có bảng lồng bên trong
+    if ">" in lowered[start:pos] or "<table" in lowered[pos:end]:
+        return None
+    return html_content[start:end + len("</table>")]
+
+
+def find_table(html_content, table_id, root=None):
+    """Trả về phần tử <table id=table_id> đầu tiên (hoặc None)."""
+    if root is None and isinstance(html_content, str):
+        fragment = _table_fragment(html_content, table_id)
+        if fragment is not None:
+            fragment_root = parse_document(fragment)
+            if fragment_root is not None:
+                found = fragment_root.xpath("//table[@id=$tid]", tid=table_id)
+                if found:
+                    return found[0]
+    if root is None:
+        root = parse_document(html_content)
+    if root is None:
+        return None
+    found = root.xpath("//table[@id=$tid]", tid=table_id)
+    return found[0] if found else None
+
+
+def table_rows(table):
+    """
+    (có tbody, danh sách <tr>) - tương đương table.find("tbody").find_all("tr") của BeautifulSoup.
+    """
+    tbody = next(table.iter("tbody"), None)
+    if tbody is None:
+        return False, []
+    return True, list(tbody.iter("tr"))
+
+
+def cells_of(row):
+    """Các ô <td> của một hàng (đệ quy, như find_all("td"))."""
+    return list(row.iter("td"))
+
+
+def text_of(el, separator="", strip=True):
+    """Tương đương get_text(separator, strip) của BeautifulSoup (bỏ qua comment)."""
+    if strip:
+        return separator.join(s for s in (t.strip() for t in el.itertext()) if s)
+    return separator.join(el.itertext())
+
+
+def _direct_texts(el):
+    """Các text node con trực tiếp của el (thứ tự như .contents, không gồm text của thẻ con)."""
+    if el.text is not None:
+        yield el.text
+    for child in el:
+        if child.tail is not None:
+            yield child.tail
+
+
+def _first_content(el):
+    """str(el.contents[0]) của BeautifulSoup."""
+    if el.text is not None:
+        return el.text
+    if len(el):
+        child = el[0]
+        if not isinstance(child.tag, str):
+            # comment / processing instruction
+            return child.text or ""
+        return etree.tostring(child, encoding=str, with_tail=False, method="html")
+    raise IndexError("ô trống")
+
+
+# --- Trang tìm kiếm (doiTuongSearchResult) ---
+
+def subject_from_row(row):
+    """Giống utils.extract_subject_info nhưng trên <tr> của lxml."""
+    id_value = row.get("data-id")
+    if not id_value:
+        return None
+    if "," in id_value:
+        id_value = id_value.split(",")[0]
+    id_value = id_value.strip()
+
+    cells = cells_of(row)
+    if len(cells) < 5:
+        return None
+    return {
+        'name': text_of(cells[1]),
+        'birth': text_of(cells[4]),
+        'id': id_value
+    }
+
+
+def extract_subjects(html_content):
+    """
+    Danh sách đối tượng {'name', 'birth', 'id'} trong table#doiTuongSearchResult.
+    Trả về None nếu không có bảng.
+    """
+    table = find_table(html_content, SEARCH_TABLE_ID)
+    if table is None:
+        return None
+    subjects = []
+    for row in table_rows(table)[1]:
+        subject = subject_from_row(row)
+        if subject and subject.get('id'):
+            subjects.append(subject)
+    return subjects
+
+
+# --- Trang chi tiết (tblVacxin) ---
+
+def vaccine_texts_from_row(row):
+    """(tên, mũi, ngày) dạng chuỗi của một hàng tblVacxin như utils.extract_vaccine_info; None nếu không hợp lệ."""
+    try:
+        cells = cells_of(row)
+        if len(cells) < 5:
+            return None
+        # Text node đầu tiên của ô tên, bỏ qua <span class="sublabel">
+        vaccine_name = _first_content(cells[1]).strip()
+        dose_text = text_of(cells[2])
+        date_text = text_of(cells[4])
+        if vaccine_name and date_text:
+            return vaccine_name, dose_text, date_text
+    except Exception as e:
+        print(f"[ERROR] Lỗi trích xuất hàng (vaccine): {e}")
+    return None
+
+
+def vaccine_from_row(row):
+    """Giống utils.extract_vaccine_info nhưng trên <tr> của lxml."""
+    texts = vaccine_texts_from_row(row)
+    if texts is None:
+        return None
+    vaccine_name, dose_text, date_text = texts
+    return {
+        "vaccine_name": vaccine_name,
+        "date": date_text,
+        "dose": dose_text
+    }
+
+
+def extract_vaccines(html_content):
+    """
+    Danh sách mũi tiêm {'vaccine_name', 'date', 'dose'} trong table#tblVacxin.
+    Trả về None nếu không có bảng.
+    """
+    table = find_table(html_content, VACCINE_TABLE_ID)
+    if table is None:
+        return None
+    vaccines = []
+    for row in table_rows(table)[1]:
+        vaccine = vaccine_from_row(row)
+        if vaccine:
+            vaccines.append(vaccine)
+    return vaccines
+
+
+def display_row(row):
+    """
+    (tên gốc, mũi, ngày) của một hàng tblVacxin theo cách đọc của HTMLVaccineParser;
+    None nếu hàng không đủ cột.
+    """
+    cols = cells_of(row)
+    if len(cols) <= 4:
+        return None
+    name_cell = cols[1]
+    name_raw = ""
+    for content in _direct_texts(name_cell):
+        if content.strip():
+            name_raw = content.strip()
+            break
+    if not name_raw:
+        name_raw = text_of(name_cell, separator=" ")
+    return name_raw, text_of(cols[2], strip=False).strip(), text_of(cols[4], strip=False).strip()
+
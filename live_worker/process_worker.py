@@ -4,151 +4,220 @@ Process Worker: Chạy bằng Requests trong một tiến trình riêng biệt.
 Giao tiếp với luồng GUI chính thông qua Queues.
 (ĐÃ LOẠI BỎ HOÀN TOÀN PLAYWRIGHT)
 """
+import os
 import time
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
 import requests
-from bs4 import BeautifulSoup
 
 # Các hằng số và hàm tiện ích đã được cập nhật
 from .constants import (
     LOGIN_URL, INDEX_URL, SEARCH_URL, DETAIL_URL,
     LOGIN_TIMEOUT, FORM_TIMEOUT,
-    ADD_VACCINE_URL
+    ADD_VACCINE_URL, MAX_CONCURRENT_TASKS
 )
-from .utils import extract_subject_info, extract_vaccine_info
+from .protocol import MessageSender, MSG_READY, MSG_LOG, MSG_LOG_BATCH, LOG_LEVELS, DEFAULT_LOG_LEVEL
+from vaccine_record import VaccineRecord
+from . import html_extract
+from .session_pool import SessionPool
+from .session_manager import SessionManager, SessionExpired
 
 # --- State của tiến trình ---
-WORKER_USERNAME = None
-WORKER_PASSWORD = None
+# SessionManager của worker: giữ thông tin đăng nhập, tuổi phiên và đăng nhập lại single-flight
+SESSIONS = None
 DEFAULT_CO_SO_ID = "26953"
+WORKER_LOG_LEVEL = LOG_LEVELS[DEFAULT_LOG_LEVEL]
+# Tác vụ đổi cookie đăng nhập: không chạy song song với tác vụ khác
+EXCLUSIVE_TASKS = ("login", "relogin")
+# Tác vụ chỉ đọc: tác vụ mới cùng kênh huỷ các tác vụ cũ đang chờ/đang chạy
+SUPERSEDE_CHANNELS = {"search_phone": "search", "get_vaccines": "history"}
+# Tác vụ cần phiên đăng nhập: gia hạn chủ động trước khi chạy, gặp trang login thì đăng nhập lại và chạy lại
+AUTHENTICATED_TASKS = ("search_phone", "get_vaccines", "add_vaccine", "ping")
+
+class TaskCancelled(Exception):
+    """Tác vụ đã bị huỷ (bởi lệnh cancel hoặc bị tác vụ mới hơn thay thế)."""
+
+def _check_cancelled(out_queue):
+    """Gọi giữa các bước của một tác vụ: dừng sớm nếu tác vụ đã bị huỷ."""
+    is_cancelled = getattr(out_queue, "is_cancelled", None)
+    if is_cancelled and is_cancelled():
+        raise TaskCancelled()
 
 def _log(out_queue, msg, level="INFO"):
-    """Gửi log về cho GUI qua queue."""
-    out_queue.put({"type": "log", "payload": f"[{level}] {msg}"})
+    """
+    Gửi log về cho GUI, bỏ qua nếu dưới WORKER_LOG_LEVEL.
+    Log của một tác vụ được gom lại (_TaskOutQueue) và gửi kèm message kế tiếp.
+    """
+    if LOG_LEVELS.get(level, LOG_LEVELS["INFO"]) < WORKER_LOG_LEVEL:
+        return
+    line = f"[{level}] {msg}"
+    buffer_log = getattr(out_queue, "buffer_log", None)
+    if buffer_log:
+        buffer_log(line)
+    else:
+        out_queue.put({"type": MSG_LOG, "payload": line})
+
+def _set_log_level(level):
+    global WORKER_LOG_LEVEL
+    level = str(level or DEFAULT_LOG_LEVEL).upper()
+    WORKER_LOG_LEVEL = LOG_LEVELS.get(level, LOG_LEVELS[DEFAULT_LOG_LEVEL])
 
 def _is_login_page(html_content: str) -> bool:
     """Kiểm tra xem nội dung HTML có phải là trang đăng nhập không."""
     return "UserName" in html_content and "__RequestVerificationToken" in html_content
 
 def _extract_subjects_from_html(out_queue, html_content) -> list:
-    """Trích xuất danh sách đối tượng từ HTML (dùng BeautifulSoup)."""
+    """Trích xuất danh sách đối tượng từ HTML (lxml, chỉ parse table#doiTuongSearchResult)."""
     subjects = []
     try:
-        _log(out_queue, "Đang phân tích HTML kết quả tìm kiếm...")
-        soup = BeautifulSoup(html_content, 'lxml')
-        
-        table = soup.find("table", id="doiTuongSearchResult")
-        if not table:
+        _log(out_queue, "Đang phân tích HTML kết quả tìm kiếm...", "DEBUG")
+        table = html_extract.find_table(html_content, html_extract.SEARCH_TABLE_ID)
+        if table is None:
             _log(out_queue, "Không tìm thấy table#doiTuongSearchResult trong HTML.", "WARNING")
             return []
 
-        rows = table.find("tbody").find_all("tr")
-        _log(out_queue, f"Tìm thấy {len(rows)} hàng trong bảng kết quả.")
-
-        for row_tag in rows:
-            subject_info = extract_subject_info(row_tag, out_queue)
+        has_tbody, rows = html_extract.table_rows(table)
+        if not has_tbody:
+            _log(out_queue, "Bảng kết quả không có tbody.", "WARNING")
+            return []
+        _log(out_queue, f"Tìm thấy {len(rows)} hàng trong bảng kết quả.", "DEBUG")
+
+        for row in rows:
+            try:
+                subject_info = html_extract.subject_from_row(row)
+            except Exception as e:
+                _log(out_queue, f"Lỗi trích xuất hàng (subject): {e}", "ERROR")
+                continue
             if subject_info and subject_info.get('id'):
                 subjects.append(subject_info)
+        if WORKER_LOG_LEVEL <= LOG_LEVELS["DEBUG"]:
+            _log(out_queue, "ID đối tượng: " + ", ".join(str(s['id']) for s in subjects), "DEBUG")
         _log(out_queue, f"Trích xuất thành công {len(subjects)} đối tượng.")
     except Exception as e:
         _log(out_queue, f"Lỗi khi trích xuất đối tượng từ HTML: {e}", "ERROR")
     return subjects
 
-def _extract_vaccines_from_html(out_queue, html_content) -> list:
-    """Trích xuất danh sách vắc-xin từ HTML chi tiết (dùng BeautifulSoup)."""
+def _extract_vaccines_from_html(out_queue, html_content):
+    """
+    Trích xuất lịch sử tiêm từ HTML chi tiết (lxml, chỉ parse table#tblVacxin).
+    Trả về (list VaccineRecord đã parse để GUI dùng thẳng, số hàng trong bảng), hoặc None nếu trang
+    không có bảng/tbody (trang lỗi, bảo trì, đổi giao diện) - khi đó không được coi là "chưa tiêm mũi nào".
+    """
     vaccines = []
     try:
-        _log(out_queue, "Đang phân tích HTML chi tiết đối tượng...")
-        soup = BeautifulSoup(html_content, 'lxml')
-        
-        table = soup.find("table", id="tblVacxin")
-        if not table:
+        _log(out_queue, "Đang phân tích HTML chi tiết đối tượng...", "DEBUG")
+        table = html_extract.find_table(html_content, html_extract.VACCINE_TABLE_ID)
+        if table is None:
             _log(out_queue, "Không tìm thấy table#tblVacxin trong HTML.", "WARNING")
-            return []
-
-        rows = table.find("tbody").find_all("tr")
-        _log(out_queue, f"Tìm thấy {len(rows)} mũi tiêm trong bảng.")
-
-        for row_tag in rows:
-            vaccine_info = extract_vaccine_info(row_tag)
-            if vaccine_info:
-                vaccines.append(vaccine_info)
+            return None
+
+        has_tbody, rows = html_extract.table_rows(table)
+        if not has_tbody:
+            _log(out_queue, "Bảng tblVacxin không có tbody.", "WARNING")
+            return None
+        _log(out_queue, f"Tìm thấy {len(rows)} mũi tiêm trong bảng.", "DEBUG")
+
+        skipped = 0
+        for row in rows:
+            texts = html_extract.vaccine_texts_from_row(row)
+            if not texts:
+                continue
+            record = VaccineRecord.parse(*texts)
+            if record is None:
+                skipped += 1
+                continue
+            vaccines.append(record)
         
+        if skipped:
+            _log(out_queue, f"Bỏ qua {skipped} mũi tiêm có ngày không hợp lệ.", "WARNING")
         _log(out_queue, f"Trích xuất xong {len(vaccines)} mũi tiêm.")
     except Exception as e:
         _log(out_queue, f"Lỗi khi trích xuất vắc-xin từ HTML: {e}", "ERROR")
-    return vaccines
+        return None
+    return vaccines, len(rows)
 
-def _perform_login(out_queue, session, username, password):
-    """Thực hiện đăng nhập (phiên bản requests)."""
+def _login_request(out_queue, session, username, password):
+    """Gửi form đăng nhập (phiên bản requests). Raise Exception nếu thất bại; không gửi message nào."""
+    _log(out_queue, f"Mở trang đăng nhập (GET): {LOGIN_URL}")
+    
     try:
-        _log(out_queue, f"Mở trang đăng nhập (GET): {LOGIN_URL}")
-        
-        try:
-            get_response = session.get(LOGIN_URL, timeout=LOGIN_TIMEOUT)
-            get_response.raise_for_status()
-        except requests.RequestException as e:
-            _log(out_queue, f"Lỗi (GET) khi tải trang Login: {e}", "ERROR")
-            raise Exception("Không thể tải trang đăng nhập.")
-
-        _log(out_queue, "Đang tìm kiếm Token chống giả mạo (CSRF)...")
-        soup = BeautifulSoup(get_response.text, 'lxml')
-        token_tag = soup.find("input", {"name": "__RequestVerificationToken"})
+        get_response = session.get(LOGIN_URL, timeout=LOGIN_TIMEOUT)
+        get_response.raise_for_status()
+    except requests.RequestException as e:
+        _log(out_queue, f"Lỗi (GET) khi tải trang Login: {e}", "ERROR")
+        raise Exception("Không thể tải trang đăng nhập.")
+
+    _log(out_queue, "Đang tìm kiếm Token chống giả mạo (CSRF)...", "DEBUG")
+    root = html_extract.parse_document(get_response.text)
+    token_tags = root.xpath('//input[@name="__RequestVerificationToken"]') if root is not None else []
+    token = token_tags[0].get('value') if token_tags else None
+    
+    if token is None:
+        _log(out_queue, "Không tìm thấy __RequestVerificationToken!", "ERROR")
+        raise Exception("Lỗi cấu trúc trang, không tìm thấy token.")
         
-        if not token_tag or 'value' not in token_tag.attrs:
-            _log(out_queue, "Không tìm thấy __RequestVerificationToken!", "ERROR")
-            raise Exception("Lỗi cấu trúc trang, không tìm thấy token.")
-            
-        token = token_tag['value']
-        _log(out_queue, "Đã tìm thấy Token. Đang chuẩn bị (POST)...")
+    _log(out_queue, "Đã tìm thấy Token. Đang chuẩn bị (POST)...", "DEBUG")
 
-        form_data = {
-            '__RequestVerificationToken': (None, token),
-            'UserName': (None, username),
-            'password': (None, password),
-            'remember_me': (None, 'false'),
-        }
+    form_data = {
+        '__RequestVerificationToken': (None, token),
+        'UserName': (None, username),
+        'password': (None, password),
+        'remember_me': (None, 'false'),
+    }
 
-        try:
-            post_response = session.post(
-                LOGIN_URL,
-                files=form_data, 
-                timeout=LOGIN_TIMEOUT,
-                allow_redirects=True 
-            )
-            post_response.raise_for_status()
-        except requests.RequestException as e:
-            _log(out_queue, f"Lỗi (POST) khi gửi thông tin Login: {e}", "ERROR")
-            raise Exception("Gửi thông tin đăng nhập thất bại.")
+    try:
+        post_response = session.post(
+            LOGIN_URL,
+            files=form_data, 
+            timeout=LOGIN_TIMEOUT,
+            allow_redirects=True 
+        )
+        post_response.raise_for_status()
+    except requests.RequestException as e:
+        _log(out_queue, f"Lỗi (POST) khi gửi thông tin Login: {e}", "ERROR")
+        raise Exception("Gửi thông tin đăng nhập thất bại.")
+
+    if INDEX_URL not in post_response.url:
+        _log(out_queue, f"Đăng nhập thất bại. URL cuối cùng: {post_response.url}", "ERROR")
+        raise Exception("Đăng nhập thất bại, sai tên hoặc mật khẩu?")
+        
+    if ".ASPXAUTH" not in session.cookies:
+        _log(out_queue, "Đăng nhập thất bại, không nhận được cookie xác thực.", "ERROR")
+        raise Exception("Lỗi phiên làm việc, không nhận được cookie.")
 
-        if INDEX_URL not in post_response.url:
-            _log(out_queue, f"Đăng nhập thất bại. URL cuối cùng: {post_response.url}", "ERROR")
-            raise Exception("Đăng nhập thất bại, sai tên hoặc mật khẩu?")
-            
-        if ".ASPXAUTH" not in session.cookies:
-            _log(out_queue, "Đăng nhập thất bại, không nhận được cookie xác thực.", "ERROR")
-            raise Exception("Lỗi phiên làm việc, không nhận được cookie.")
+    _log(out_queue, "Đăng nhập thành công, đã vào trang Đối tượng.")
 
-        _log(out_queue, "Đăng nhập thành công, đã vào trang Đối tượng.")
-        out_queue.put({"type": "login_finished", "payload": {"ok": True, "message": "Đăng nhập thành công."}})
+def _perform_login(out_queue, session, username, password):
+    """
+    Đăng nhập theo yêu cầu của GUI. Nếu cookie đã lưu (lần chạy trước) còn mới và cùng tài khoản
+    thì dùng lại luôn, không gửi request nào.
+    """
+    try:
+        reused = SESSIONS.login(out_queue, session, username, password)
+        if reused:
+            age = SESSIONS.age()
+            _log(out_queue, f"Dùng lại phiên đăng nhập đã lưu ({(age or 0) / 60:.0f} phút tuổi).")
+        message = "Dùng lại phiên đăng nhập đã lưu." if reused else "Đăng nhập thành công."
+        out_queue.put({"type": "login_finished", "payload": {"ok": True, "message": message}})
         return True
-
     except Exception as e:
         _log(out_queue, f"Lỗi trong quá trình đăng nhập: {e}", "ERROR")
         out_queue.put({"type": "login_finished", "payload": {"ok": False, "message": f"Lỗi: {e}"}})
         return False
 
-def _perform_relogin(out_queue, session, username, password):
+def _perform_relogin(out_queue, session, username=None, password=None):
     """
-    Thực hiện đăng nhập lại. 
-    Với requests.Session, chúng ta chỉ cần xóa cookie và gọi lại login.
+    Thực hiện đăng nhập lại theo yêu cầu (nút đăng nhập lại / sau session_expired).
+    Với requests.Session, chỉ cần xóa cookie và gọi lại login (SessionManager lo việc xoá cookie).
     """
     _log(out_queue, "Thực hiện Logout (xóa cookies) - Login theo yêu cầu...")
-    session.cookies.clear() # Xóa sạch cookie của phiên cũ
-    
-    if _perform_login(out_queue, session, username, password):
+    try:
+        SESSIONS.login(out_queue, session, username, password, force=True)
         out_queue.put({"type": "relogin_finished", "payload": {"ok": True}})
-    else:
+    except Exception as e:
+        _log(out_queue, f"Lỗi trong quá trình đăng nhập lại: {e}", "ERROR")
         out_queue.put({"type": "relogin_finished", "payload": {"ok": False, "message": "Đăng nhập lại thất bại."}})
 
 def _perform_search(out_queue, session, phone):
@@ -156,8 +225,9 @@ def _perform_search(out_queue, session, phone):
     subjects = []
     try:
         if ".ASPXAUTH" not in session.cookies:
-            raise Exception("Chưa đăng nhập (thiếu cookie .ASPXAUTH).")
+            raise SessionExpired("Chưa đăng nhập (thiếu cookie .ASPXAUTH).")
 
+        _check_cancelled(out_queue)
         _log(out_queue, f"Đang tìm kiếm SĐT (GET): {phone}...")
         
         search_params = {
@@ -190,26 +260,27 @@ def _perform_search(out_queue, session, phone):
         # Kiểm tra xem có bị trả về trang Login không
         if _is_login_page(response.text):
             _log(out_queue, "Phiên làm việc có thể đã hết hạn (nhận được trang login).", "WARNING")
-            raise Exception("Chưa đăng nhập (phiên hết hạn).")
+            raise SessionExpired("Chưa đăng nhập (phiên hết hạn).")
 
+        SESSIONS.touch()
+        _check_cancelled(out_queue)
         subjects = _extract_subjects_from_html(out_queue, response.text)
 
+    except (TaskCancelled, SessionExpired):
+        # Hết phiên: _run_task đăng nhập lại rồi tìm lại, không gửi 'search_finished' rỗng
+        raise
     except Exception as e:
         _log(out_queue, f"Lỗi trong quá trình tìm kiếm SĐT: {e}", "ERROR")
-        if "Chưa đăng nhập" in str(e):
-             out_queue.put({"type": "session_expired"}) 
-    finally:
-        # Chỉ gửi 'search_finished' nếu không có lỗi 'Chưa đăng nhập'
-        if "Chưa đăng nhập" not in str(locals().get('e', '')):
-            out_queue.put({"type": "search_finished", "payload": subjects})
+
+    out_queue.put({"type": "search_finished", "payload": subjects})
 
 def _perform_load_vaccines(out_queue, session, doi_tuong_id):
     """Tải lịch sử tiêm (phiên bản requests)."""
-    vaccines = []
     try:
         if ".ASPXAUTH" not in session.cookies:
-            raise Exception("Chưa đăng nhập (thiếu cookie .ASPXAUTH).")
+            raise SessionExpired("Chưa đăng nhập (thiếu cookie .ASPXAUTH).")
 
+        _check_cancelled(out_queue)
         _log(out_queue, f"Bắt đầu tải lịch sử cho ID: {doi_tuong_id}")
         
         detail_params = {'doiTuongId': doi_tuong_id}
@@ -230,24 +301,35 @@ def _perform_load_vaccines(out_queue, session, doi_tuong_id):
         # Kiểm tra xem có bị trả về trang Login không
         if _is_login_page(response.text):
             _log(out_queue, "Phiên làm việc có thể đã hết hạn (nhận được trang login).", "WARNING")
-            raise Exception("Chưa đăng nhập (phiên hết hạn).")
-
-        vaccines = _extract_vaccines_from_html(out_queue, response.text)
-
+            raise SessionExpired("Chưa đăng nhập (phiên hết hạn).")
+
+        SESSIONS.touch()
+        _check_cancelled(out_queue)
+        extracted = _extract_vaccines_from_html(out_queue, response.text)
+        if extracted is None:
+            raise Exception("Trang chi tiết không có bảng lịch sử tiêm (máy chủ lỗi/bảo trì?).")
+        vaccines, row_count = extracted
+        if row_count and not vaccines:
+            raise Exception(f"Không đọc được mũi tiêm nào trong {row_count} hàng của bảng lịch sử.")
+
+    except (TaskCancelled, SessionExpired):
+        raise
     except Exception as e:
         _log(out_queue, f"Lỗi khi tải lịch sử tiêm: {e}", "ERROR")
-        if "Chưa đăng nhập" in str(e):
-             out_queue.put({"type": "session_expired"})
-    finally:
-        # Chỉ gửi 'vaccines_loaded' nếu không có lỗi 'Chưa đăng nhập'
-        if "Chưa đăng nhập" not in str(locals().get('e', '')):
-            out_queue.put({"type": "vaccines_loaded", "payload": vaccines})
+        # Lỗi mạng/máy chủ: báo riêng để GUI không coi là "không có mũi tiêm nào"
+        # (và không ghi danh sách rỗng vào cache lịch sử)
+        out_queue.put({"type": "history_failed",
+                       "payload": {"doi_tuong_id": doi_tuong_id, "message": str(e)}})
+        return
+
+    # empty_table: bảng có thật và không có hàng nào - chỉ khi đó danh sách rỗng mới được ghi vào cache
+    out_queue.put({"type": "vaccines_loaded", "payload": vaccines, "empty_table": row_count == 0})
 
 def _perform_add_vaccine(out_queue, session, payload):
     """Thực hiện thêm mới mũi tiêm (phiên bản requests)."""
     try:
         if ".ASPXAUTH" not in session.cookies:
-            raise Exception("Chưa đăng nhập (thiếu cookie .ASPXAUTH).")
+            raise SessionExpired("Chưa đăng nhập (thiếu cookie .ASPXAUTH).")
 
         doi_tuong_id = payload.get('DOI_TUONG_ID')
         vacxin_id = payload.get('VACXIN_ID')
@@ -280,91 +362,277 @@ def _perform_add_vaccine(out_queue, session, payload):
         try:
             json_response = response.json()
             if json_response.get("Status") == 1:
+                SESSIONS.touch()
                 _log(out_queue, f"Thêm thành công! Đang tự động tải lại lịch sử tiêm...")
-                _perform_load_vaccines(out_queue, session, doi_tuong_id)
+                out_queue.put({"type": "vaccine_added", "payload": {"doi_tuong_id": doi_tuong_id}})
+                _reload_after_add(out_queue, session, doi_tuong_id)
             else:
                 error_msg = json_response.get("Message", "Lỗi không xác định từ máy chủ.")
                 _log(out_queue, f"Máy chủ báo lỗi: {error_msg}", "ERROR")
                 out_queue.put({"type": "add_vaccine_failed", "payload": {"message": error_msg}})
+        except (TaskCancelled, SessionExpired):
+            raise
         except Exception as e:
-            # Kiểm tra xem có bị trả về trang Login không
+            # Kiểm tra xem có bị trả về trang Login không (mũi tiêm chưa được thêm, chạy lại an toàn)
             if _is_login_page(response.text):
                 _log(out_queue, "Phiên làm việc có thể đã hết hạn (nhận được trang login).", "WARNING")
-                raise Exception("Chưa đăng nhập (phiên hết hạn).")
+                raise SessionExpired("Chưa đăng nhập (phiên hết hạn).")
             
             _log(out_queue, f"Lỗi khi đọc JSON phản hồi: {e}. Phản hồi thô: {response.text}", "ERROR")
             raise Exception("Phản hồi không phải JSON.")
 
+    except (TaskCancelled, SessionExpired):
+        raise
     except Exception as e:
         _log(out_queue, f"Lỗi trong quá trình thêm vắc-xin: {e}", "ERROR")
-        if "Chưa đăng nhập" in str(e):
-             out_queue.put({"type": "session_expired"})
-        else:
-            out_queue.put({"type": "add_vaccine_failed", "payload": {"message": str(e)}})
+        out_queue.put({"type": "add_vaccine_failed", "payload": {"message": str(e)}})
+
+def _reload_after_add(out_queue, session, doi_tuong_id):
+    """
+    Tải lại lịch sử sau khi thêm mũi tiêm. Không để SessionExpired lọt ra ngoài: _run_task sẽ chạy lại
+    cả tác vụ add_vaccine (thêm trùng mũi). Hết phiên thì tự đăng nhập lại và tải lại một lần.
+    """
+    for attempt in range(2):
+        generation = SESSIONS.generation
+        try:
+            _perform_load_vaccines(out_queue, session, doi_tuong_id)
+            return
+        except SessionExpired as e:
+            _log(out_queue, f"Hết phiên khi tải lại lịch sử: {e}", "WARNING")
+            if attempt or not SESSIONS.renew(out_queue, session, generation):
+                break
+    out_queue.put({"type": "history_failed", "payload": {
+        "doi_tuong_id": doi_tuong_id, "message": "Đã thêm mũi tiêm nhưng không tải lại được lịch sử (phiên hết hạn)."}})
 
 def _perform_ping(out_queue, session):
-    """Gửi request nhẹ để giữ phiên làm việc không bị timeout."""
+    """
+    Gửi request nhẹ để giữ phiên làm việc không bị timeout.
+    Nhận về trang login thì raise SessionExpired: _run_task đăng nhập lại ngay, trước khi người dùng cần tới.
+    """
+    # Chỉ ping nếu đang có cookie đăng nhập
+    if ".ASPXAUTH" not in session.cookies:
+        return
     try:
-        # Chỉ ping nếu đang có cookie đăng nhập
-        if ".ASPXAUTH" in session.cookies:
-            # Gọi trang Index (rất nhẹ) để server gia hạn session
-            session.get(INDEX_URL, timeout=10)
-            # (Tùy chọn) Ghi log để debug nếu cần
-            # _log(out_queue, "Đã gửi Ping giữ kết nối.", "INFO") 
+        # Gọi trang Index (rất nhẹ) để server gia hạn session
+        response = session.get(INDEX_URL, timeout=10)
     except Exception:
-        pass # Lỗi ping thì bỏ qua, không cần báo người dùng
+        return # Lỗi ping thì bỏ qua, không cần báo người dùng
+    if _is_login_page(response.text):
+        raise SessionExpired("Phiên hết hạn (ping nhận được trang login).")
+    SESSIONS.touch()
+    _log(out_queue, "Đã gửi Ping giữ kết nối.", "DEBUG")
+
+class _TaskRegistry:
+    """Các tác vụ đang chờ/đang chạy (task_id -> kênh) và các tác vụ đã huỷ; dùng chung giữa các luồng."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = {}
+        self._cancelled = {}  # task_id -> lý do
+
+    def register(self, task_id, channel=None):
+        """Ghi nhận tác vụ mới; huỷ các tác vụ cũ cùng kênh. Trả về danh sách task_id bị thay thế."""
+        with self._lock:
+            superseded = []
+            if channel:
+                superseded = [tid for tid, ch in self._active.items() if ch == channel and tid not in self._cancelled]
+                for tid in superseded:
+                    self._cancelled[tid] = "superseded"
+            self._active[task_id] = channel
+        return superseded
+
+    def cancel(self, task_ids):
+        with self._lock:
+            for tid in task_ids:
+                if tid in self._active:
+                    self._cancelled.setdefault(tid, "cancelled")
+
+    def cancel_reason(self, task_id):
+        return self._cancelled.get(task_id)
+
+    def finish(self, task_id):
+        with self._lock:
+            self._active.pop(task_id, None)
+            self._cancelled.pop(task_id, None)
+
+class _TaskOutQueue:
+    """
+    Gắn task_id của tác vụ vào mọi message gửi về GUI để WorkerMonitor định tuyến kết quả.
+    Log được gom lại và gửi kèm message kế tiếp (hoặc flush() khi tác vụ kết thúc),
+    nên một lần tìm kiếm chỉ tốn một message IPC.
+    Sau khi tác vụ bị huỷ, chỉ còn log và task_cancelled được gửi đi.
+    """
+    __slots__ = ("_out_queue", "task_id", "_registry", "_logs")
+    PASS_WHEN_CANCELLED = ("task_cancelled",)
+
+    def __init__(self, out_queue, task_id, registry=None):
+        self._out_queue = out_queue
+        self.task_id = task_id
+        self._registry = registry
+        self._logs = []
+
+    def buffer_log(self, line):
+        self._logs.append(line)
+
+    def flush(self):
+        if self._logs:
+            self._send({"type": MSG_LOG_BATCH})
+
+    def is_cancelled(self):
+        return self._registry is not None and self.task_id is not None and self._registry.cancel_reason(self.task_id) is not None
+
+    def put(self, message):
+        if message.get("type") == MSG_LOG:
+            self.buffer_log(message.get("payload"))
+            return
+        if message.get("type") not in self.PASS_WHEN_CANCELLED and self.is_cancelled():
+            return
+        self._send(message)
+
+    def _send(self, message):
+        message = dict(message)
+        if self.task_id is not None:
+            message["task_id"] = self.task_id
+        if self._logs:
+            message["logs"], self._logs = self._logs, []
+        self._out_queue.put(message)
+
+def _dispatch(task_queue, session, task_type, payload):
+    if task_type == "login":
+        _perform_login(task_queue, session, **payload)
+
+    elif task_type == "search_phone":
+        _perform_search(task_queue, session, **payload)
+
+    elif task_type == "get_vaccines":
+        _perform_load_vaccines(task_queue, session, **payload)
+
+    elif task_type == "relogin":
+        _perform_relogin(task_queue, session, payload.get("username"), payload.get("password"))
+
+    elif task_type == "add_vaccine":
+        _perform_add_vaccine(task_queue, session, payload)
 
-def playwright_process_worker(in_queue, out_queue):
+    elif task_type == "ping":
+        _perform_ping(task_queue, session)
+
+def _run_task(out_queue, pool, task, registry=None):
+    """
+    Thực thi một tác vụ trên một session mượn từ pool (chạy trong luồng của executor hoặc luồng chính).
+    Tác vụ cần đăng nhập: phiên cũ thì gia hạn trước; gặp SessionExpired thì đăng nhập lại (single-flight,
+    SessionManager.renew) rồi chạy lại một lần. Chỉ khi không đăng nhập lại được mới báo session_expired về GUI.
+    """
+    task_type = task.get("type")
+    payload = task.get("payload") or {}
+    task_id = task.get("task_id")
+    task_queue = _TaskOutQueue(out_queue, task_id, registry)
+
+    try:
+        _check_cancelled(task_queue)
+        with pool.session() as session:
+            if task_type not in AUTHENTICATED_TASKS:
+                _dispatch(task_queue, session, task_type, payload)
+                return
+            for attempt in range(2):
+                generation = SESSIONS.generation
+                try:
+                    SESSIONS.ensure_fresh(task_queue, session)
+                    _check_cancelled(task_queue)
+                    _dispatch(task_queue, session, task_type, payload)
+                    break
+                except SessionExpired as e:
+                    _log(task_queue, f"Phiên hết hạn khi chạy '{task_type}' #{task_id}: {e}", "WARNING")
+                    if attempt == 0 and SESSIONS.renew(task_queue, session, generation):
+                        _log(task_queue, f"Đã có phiên mới, chạy lại '{task_type}' #{task_id}.")
+                        continue
+                    task_queue.put({"type": "session_expired"})
+                    break
+
+    except TaskCancelled:
+        reason = registry.cancel_reason(task_id) if registry else "cancelled"
+        _log(task_queue, f"Đã huỷ tác vụ '{task_type}' #{task_id} ({reason}).")
+        task_queue.put({"type": "task_cancelled", "payload": {"task_type": task_type, "reason": reason}})
+    except Exception as e:
+        _log(task_queue, f"Lỗi khi thực thi tác vụ '{task_type}': {e}", "ERROR")
+        task_queue.put({"type": f"{task_type}_finished", "payload": {"ok": False, "message": str(e)}})
+    finally:
+        task_queue.flush()
+        if registry and task_id is not None:
+            registry.finish(task_id)
+
+def playwright_process_worker(in_queue, out_queue, max_concurrency=MAX_CONCURRENT_TASKS):
     """
     Hàm chính cho tiến trình worker (ĐÃ VIẾT LẠI BẰNG REQUESTS).
+    Các tác vụ chạy song song trên tối đa `max_concurrency` luồng, mỗi luồng một session
+    (chung cookie đăng nhập). login/relogin chạy độc quyền: chờ các tác vụ đang chạy xong
+    rồi mới đổi cookie, các tác vụ đến sau chỉ được nhận khi đăng nhập xong.
+    Lệnh {"type": "cancel", "payload": {"task_ids": [...]}} huỷ tác vụ đang chờ/đang chạy;
+    search_phone/get_vaccines mới tự huỷ các tác vụ cũ cùng loại (SUPERSEDE_CHANNELS),
+    trừ tác vụ có "background": True (tải trước lịch sử).
+    Phiên đăng nhập do SessionManager giữ: nạp lại cookie đã lưu khi khởi động, gia hạn chủ động,
+    đăng nhập lại một lần cho mọi tác vụ cùng gặp hết phiên rồi chạy lại các tác vụ đó.
+
+    out_queue: đối tượng có put() (vd. Queue) hoặc tuple (address, authkey) của kênh
+    message do WorkerService mở (xem live_worker/protocol.py).
     """
-    global WORKER_USERNAME, WORKER_PASSWORD
-    
-    _log(out_queue, "Tiến trình Requests đã khởi động.")
-    
+    sender = None
+    if isinstance(out_queue, tuple):
+        sender = out_queue = MessageSender.connect(*out_queue)
+
     try:
-        with requests.Session() as session:
-            session.headers.update({
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36 Edg/141.0.0.0'
-            })
-            
+        max_concurrency = max(1, int(max_concurrency))
+    except (TypeError, ValueError):
+        max_concurrency = MAX_CONCURRENT_TASKS
+
+    _log(out_queue, f"Tiến trình Requests đã khởi động (tối đa {max_concurrency} tác vụ song song).")
+
+    global SESSIONS
+    pool = None
+    registry = _TaskRegistry()
+    try:
+        pool = SessionPool(max_concurrency)
+        SESSIONS = SessionManager(pool, _login_request, _log)
+        if SESSIONS.load():
+            _log(out_queue, f"Đã nạp lại phiên đăng nhập của '{SESSIONS.username}' "
+                            f"({SESSIONS.age() / 60:.0f} phút tuổi).")
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="vncdc") as executor:
             _log(out_queue, "Session đã sẵn sàng.")
-            out_queue.put({"type": "log", "payload": "Trình duyệt (giả mạo) đã sẵn sàng."})
+            out_queue.put({"type": MSG_READY, "payload": {"pid": os.getpid(), "max_concurrency": max_concurrency}})
 
+            in_flight = set()
             while True:
-                task = in_queue.get() 
+                task = in_queue.get()
                 if task is None:
                     break
-                
-                task_type = task.get("type")
-                payload = task.get("payload")
 
-                try:
-                    if task_type == "login":
-                        WORKER_USERNAME = payload.get("username")
-                        WORKER_PASSWORD = payload.get("password")
-                        _perform_login(out_queue, session, **payload)
-                    
-                    elif task_type == "search_phone":
-                        _perform_search(out_queue, session, **payload)
-                    
-                    elif task_type == "get_vaccines":
-                        _perform_load_vaccines(out_queue, session, **payload)
-                    
-                    elif task_type == "relogin":
-                        _perform_relogin(out_queue, session, WORKER_USERNAME, WORKER_PASSWORD)
-                    
-                    elif task_type == "add_vaccine":
-                        _perform_add_vaccine(out_queue, session, payload)
-                        
-                    elif task_type == "ping":
-                        _perform_ping(out_queue, session)
-                
-                except Exception as e:
-                    _log(out_queue, f"Lỗi khi thực thi tác vụ '{task_type}': {e}", "ERROR")
-                    out_queue.put({"type": f"{task_type}_finished", "payload": {"ok": False, "message": str(e)}})
+                task_type = task.get("type")
+                if task_type == "cancel":
+                    registry.cancel((task.get("payload") or {}).get("task_ids", []))
+                    continue
+                if task_type == "set_log_level":
+                    _set_log_level((task.get("payload") or {}).get("level"))
+                    continue
+
+                if task.get("task_id") is not None:
+                    # Tác vụ nền (tải trước lịch sử) không thay thế/bị thay thế bởi tác vụ của người dùng
+                    channel = None if task.get("background") else SUPERSEDE_CHANNELS.get(task_type)
+                    registry.register(task["task_id"], channel)
+
+                in_flight = {f for f in in_flight if not f.done()}
+                if task_type in EXCLUSIVE_TASKS:
+                    wait(in_flight)
+                    in_flight.clear()
+                    _run_task(out_queue, pool, task, registry)
+                else:
+                    in_flight.add(executor.submit(_run_task, out_queue, pool, task, registry))
 
     except Exception as e:
         _log(out_queue, f"Lỗi nghiêm trọng trong tiến trình worker: {e}", "ERROR")
     finally:
-        _log(out_queue, "Tiến trình Requests đã đóng.")
\ No newline at end of file
+        if SESSIONS:
+            SESSIONS.save()
+        if pool:
+            pool.close()
+        _log(out_queue, "Tiến trình Requests đã đóng.")
+        if sender:
+            sender.close()
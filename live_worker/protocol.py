@@ -0,0 +1,75 @@
+# live_worker/protocol.py
+"""
+Giao thức message worker -> GUI.
+Mỗi message là một envelope dict: {"v": PROTOCOL_VERSION, "type": ..., "payload": ..., "task_id": ...}
+(task_id chỉ có với message thuộc một tác vụ). "logs": [...] (nếu có) là các dòng log của tác vụ
+được gom lại, gửi kèm message kế tiếp thay vì mỗi dòng một message.
+Envelope được gửi qua multiprocessing Connection trên socket loopback để GUI có thể chờ
+bằng QSocketNotifier thay vì polling.
+"""
+import threading
+from multiprocessing.connection import Client
+
+PROTOCOL_VERSION = 1
+
+# --- Loại message ---
+MSG_READY = "ready"                    # worker đã sẵn sàng nhận tác vụ (payload: pid, max_concurrency)
+MSG_LOG = "log"
+MSG_LOG_BATCH = "log_batch"            # chỉ mang "logs" (phần log còn lại khi tác vụ kết thúc)
+MSG_LOGIN_FINISHED = "login_finished"
+MSG_RELOGIN_FINISHED = "relogin_finished"
+MSG_SEARCH_FINISHED = "search_finished"
+MSG_VACCINES_LOADED = "vaccines_loaded"    # payload: list VaccineRecord; "empty_table": bảng có thật nhưng không có hàng
+MSG_SESSION_EXPIRED = "session_expired"
+MSG_ADD_VACCINE_FAILED = "add_vaccine_failed"
+MSG_TASK_CANCELLED = "task_cancelled"
+MSG_HISTORY_FAILED = "history_failed"    # tải lịch sử lỗi (không phải hết phiên): payload doi_tuong_id, message
+MSG_VACCINE_ADDED = "vaccine_added"      # thêm mũi tiêm thành công: payload doi_tuong_id
+MSG_SEARCH_FAILED = "search_failed"      # tìm kiếm không có kết quả vì lỗi (GUI tự tạo khi mất worker): payload phone, message
+
+# Mức log của worker (GUI đổi lúc chạy bằng tác vụ "set_log_level")
+LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+DEFAULT_LOG_LEVEL = "INFO"
+
+
+def make_envelope(message):
+    """Gắn số phiên bản giao thức vào message (dict type/payload/task_id)."""
+    envelope = {"v": PROTOCOL_VERSION, "type": message.get("type"), "payload": message.get("payload")}
+    if message.get("task_id") is not None:
+        envelope["task_id"] = message["task_id"]
+    if message.get("logs"):
+        envelope["logs"] = message["logs"]
+    if message.get("empty_table"):
+        envelope["empty_table"] = True
+    return envelope
+
+
+class MessageSender:
+    """
+    Đầu gửi của kênh message phía worker, cùng giao diện put() với Queue để
+    các hàm _perform_* không cần biết kênh bên dưới. Dùng được từ nhiều luồng.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, address, authkey):
+        return cls(Client(address, authkey=authkey))
+
+    def put(self, message):
+        envelope = make_envelope(message)
+        with self._lock:
+            try:
+                self._conn.send(envelope)
+            except (OSError, EOFError, ValueError):
+                # GUI đã đóng kênh (đang thoát) - bỏ qua message
+                pass
+
+    def close(self):
+        with self._lock:
+            try:
+                self._conn.close()
+            except OSError:
+                pass
@@ -0,0 +1,216 @@
+# live_worker/session_manager.py
+"""
+Quản lý phiên đăng nhập VNCDC (.ASPXAUTH) dùng chung cho mọi luồng của worker.
+
+- Theo dõi tuổi phiên: lúc đăng nhập (obtained_at) và lần cuối một request đã xác thực thành công
+  (last_ok). Phiên rảnh quá SESSION_IDLE_TIMEOUT hoặc cũ quá SESSION_MAX_AGE được coi là sắp/đã hết
+  hạn: ensure_fresh() đăng nhập lại trước khi tác vụ gửi request.
+- Single-flight: nhiều luồng cùng gặp trang login chỉ gây ra MỘT lần đăng nhập lại. Mỗi lần đăng nhập
+  thành công tăng generation; luồng nào thấy generation đã đổi so với lúc nó bắt đầu thì chỉ việc chạy lại.
+- Lưu cookie ra SESSION_STATE_FILE (không lưu mật khẩu) để lần mở ứng dụng sau dùng lại phiên
+  mà không cần đăng nhập; phiên đọc lại mà đã hết hạn thì tác vụ đầu tiên tự đăng nhập lại.
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+from .constants import SESSION_IDLE_TIMEOUT, SESSION_MAX_AGE, SESSION_STATE_FILE
+
+STATE_VERSION = 1
+# Ghi lại last_ok ra file tối đa mỗi chừng này giây (để worker dự phòng/lần mở sau biết phiên còn mới)
+SAVE_INTERVAL = 60
+
+
+def get_base_path():
+    return os.path.dirname(os.path.abspath(sys.argv[0] if hasattr(sys, 'frozen') else __file__))
+
+
+class SessionExpired(Exception):
+    """Máy chủ trả về trang đăng nhập hoặc thiếu cookie .ASPXAUTH."""
+
+
+class SessionManager:
+    """
+    login_func(out_queue, session, username, password): đăng nhập trên session, raise nếu thất bại.
+    log_func(out_queue, msg, level): ghi log về GUI (mặc định print).
+    Mọi session của pool dùng chung một cookie jar nên đăng nhập trên một session là đủ.
+    """
+
+    def __init__(self, pool, login_func, log_func=None, state_path=None,
+                 idle_timeout=SESSION_IDLE_TIMEOUT, max_age=SESSION_MAX_AGE):
+        self.pool = pool
+        self._login_func = login_func
+        self._log_func = log_func
+        self.state_path = state_path if state_path is not None else os.path.join(get_base_path(), SESSION_STATE_FILE)
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self.generation = 0
+        self.username = None
+        self._password = None
+        self.obtained_at = None
+        self.last_ok = None
+        self._saved_at = 0.0
+
+    # --- Trạng thái ---
+    def set_credentials(self, username, password):
+        if username and password:
+            self.username, self._password = username, password
+
+    def has_credentials(self):
+        return bool(self.username and self._password)
+
+    def age(self, now=None):
+        return None if self.obtained_at is None else (now or time.time()) - self.obtained_at
+
+    def is_stale(self, now=None):
+        """True nếu không có cookie hoặc phiên nhiều khả năng đã hết hạn phía máy chủ."""
+        if not self.pool.is_logged_in() or self.obtained_at is None or self.last_ok is None:
+            return True
+        now = now or time.time()
+        return now - self.last_ok > self.idle_timeout or now - self.obtained_at > self.max_age
+
+    def touch(self):
+        """Gọi sau mỗi request đã xác thực thành công (máy chủ đã gia hạn phiên)."""
+        self.last_ok = time.time()
+        if self.last_ok - self._saved_at > SAVE_INTERVAL:
+            self.save()
+
+    # --- Đăng nhập ---
+    def login(self, out_queue, session, username, password, force=False):
+        """
+        Đăng nhập theo yêu cầu của GUI. Trả về True nếu dùng lại phiên còn mới của cùng tài khoản
+        (không tốn request nào), False nếu đã đăng nhập mới. Raise nếu đăng nhập thất bại.
+        username/password None: dùng thông tin đăng nhập đã có.
+        """
+        with self._lock:
+            same_user = username is None or self.username == username
+            self.set_credentials(username, password)
+            if not force and same_user and not self.is_stale():
+                return True
+            self._login_locked(out_queue, session)
+            return False
+
+    def renew(self, out_queue, session, seen_generation):
+        """
+        Đăng nhập lại vì phiên hết hạn khi tác vụ đang chạy với generation = seen_generation.
+        Nhiều luồng gọi cùng lúc: luồng đầu đăng nhập, các luồng sau chờ rồi dùng luôn phiên mới.
+        Trả về True nếu đã có phiên mới (tác vụ nên chạy lại), False nếu không thể đăng nhập lại.
+        """
+        if not self.has_credentials():
+            return False
+        with self._lock:
+            if self.generation != seen_generation and self.pool.is_logged_in():
+                return True
+            try:
+                self._login_locked(out_queue, session)
+                return True
+            except Exception:
+                return False
+
+    def ensure_fresh(self, out_queue, session):
+        """Gọi trước tác vụ cần đăng nhập: phiên đã cũ/rảnh quá lâu thì đăng nhập lại trước."""
+        if not self.has_credentials() or not self.is_stale():
+            return
+        generation = self.generation
+        with self._lock:
+            if self.generation != generation or not self.is_stale():
+                return
+            try:
+                self._login_locked(out_queue, session, reason="gia hạn chủ động")
+            except Exception:
+                pass  # Tác vụ vẫn chạy; gặp trang login thì GUI được báo session_expired như trước
+
+    def _login_locked(self, out_queue, session, reason=None):
+        if reason:
+            age = self.age()
+            age_text = f", tuổi phiên {age / 60:.0f} phút" if age is not None else ""
+            self._log(out_queue, f"Đăng nhập lại ({reason}{age_text}).")
+        self.pool.clear_cookies()
+        try:
+            self._login_func(out_queue, session, self.username, self._password)
+        except Exception:
+            self.forget()
+            raise
+        self.obtained_at = self.last_ok = time.time()
+        self.generation += 1
+        self.save()
+
+    def _log(self, out_queue, msg, level="INFO"):
+        if self._log_func and out_queue is not None:
+            self._log_func(out_queue, msg, level)
+        else:
+            print(f"[SESSION] {msg}")
+
+    # --- Lưu / đọc cookie ---
+    def save(self):
+        if not self.state_path or not self._save_lock.acquire(blocking=False):
+            return
+        try:
+            if not self.pool.is_logged_in() or not self.username:
+                return
+            state = {
+                "version": STATE_VERSION,
+                "username": self.username,
+                "obtained_at": self.obtained_at,
+                "last_ok": self.last_ok,
+                "cookies": [
+                    {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+                     "expires": c.expires, "secure": c.secure}
+                    for c in self.pool.cookies
+                ],
+            }
+            tmp_path = self.state_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+            self._saved_at = time.time()
+        except (OSError, TypeError, ValueError) as e:
+            print(f"[SESSION] Không lưu được phiên đăng nhập: {e}")
+        finally:
+            self._save_lock.release()
+
+    def load(self):
+        """Nạp cookie đã lưu nếu còn trong hạn MAX_AGE. Trả về True nếu đã khôi phục được phiên."""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return False
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("version") != STATE_VERSION or not state.get("cookies"):
+                return False
+            obtained_at = float(state["obtained_at"])
+            now = time.time()
+            if now - obtained_at > self.max_age:
+                self.forget()
+                return False
+            for c in state["cookies"]:
+                if c.get("expires") is not None and c["expires"] < now:
+                    continue
+                self.pool.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path") or "/",
+                                      expires=c.get("expires"), secure=bool(c.get("secure")))
+            if not self.pool.is_logged_in():
+                return False
+            self.username = state.get("username")
+            self.obtained_at = obtained_at
+            self.last_ok = float(state.get("last_ok") or obtained_at)
+            self._saved_at = now
+            return True
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            print(f"[SESSION] Bỏ qua file phiên đăng nhập lỗi: {e}")
+            self.pool.clear_cookies()
+            return False
+
+    def forget(self):
+        """Xoá cookie và file phiên đã lưu (đăng nhập thất bại / phiên hỏng)."""
+        self.pool.clear_cookies()
+        self.obtained_at = self.last_ok = None
+        if self.state_path:
+            try:
+                os.remove(self.state_path)
+            except OSError:
+                pass
+
@@ -0,0 +1,52 @@
+# live_worker/session_pool.py
+"""
+Pool các requests.Session đã đăng nhập cho tiến trình worker.
+Mọi session dùng chung MỘT cookie jar nên đăng nhập trên một session là
+tất cả đều có .ASPXAUTH; mỗi session giữ connection pool HTTP riêng để
+các luồng không tranh nhau một kết nối.
+"""
+import queue
+from contextlib import contextmanager
+
+import requests
+from requests.cookies import RequestsCookieJar
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36 Edg/141.0.0.0'
+}
+
+
+class SessionPool:
+    def __init__(self, size, headers=None):
+        self.size = max(1, int(size))
+        self.cookies = RequestsCookieJar()
+        self._sessions = []
+        self._idle = queue.LifoQueue()
+        for _ in range(self.size):
+            session = requests.Session()
+            session.headers.update(headers or DEFAULT_HEADERS)
+            session.cookies = self.cookies
+            self._sessions.append(session)
+            self._idle.put(session)
+
+    @contextmanager
+    def session(self):
+        """Mượn một session (chờ nếu tất cả đang bận)."""
+        session = self._idle.get()
+        try:
+            yield session
+        finally:
+            self._idle.put(session)
+
+    def is_logged_in(self):
+        return ".ASPXAUTH" in self.cookies
+
+    def clear_cookies(self):
+        self.cookies.clear()
+
+    def close(self):
+        for session in self._sessions:
+            try:
+                session.close()
+            except Exception:
+                pass
@@ -36,20 +36,15 @@ def extract_subject_info(row_tag, out_queue) -> dict:
             id_value = id_value.strip()
         # ---------------------------------------------------
         
-        out_queue.put({"type": "log", "payload": f"[Debug] Đang xử lý hàng. data-id: '{id_value}'"})
-        
         cells = row_tag.find_all("td")
         if len(cells) < 5:
-            out_queue.put({"type": "log", "payload": f"[Debug]   -> Lỗi: Hàng không đủ 5 ô (td)."})
             return None
 
         # Lấy tên từ td thứ 2
         name = cells[1].get_text(strip=True)
-        out_queue.put({"type": "log", "payload": f"[Debug]   -> Tên: {name}"})
         
         # Lấy năm sinh từ td cuối cùng (thứ 5)
         birth = cells[4].get_text(strip=True)
-        out_queue.put({"type": "log", "payload": f"[Debug]   -> Năm sinh: {birth}"})
         
         return {
             'name': name,
@@ -5,18 +5,29 @@ import sys
 def get_base_path():
     return os.path.dirname(os.path.abspath(sys.argv[0] if hasattr(sys, 'frozen') else __file__))
 
+# (mtime của vaccine_list.json, dữ liệu) - chỉ đọc lại file khi nó thay đổi (vd. sau "Cập nhật Dữ liệu Online")
+_vaccine_list_cache = (None, None)
+
 def get_vaccine_list():
     """
     Tải danh sách vắc-xin. Ưu tiên file 'vaccine_list.json' nằm cùng thư mục chạy.
     Nếu không có, sử dụng danh sách mặc định.
     """
+    global _vaccine_list_cache
     # Ưu tiên tìm file json cập nhật
     json_path = os.path.join(get_base_path(), "vaccine_list.json")
-    if os.path.exists(json_path):
+    try:
+        mtime = os.path.getmtime(json_path)
+    except OSError:
+        mtime = None
+    if mtime is not None:
+        if _vaccine_list_cache[0] == mtime:
+            return _vaccine_list_cache[1]
         try:
             with open(json_path, "r", encoding="utf-8") as f:
                 data = json.load(f)
                 if isinstance(data, list) and len(data) > 0:
+                    _vaccine_list_cache = (mtime, data)
                     return data
         except Exception as e:
             print(f"Lỗi đọc file vaccine_list.json: {e}")
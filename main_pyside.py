@@ -1,31 +1,75 @@
 import sys
 import os
 import multiprocessing
-from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import Qt, qInstallMessageHandler
-from ui_pyside.main_window import MainWindow
-from ui_pyside.splash_screen import SplashScreenManager
-# Update import to use the new package structure
-from controllers.main_controller import MainController
+
+# Chế độ đo thời gian import: python main_pyside.py --import-times [report.json]
+IMPORT_TIMES_FLAG = "--import-times"
+# Các phần chỉ được import khi dùng tới (xuất ảnh/Excel, HIS, cập nhật danh sách vắc-xin, worker...)
+DEFERRED_MODULES = ["requests", "PIL.Image", "pyodbc", "xlsxwriter", "bs4", "lxml.etree", "live_worker.process_worker"]
 
 def qt_message_handler(mode, context, message):
     if "SetProcessDpiAwarenessContext() failed" in message: return
 
+def load_app():
+    """Import phần nặng của ứng dụng. Để trong hàm để tiến trình worker (spawn) không phải import GUI."""
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import Qt, qInstallMessageHandler
+    from ui_pyside.main_window import MainWindow
+    from startup import StartupOrchestrator
+    # Update import to use the new package structure
+    from controllers.main_controller import MainController
+    return QApplication, Qt, qInstallMessageHandler, MainWindow, MainController, StartupOrchestrator
+
+def report_import_times(argv):
+    """Đo import lúc khởi động (load_app) và các phần import muộn, in bảng và ghi JSON nếu có đường dẫn."""
+    import importlib
+    import json
+    from import_profiler import ImportProfiler, build_report
+
+    args = argv[argv.index(IMPORT_TIMES_FLAG) + 1:]
+    output = args[0] if args and not args[0].startswith("-") else None
+
+    startup = ImportProfiler().install()
+    load_app()
+    startup.uninstall()
+
+    deferred = ImportProfiler().install()
+    for name in DEFERRED_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"[import-times] Bỏ qua {name}: {e}", file=sys.stderr)
+    deferred.uninstall()
+
+    sections = {"startup": startup.as_dict(), "deferred": deferred.as_dict()}
+    print(ImportProfiler.format_report(startup.as_dict(top=40), "Khởi động (load_app)"), file=sys.stderr)
+    print(ImportProfiler.format_report(deferred.as_dict(top=15), "Import muộn"), file=sys.stderr)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(build_report(sections, argv), f, ensure_ascii=False, indent=2)
+        print(f"[import-times] Đã ghi {output}", file=sys.stderr)
+    return 0
+
 def main():
+    # Bản đóng gói: tiến trình worker chạy lại file này, freeze_support() phải đứng trước mọi import GUI
+    multiprocessing.freeze_support()
+    if IMPORT_TIMES_FLAG in sys.argv:
+        return report_import_times(sys.argv)
+
+    QApplication, Qt, qInstallMessageHandler, MainWindow, MainController, StartupOrchestrator = load_app()
     qInstallMessageHandler(qt_message_handler)
     os.environ["QT_QPA_PLATFORM"] = "windows:darkmode=2"
     try: QApplication.setHighDpiScaleFactorRoundingPolicy(Qt.HighDpiScaleFactorRoundingPolicy.PassThrough)
     except Exception: pass
-    multiprocessing.freeze_support()
-    
+
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
-    
-    # Use splash screen manager to handle startup
-    splash_manager = SplashScreenManager(MainWindow, MainController)
-    splash_manager.start()
-    
-    sys.exit(app.exec())
+
+    # Splash + khởi động song song: worker/đăng nhập, quy tắc, HIS chạy trong lúc dựng cửa sổ
+    startup = StartupOrchestrator(MainWindow, MainController)
+    startup.start()
+
+    return app.exec()
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,6 +1,5 @@
 # post_processor.py
 from datetime import date, timedelta
-from utils import VaccineAnalysisUtils
 
 def get_vaccine_live_status_by_norm_name(norm_name, vaccine_rules):
     """
@@ -18,6 +17,29 @@ def get_vaccine_live_status_by_norm_name(norm_name, vaccine_rules):
                     return True
     return False
 
+def _rule_live_decision(rule_key, rule, popup_name, description):
+    """
+    Evaluates a single rule whose display name matched the popup name.
+    Returns True/False when the rule decides the live status, None to keep looking at other rules.
+    """
+    if rule_key == "JE_Group":
+        live_mentioned = "imojev" in description or "jeev" in description
+        inactivated_mentioned = "jevax" in description or "vnnb" in description
+        if live_mentioned and not inactivated_mentioned: return True
+        if inactivated_mentioned and not live_mentioned: return False
+
+    if rule.get("is_live"): return True 
+    
+    if "courses" in rule:
+        for course in rule.get("courses", []):
+            if course.get("display") and course.get("display").lower() in description:
+                return course.get("is_live", False)
+        if any(course.get("is_live") for course in rule.get("courses", [])):
+            if "jevax" in popup_name.lower() or "vnnb" in popup_name.lower():
+                return False 
+            return True
+    return None
+
 def is_missing_item_live(item, vaccine_rules):
     """
     Checks if a "missing" item is for a live vaccine by analyzing its name and description.
@@ -31,27 +53,60 @@ def is_missing_item_live(item, vaccine_rules):
         rule_display_name = rule.get("group_display_name", rule.get("display_name"))
 
         if rule_display_name and rule_display_name in popup_name:
-            if rule_key == "JE_Group":
-                live_mentioned = "imojev" in description or "jeev" in description
-                inactivated_mentioned = "jevax" in description or "vnnb" in description
-                if live_mentioned and not inactivated_mentioned: return True
-                if inactivated_mentioned and not live_mentioned: return False
-
-            if rule.get("is_live"): return True 
-            
-            if "courses" in rule:
-                for course in rule.get("courses", []):
-                    if course.get("display") and course.get("display").lower() in description:
-                        return course.get("is_live", False)
-                if any(course.get("is_live") for course in rule.get("courses", [])):
-                    if "jevax" in popup_name.lower() or "vnnb" in popup_name.lower():
-                        return False 
-                    return True
+            decision = _rule_live_decision(rule_key, rule, popup_name, description)
+            if decision is not None:
+                return decision
     return False
 
-def apply_spacing_and_sort(missing_items, administered_map, vaccine_rules, analysis_date):
+class LiveVaccineIndex:
+    """
+    Precomputed live-vaccine lookups built once from the processed rules:
+    - norm name -> is_live for administered records,
+    - popup name -> matching rules (memoized, the popup vocabulary is small) for missing items.
+    """
+    def __init__(self, vaccine_rules):
+        live_names = set()
+        display_rules = []
+        for rule_key, rule in vaccine_rules.items():
+            if rule.get("is_live"):
+                live_names.update(rule.get("names_norm", []))
+                live_names.update(rule.get("names_norm_group", []))
+            for course in rule.get("courses", []):
+                if course.get("is_live"):
+                    live_names.update(course.get("names_norm", []))
+            rule_display_name = rule.get("group_display_name", rule.get("display_name"))
+            if rule_display_name:
+                display_rules.append((rule_display_name, rule_key, rule))
+        self.live_names = frozenset(live_names)
+        self._display_rules = tuple(display_rules)
+        self._popup_cache = {}
+
+    def is_live_name(self, norm_name):
+        return norm_name in self.live_names
+
+    def _rules_for_popup(self, popup_name):
+        matches = self._popup_cache.get(popup_name)
+        if matches is None:
+            matches = tuple((rule_key, rule) for display, rule_key, rule in self._display_rules if display in popup_name)
+            self._popup_cache[popup_name] = matches
+        return matches
+
+    def is_item_live(self, item):
+        """Same result as is_missing_item_live, without scanning every rule per item."""
+        popup_name = item.get("vaccine_name_for_popup", "")
+        if not popup_name:
+            return False
+        description = item.get("description", "").lower()
+        for rule_key, rule in self._rules_for_popup(popup_name):
+            decision = _rule_live_decision(rule_key, rule, popup_name, description)
+            if decision is not None:
+                return decision
+        return False
+
+def apply_spacing_and_sort(missing_items, administered_map, vaccine_rules, analysis_date, live_index=None):
     """
     Applies general vaccine spacing rules and sorts the final list of missing items.
+    Pass a prebuilt LiveVaccineIndex as `live_index` to avoid rebuilding it from `vaccine_rules`.
     """
     # Define the sorting key function to handle None dates correctly
     def sort_key(item):
@@ -62,21 +117,24 @@ def apply_spacing_and_sort(missing_items, administered_map, vaccine_rules, analy
         missing_items.sort(key=sort_key)
         return missing_items
 
-    all_records = [record for records_list in administered_map.values() for record in records_list]
-    if not all_records:
-        missing_items.sort(key=sort_key)
-        return missing_items
-        
-    all_records.sort(key=lambda x: x[1])
+    if live_index is None:
+        live_index = LiveVaccineIndex(vaccine_rules)
 
+    # administered_map is keyed by the normalized name, so no per-record re-normalization is needed
+    last_overall_vaccine_date = None
     last_live_vaccine_date = None
-    last_overall_vaccine_date = all_records[-1][1]
+    for norm_name, records_list in administered_map.items():
+        if not records_list:
+            continue
+        latest = max(record[1] for record in records_list)
+        if last_overall_vaccine_date is None or latest > last_overall_vaccine_date:
+            last_overall_vaccine_date = latest
+        if live_index.is_live_name(norm_name) and (last_live_vaccine_date is None or latest > last_live_vaccine_date):
+            last_live_vaccine_date = latest
 
-    for record in reversed(all_records):
-        norm_name = VaccineAnalysisUtils.normalize_vaccine_name(record[2])
-        if get_vaccine_live_status_by_norm_name(norm_name, vaccine_rules):
-            last_live_vaccine_date = record[1]
-            break
+    if last_overall_vaccine_date is None:
+        missing_items.sort(key=sort_key)
+        return missing_items
 
     adjusted_items = []
     for item in missing_items:
@@ -89,7 +147,7 @@ def apply_spacing_and_sort(missing_items, administered_map, vaccine_rules, analy
             
         potential_dates = [original_date, last_overall_vaccine_date + timedelta(days=14)]
 
-        if is_missing_item_live(new_item, vaccine_rules) and last_live_vaccine_date:
+        if last_live_vaccine_date and live_index.is_item_live(new_item):
             potential_dates.append(last_live_vaccine_date + timedelta(days=28))
         
         final_date = max(potential_dates)
@@ -24,8 +24,55 @@ def _add_years(source_date, years_to_add): #
     except ValueError:
         return date(new_year, source_date.month, 28) #
 
+def _record_date(record): #
+    return record[1] #
+
+class AdministeredIndex(dict): #
+    """
+    Lịch sử tiêm của một bệnh nhân, dựng một lần cho mỗi lần phân tích:
+    {norm_name: tuple các bản ghi (dose_num, date_obj, raw_name, dose_text, date_text) đã sắp theo ngày}.
+    Vẫn là dict nên các checker dùng .get()/.items() như administered_map thông thường; phần gộp
+    nhiều tên (records_for) được cache theo frozenset tên nên mỗi quy tắc chỉ gộp/sắp xếp một lần.
+    Các giá trị trả về là tuple dùng chung - không được sửa trực tiếp.
+    """
+    __slots__ = ("_merged",) #
+
+    def __init__(self, administered_map=None): #
+        super().__init__() #
+        for norm_name, records in (administered_map or {}).items(): #
+            if records: #
+                self[norm_name] = tuple(sorted(records, key=_record_date)) #
+        self._merged = {} #
+
+    @classmethod
+    def ensure(cls, administered_map): #
+        """Trả về chính administered_map nếu đã là AdministeredIndex, ngược lại dựng index từ nó."""
+        if isinstance(administered_map, cls): #
+            return administered_map #
+        return cls(administered_map) #
+
+    def records_for(self, names_norm_list): #
+        """Các bản ghi của mọi tên trong names_norm_list, sắp theo ngày (cache theo frozenset tên)."""
+        if not names_norm_list: #
+            return () #
+        key = frozenset(names_norm_list) #
+        merged = self._merged.get(key) #
+        if merged is None: #
+            if len(key) == 1: #
+                merged = self.get(next(iter(key)), ()) #
+            else:
+                records = [] #
+                for norm_name in names_norm_list: #
+                    records.extend(self.get(norm_name, ())) #
+                records.sort(key=_record_date) #
+                merged = tuple(records) #
+            self._merged[key] = merged #
+        return merged #
+
 def get_administered_dose_records(names_norm_list, administered_map): #
     """Lấy tất cả các bản ghi (dose_num, date_obj, ...) cho các vắc xin trong names_norm_list, sắp xếp theo ngày."""
+    if isinstance(administered_map, AdministeredIndex): #
+        return administered_map.records_for(names_norm_list) #
     records = [] #
     if not names_norm_list: #
         return records #
@@ -34,6 +81,25 @@ def get_administered_dose_records(names_norm_list, administered_map): #
     records.sort(key=lambda x: x[1]) # Sắp xếp theo date_obj #
     return records #
 
+def get_min_age_thresholds(rule_details): #
+    """
+    Trả về (min_age_months, min_age_weeks, min_age_years, min_age_days) của một quy tắc.
+    Dùng giá trị đã biên dịch sẵn ("min_age_thresholds") nếu có (xem rule_plan.compile_rule_plan).
+    """
+    precompiled = rule_details.get("min_age_thresholds") #
+    if precompiled is not None: #
+        return precompiled #
+    min_age_months = rule_details.get("min_age_months_overall_group") or \
+                     rule_details.get("min_age_months_at_first_dose") or \
+                     rule_details.get("min_age_months_overall") #
+    min_age_weeks = rule_details.get("min_age_weeks_overall_group") or \
+                    rule_details.get("min_age_weeks_at_first_dose") #
+    min_age_years = rule_details.get("min_age_years_overall_group") or \
+                    rule_details.get("min_age_years_at_first_dose") #
+    min_age_days_val = rule_details.get("min_age_days_overall_group") or \
+                       rule_details.get("min_age_days_at_first_dose") #
+    return (min_age_months, min_age_weeks, min_age_years, min_age_days_val) #
+
 def _get_age_status_and_earliest_date(dob, analysis_date, rule_details, for_group_display_name=""): #
     """
     Helper to determine age status and the earliest acceptable date if too young.
@@ -49,15 +115,7 @@ def _get_age_status_and_earliest_date(dob, analysis_date, rule_details, for_grou
     if age_at_analysis_months is None: #
         return (f"{display_name_prefix}Ngày phân tích trước ngày sinh", None, ["error_date"]) #
 
-    min_age_months = rule_details.get("min_age_months_overall_group") or \
-                     rule_details.get("min_age_months_at_first_dose") or \
-                     rule_details.get("min_age_months_overall") #
-    min_age_weeks = rule_details.get("min_age_weeks_overall_group") or \
-                    rule_details.get("min_age_weeks_at_first_dose") #
-    min_age_years = rule_details.get("min_age_years_overall_group") or \
-                    rule_details.get("min_age_years_at_first_dose") #
-    min_age_days_val = rule_details.get("min_age_days_overall_group") or \
-                       rule_details.get("min_age_days_at_first_dose") #
+    min_age_months, min_age_weeks, min_age_years, min_age_days_val = get_min_age_thresholds(rule_details) #
 
     earliest_acceptable_date = None #
     status_message = "" #
@@ -112,15 +170,7 @@ def _check_first_dose_age_validity(dob, first_dose_date, rule_details, rule_disp
         })
         return False #
 
-    min_age_months = rule_details.get("min_age_months_overall_group") or \
-                     rule_details.get("min_age_months_at_first_dose") or \
-                     rule_details.get("min_age_months_overall") #
-    min_age_weeks = rule_details.get("min_age_weeks_overall_group") or \
-                    rule_details.get("min_age_weeks_at_first_dose") #
-    min_age_years = rule_details.get("min_age_years_overall_group") or \
-                    rule_details.get("min_age_years_at_first_dose") #
-    min_age_days_val = rule_details.get("min_age_days_overall_group") or \
-                       rule_details.get("min_age_days_at_first_dose") #
+    min_age_months, min_age_weeks, min_age_years, min_age_days_val = get_min_age_thresholds(rule_details) #
 
     error_detail = None #
     if min_age_days_val is not None: #
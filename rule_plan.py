@@ -0,0 +1,100 @@
+# rule_plan.py
+from types import MappingProxyType
+import config_data
+from series_checkers import check_single_vaccine_series, check_age_dependent_series
+from group_checkers_alternative import check_alternative_courses_group, check_alternative_courses_age_range_group
+from group_checkers_special import check_mmr_equivalent_group, check_cumulative_group_doses, check_flu_group
+from rule_checker_utils import get_min_age_thresholds
+from utils import VaccineAnalysisUtils
+
+CHECKER_MAP = {
+    config_data.RULE_TYPE_SINGLE_SERIES: check_single_vaccine_series,
+    config_data.RULE_TYPE_SINGLE_DOSE_MIN_AGE: check_single_vaccine_series,
+    config_data.RULE_TYPE_SINGLE_SERIES_MIN_AGE: check_single_vaccine_series,
+    config_data.RULE_TYPE_AGE_DEPENDENT: check_age_dependent_series,
+    config_data.RULE_TYPE_MMR_EQUIVALENT_GROUP: check_mmr_equivalent_group,
+    config_data.RULE_TYPE_GROUP_CUMULATIVE_UNIQUE: check_cumulative_group_doses,
+    config_data.RULE_TYPE_GROUP_CUMULATIVE_UNIQUE_MIN_AGE: check_cumulative_group_doses,
+    config_data.RULE_TYPE_GROUP_ALTERNATIVE: check_alternative_courses_group,
+    config_data.RULE_TYPE_GROUP_ALTERNATIVE_MIN_AGE: check_alternative_courses_group,
+    config_data.RULE_TYPE_GROUP_ALTERNATIVE_AGE_RANGE: check_alternative_courses_age_range_group,
+    config_data.RULE_TYPE_FLU_GROUP: check_flu_group
+}
+
+PNEUMO_PRIMARY_KEYS = ("Prevenar13", "Vaxneuvance", "Synflorix")
+PNEUMO_POLYSACCHARIDE_KEY = "Pneumovax23"
+PNEUMO_KEYS = PNEUMO_PRIMARY_KEYS + (PNEUMO_POLYSACCHARIDE_KEY,)
+
+
+def _collect_rule_names(rule_details):
+    """Tất cả tên chuẩn hóa thuộc về một quy tắc (names_norm, names_norm_group và tên của các phác đồ con)."""
+    names = set(rule_details.get("names_norm", []))
+    names.update(rule_details.get("names_norm_group", []))
+    for course in rule_details.get("courses", []):
+        names.update(course.get("names_norm", []))
+    return frozenset(names)
+
+
+class RulePlan:
+    """
+    Compiled, read-only view of the vaccine rule table.
+    Built once from the processed rules so that per-patient analysis does not
+    rebuild checker dispatch, name sets or pneumococcal lookups on every call.
+    """
+    __slots__ = ("rules", "rule_keys", "checkers", "rule_names", "all_rule_names",
+                 "name_index", "min_age_thresholds", "pneumo_rules", "standard_vaccines")
+
+    def __init__(self, rules, checkers, rule_names, name_index, min_age_thresholds, pneumo_rules, standard_vaccines):
+        self.rules = MappingProxyType(rules)
+        self.rule_keys = tuple(rules.keys())
+        # (rule_key, rule_details, checker_fn) theo đúng thứ tự trong VACCINE_RULES_DATA
+        self.checkers = tuple(checkers)
+        self.rule_names = MappingProxyType(rule_names)
+        self.all_rule_names = frozenset().union(*rule_names.values()) if rule_names else frozenset()
+        self.name_index = MappingProxyType(name_index)
+        self.min_age_thresholds = MappingProxyType(min_age_thresholds)
+        self.pneumo_rules = MappingProxyType(pneumo_rules)
+        # (display_name, norm_name) cho các vắc xin chuẩn không được quy tắc nào bao phủ
+        self.standard_vaccines = tuple(standard_vaccines)
+
+    def rules_for_name(self, norm_name):
+        """Trả về tuple các rule_key có chứa tên chuẩn hóa này."""
+        return self.name_index.get(norm_name, ())
+
+
+def compile_rule_plan(vaccine_rules, standard_vaccines=None):
+    """
+    Compiles processed vaccine rules (output of process_raw_vaccine_rules_data)
+    into an immutable RulePlan.
+    """
+    rules = {}
+    checkers = []
+    rule_names = {}
+    name_index = {}
+    min_age_thresholds = {}
+
+    for rule_key, rule_details in vaccine_rules.items():
+        details = dict(rule_details)
+        thresholds = get_min_age_thresholds(details)
+        details["min_age_thresholds"] = thresholds
+        rules[rule_key] = details
+
+        names = _collect_rule_names(details)
+        rule_names[rule_key] = names
+        min_age_thresholds[rule_key] = thresholds
+        for norm_name in names:
+            name_index.setdefault(norm_name, []).append(rule_key)
+
+        checkers.append((rule_key, details, CHECKER_MAP.get(details.get("type"))))
+
+    name_index = {k: tuple(v) for k, v in name_index.items()}
+    pneumo_rules = {k: rules.get(k, {}) for k in PNEUMO_KEYS}
+
+    all_names = frozenset().union(*rule_names.values()) if rule_names else frozenset()
+    uncovered_standard = []
+    for display_name in standard_vaccines or []:
+        norm_name = VaccineAnalysisUtils.normalize_vaccine_name(display_name)
+        if norm_name not in all_names:
+            uncovered_standard.append((display_name, norm_name))
+
+    return RulePlan(rules, checkers, rule_names, name_index, min_age_thresholds, pneumo_rules, uncovered_standard)
@@ -1,22 +1,39 @@
 # rule_processor.py
-import config_data
-from series_checkers import check_single_vaccine_series, check_age_dependent_series
-from group_checkers_alternative import check_alternative_courses_group, check_alternative_courses_age_range_group
-from group_checkers_special import check_mmr_equivalent_group, check_cumulative_group_doses, check_flu_group, get_administered_dose_records
+import time
+from series_checkers import check_age_dependent_series
+from rule_checker_utils import AdministeredIndex, get_administered_dose_records
+from rule_plan import RulePlan, compile_rule_plan, PNEUMO_PRIMARY_KEYS, PNEUMO_POLYSACCHARIDE_KEY
 from utils import VaccineAnalysisUtils
+from rule_profiler import PNEUMO_BLOCK_KEY, STANDARD_BLOCK_KEY
 
-def process_all_vaccine_rules(administered_vaccine_details_map, vaccine_rules, dob, analysis_date, other_standard_vaccines):
+def process_all_vaccine_rules(administered_vaccine_details_map, vaccine_rules, dob, analysis_date, other_standard_vaccines=None, profiler=None):
     """
     Processes all vaccine rules against the administered records to generate a list of missing items.
     This is the core rule-checking loop.
+
+    `vaccine_rules` should be a RulePlan (see rule_plan.compile_rule_plan). A plain processed
+    rules dict is still accepted and compiled on the fly, together with `other_standard_vaccines`.
+
+    `administered_vaccine_details_map` may be an AdministeredIndex (built once per patient);
+    a plain {norm_name: [records]} dict is wrapped into one so every checker shares the merged views.
+
+    `profiler` (rule_profiler.RuleProfiler, optional) records time, calls and appended items
+    per rule key and checker, including the pneumococcal block and the standard-vaccine check.
     """
+    if isinstance(vaccine_rules, RulePlan):
+        plan = vaccine_rules
+    else:
+        plan = compile_rule_plan(vaccine_rules, other_standard_vaccines)
+    all_rules = plan.rules
+    administered_vaccine_details_map = AdministeredIndex.ensure(administered_vaccine_details_map)
     current_missing_items = []
-    processed_rule_keys = set()
-    sorted_rule_keys = list(vaccine_rules.keys())
 
     # --- Start: Special Pneumococcal Vaccine Logic ---
-    prevenar13_key, vaxneuvance_key, synflorix_key, pneumovax23_key = "Prevenar13", "Vaxneuvance", "Synflorix", "Pneumovax23"
-    pneumo_rules = {k: vaccine_rules.get(k, {}) for k in [prevenar13_key, vaxneuvance_key, synflorix_key, pneumovax23_key]}
+    if profiler is not None:
+        block_start = time.perf_counter()
+    prevenar13_key, vaxneuvance_key, synflorix_key = PNEUMO_PRIMARY_KEYS
+    pneumovax23_key = PNEUMO_POLYSACCHARIDE_KEY
+    pneumo_rules = plan.pneumo_rules
     
     pneumo_records = {k: get_administered_dose_records(v.get("names_norm", []), administered_vaccine_details_map) for k, v in pneumo_rules.items()}
     num_doses = {k: len(v) for k, v in pneumo_records.items()}
@@ -54,7 +71,7 @@ def process_all_vaccine_rules(administered_vaccine_details_map, vaccine_rules, d
                 pneumo_rules_to_skip.update(pneumo_rules.keys())
             elif num_doses[primary_key] == 3:
                 temp_missing = []
-                check_age_dependent_series(primary_key, pneumo_rules[primary_key], administered_vaccine_details_map, temp_missing, dob, analysis_date, vaccine_rules)
+                check_age_dependent_series(primary_key, pneumo_rules[primary_key], administered_vaccine_details_map, temp_missing, dob, analysis_date, all_rules)
                 if temp_missing:
                     current_missing_items.append({
                         "description": f"{pneumo_rules[pneumovax23_key].get('display_name')}: Có thể tiêm 1 mũi thay thế cho mũi 4 của {primary_name} (do đã trên 2 tuổi).",
@@ -66,54 +83,39 @@ def process_all_vaccine_rules(administered_vaccine_details_map, vaccine_rules, d
         # Mark other primary series to be skipped
         other_keys = {prevenar13_key, vaxneuvance_key, synflorix_key} - {primary_key}
         pneumo_rules_to_skip.update(other_keys)
+    if profiler is not None:
+        profiler.record(PNEUMO_BLOCK_KEY, "pneumo_special_logic", time.perf_counter() - block_start, len(current_missing_items))
     # --- End: Special Pneumococcal Vaccine Logic ---
 
-    for rule_key in sorted_rule_keys:
-        if rule_key in pneumo_rules_to_skip:
-            processed_rule_keys.update(vaccine_rules[rule_key].get("names_norm", []))
+    for rule_key, rule_details, checker in plan.checkers:
+        if rule_key in pneumo_rules_to_skip or checker is None:
             continue
-
-        rule_details = vaccine_rules[rule_key]
-        rule_type = rule_details.get("type")
-        
-        # Add all names from this rule to the processed set
-        current_rule_names = set(rule_details.get("names_norm", []))
-        current_rule_names.update(rule_details.get("names_norm_group", []))
-        if "courses" in rule_details:
-            for course in rule_details.get("courses", []):
-                current_rule_names.update(course.get("names_norm", []))
-        processed_rule_keys.update(current_rule_names)
-        
-        checker_args = (rule_key, rule_details, administered_vaccine_details_map,
-                        current_missing_items, dob, analysis_date, vaccine_rules)
-
-        # Call the appropriate checker based on rule type
-        checker_map = {
-            config_data.RULE_TYPE_SINGLE_SERIES: check_single_vaccine_series,
-            config_data.RULE_TYPE_SINGLE_DOSE_MIN_AGE: check_single_vaccine_series,
-            config_data.RULE_TYPE_SINGLE_SERIES_MIN_AGE: check_single_vaccine_series,
-            config_data.RULE_TYPE_AGE_DEPENDENT: check_age_dependent_series,
-            config_data.RULE_TYPE_MMR_EQUIVALENT_GROUP: check_mmr_equivalent_group,
-            config_data.RULE_TYPE_GROUP_CUMULATIVE_UNIQUE: check_cumulative_group_doses,
-            config_data.RULE_TYPE_GROUP_CUMULATIVE_UNIQUE_MIN_AGE: check_cumulative_group_doses,
-            config_data.RULE_TYPE_GROUP_ALTERNATIVE: check_alternative_courses_group,
-            config_data.RULE_TYPE_GROUP_ALTERNATIVE_MIN_AGE: check_alternative_courses_group,
-            config_data.RULE_TYPE_GROUP_ALTERNATIVE_AGE_RANGE: check_alternative_courses_age_range_group,
-            config_data.RULE_TYPE_FLU_GROUP: check_flu_group
-        }
-        if rule_type in checker_map:
-            checker_map[rule_type](*checker_args)
+        if profiler is None:
+            checker(rule_key, rule_details, administered_vaccine_details_map,
+                    current_missing_items, dob, analysis_date, all_rules)
+        else:
+            items_before = len(current_missing_items)
+            checker_start = time.perf_counter()
+            checker(rule_key, rule_details, administered_vaccine_details_map,
+                    current_missing_items, dob, analysis_date, all_rules)
+            profiler.record(rule_key, checker.__name__, time.perf_counter() - checker_start,
+                            len(current_missing_items) - items_before)
     
+    if profiler is not None:
+        items_before = len(current_missing_items)
+        block_start = time.perf_counter()
     # Check for other standard vaccines that haven't been administered at all
-    if other_standard_vaccines:
-        for vaccine_display_name in other_standard_vaccines:
-            norm_name = VaccineAnalysisUtils.normalize_vaccine_name(vaccine_display_name)
-            if norm_name not in processed_rule_keys and not administered_vaccine_details_map.get(norm_name):
-                current_missing_items.append({
-                    "description": f"{vaccine_display_name} (Chưa tiêm/uống)",
-                    "earliest_next_dose_date": analysis_date,
-                    "status_tags": ["due", "standard_unadministered"],
-                    "vaccine_name_for_popup": vaccine_display_name
-                })
+    # (standard vaccines covered by a rule were already filtered out when the plan was compiled)
+    for vaccine_display_name, norm_name in plan.standard_vaccines:
+        if not administered_vaccine_details_map.get(norm_name):
+            current_missing_items.append({
+                "description": f"{vaccine_display_name} (Chưa tiêm/uống)",
+                "earliest_next_dose_date": analysis_date,
+                "status_tags": ["due", "standard_unadministered"],
+                "vaccine_name_for_popup": vaccine_display_name
+            })
+    if profiler is not None:
+        profiler.record(STANDARD_BLOCK_KEY, "standard_unadministered", time.perf_counter() - block_start,
+                        len(current_missing_items) - items_before)
                 
     return current_missing_items
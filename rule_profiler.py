@@ -0,0 +1,55 @@
+# rule_profiler.py
+import time
+
+# Các khối không phải checker nhưng vẫn được đo trong process_all_vaccine_rules / analyze
+PNEUMO_BLOCK_KEY = "__pneumo__"
+STANDARD_BLOCK_KEY = "__standard__"
+SPACING_BLOCK_KEY = "__spacing__"
+
+
+class RuleProfiler:
+    """
+    Opt-in per-rule timing for one analysis.
+    Pass an instance to process_all_vaccine_rules(profiler=...) to record wall time,
+    call count and number of missing items appended for each (rule_key, checker).
+    """
+    __slots__ = ("entries", "started")
+
+    def __init__(self):
+        # (rule_key, checker_name) -> [calls, seconds, items_appended]
+        self.entries = {}
+        self.started = time.perf_counter()
+
+    def record(self, rule_key, checker_name, elapsed, items_appended=0):
+        entry = self.entries.get((rule_key, checker_name))
+        if entry is None:
+            self.entries[(rule_key, checker_name)] = [1, elapsed, items_appended]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] += items_appended
+
+    def as_dict(self):
+        """Kết quả dạng dict (picklable, json-able), sắp theo thời gian giảm dần."""
+        rows = [
+            {"rule_key": rule_key, "checker": checker_name, "calls": calls,
+             "total_ms": round(seconds * 1000, 4), "items_appended": items}
+            for (rule_key, checker_name), (calls, seconds, items) in self.entries.items()
+        ]
+        rows.sort(key=lambda r: r["total_ms"], reverse=True)
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 4),
+            "checkers_ms": round(sum(r["total_ms"] for r in rows), 4),
+            "entries": rows,
+        }
+
+    @staticmethod
+    def format_report(profile):
+        """Bảng văn bản cho tab Debug từ kết quả as_dict()."""
+        if not profile:
+            return "(Không có dữ liệu profiling)"
+        lines = [f"Tổng thời gian phân tích: {profile['total_ms']:.3f} ms (các khối đã đo: {profile['checkers_ms']:.3f} ms)",
+                 f"{'Rule key':<22}{'Checker':<44}{'Lần':>5}{'ms':>10}{'Mục':>6}"]
+        for row in profile["entries"]:
+            lines.append(f"{row['rule_key']:<22}{row['checker']:<44}{row['calls']:>5}{row['total_ms']:>10.3f}{row['items_appended']:>6}")
+        return "\n".join(lines)
@@ -1,6 +1,9 @@
-from datetime import datetime, date, timedelta, timezone
-from collections import defaultdict
+import time
 import traceback
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import islice
 
 # Import core logic modules from the existing codebase
 # Assumes these files are in the root directory or PYTHONPATH
@@ -8,7 +11,11 @@ try:
     import config_data
     from utils import VaccineAnalysisUtils
     from rule_processor import process_all_vaccine_rules
-    from post_processor import apply_spacing_and_sort
+    from rule_plan import compile_rule_plan
+    from rule_checker_utils import AdministeredIndex
+    from post_processor import apply_spacing_and_sort, LiveVaccineIndex
+    from rule_profiler import RuleProfiler, SPACING_BLOCK_KEY
+    from vaccine_record import ensure_records
 except ImportError as e:
     print(f"CRITICAL ERROR: Missing core logic modules: {e}")
 
@@ -16,6 +23,8 @@ class AnalysisService:
     def __init__(self):
         self.vaccine_rules = None
         self.standard_vaccines = []
+        self.rule_plan = None
+        self.live_index = None
         self._load_rules()
 
     def _load_rules(self):
@@ -28,20 +37,39 @@ class AnalysisService:
 
             self.vaccine_rules = VaccineAnalysisUtils.process_raw_vaccine_rules_data(raw_rules)
             self.standard_vaccines = [v.strip() for v in raw_standard_str.split(';') if v.strip()]
+            # Compile once: checker dispatch, name sets and age thresholds are reused for every patient
+            self.rule_plan = compile_rule_plan(self.vaccine_rules, self.standard_vaccines)
+            self.live_index = LiveVaccineIndex(self.vaccine_rules)
             
         except Exception as e:
             print(f"Error loading vaccine rules: {e}")
             self.vaccine_rules = {}
             self.standard_vaccines = []
-
-    def analyze(self, patient_info, raw_vaccine_list):
+            self.rule_plan = None
+            self.live_index = None
+
+    @staticmethod
+    def get_analysis_date():
+        """Ngày phân tích hiện tại theo giờ Việt Nam (GMT+7)."""
+        utc_now = datetime.now(timezone.utc)
+        gmt7_now = utc_now.astimezone(timezone(timedelta(hours=7)))
+        return gmt7_now.date()
+
+    def analyze(self, patient_info, raw_vaccine_list, analysis_date=None, profile=False):
+        """
+        raw_vaccine_list: VaccineRecord (từ worker) hoặc dict {"vaccine_name", "dose", "date"}.
+        profile=True đo thời gian từng quy tắc/checker; kết quả nằm trong results["profile"]
+        (xem RuleProfiler.as_dict), ngược lại results["profile"] là None.
+        """
         results = {
             "patient_name": patient_info.get("name"),
             "patient_dob": patient_info.get("birth"),
             "administered": [],
             "missing": [],
+            "profile": None,
             "error": None
         }
+        profiler = RuleProfiler() if profile else None
 
         try:
             # 1. Prepare Context
@@ -53,73 +81,59 @@ class AnalysisService:
                 except ValueError:
                     pass
 
-            utc_now = datetime.now(timezone.utc)
-            gmt7_now = utc_now.astimezone(timezone(timedelta(hours=7)))
-            analysis_date = gmt7_now.date()
+            if analysis_date is None:
+                analysis_date = self.get_analysis_date()
 
             # 2. Process Administered Data
             administered_map = defaultdict(list)
             
-            for record in raw_vaccine_list:
-                name = record.get("vaccine_name", "")
-                date_text = record.get("date", "")
-                dose_text = record.get("dose", "")
-
-                if not name or not date_text:
-                    continue
-
-                norm_name = VaccineAnalysisUtils.normalize_vaccine_name(name)
-                
-                try:
-                    dose_int = int(dose_text)
-                except ValueError:
-                    dose_int = 0
-
-                try:
-                    date_obj = datetime.strptime(date_text.replace(" ", ""), "%d/%m/%Y").date()
-                    
-                    # For logic
-                    administered_map[norm_name].append((dose_int, date_obj, name, dose_text, date_text))
-                    
-                    # For display
-                    age_str = ""
-                    if patient_dob_obj:
-                        age_str = VaccineAnalysisUtils.get_age_string(dob_str, date_text)
-                    
-                    results["administered"].append({
-                        "name": name,
-                        "dose": dose_text,
-                        "date": date_text,
-                        "age": age_str,
-                        "raw_date": date_obj
-                    })
-                except ValueError:
-                    continue
+            # VaccineRecord từ worker đã parse sẵn; dict kiểu cũ được parse một lần tại đây
+            for record in ensure_records(raw_vaccine_list):
+                # For logic
+                administered_map[record.norm_name].append(record.administered_tuple())
+
+                # For display
+                age_str = ""
+                if patient_dob_obj:
+                    age_str = VaccineAnalysisUtils.get_age_string_at(patient_dob_obj, record.date)
+
+                results["administered"].append({
+                    "name": record.name,
+                    "dose": record.dose_text,
+                    "date": record.date_text,
+                    "age": age_str,
+                    "raw_date": record.date
+                })
 
             # Sort administered by date
             results["administered"].sort(key=lambda x: (x["raw_date"], x["name"]))
-            for key in administered_map:
-                administered_map[key].sort(key=lambda x: x[1])
+            # Index per patient: per-name tuples sorted by date, merged views cached for all checkers
+            administered_map = AdministeredIndex(administered_map)
 
             # 3. Run Core Logic
-            if not self.vaccine_rules:
+            if not self.vaccine_rules or self.rule_plan is None:
                 results["error"] = "Dữ liệu quy tắc vắc-xin chưa được khởi tạo."
                 return results
 
             missing_raw = process_all_vaccine_rules(
                 administered_map, 
-                self.vaccine_rules, 
+                self.rule_plan, 
                 patient_dob_obj, 
                 analysis_date, 
-                self.standard_vaccines
+                self.standard_vaccines,
+                profiler=profiler
             )
 
+            spacing_start = time.perf_counter()
             missing_final = apply_spacing_and_sort(
                 missing_raw, 
                 administered_map, 
                 self.vaccine_rules, 
-                analysis_date
+                analysis_date,
+                live_index=self.live_index
             )
+            if profiler is not None:
+                profiler.record(SPACING_BLOCK_KEY, "apply_spacing_and_sort", time.perf_counter() - spacing_start, 0)
 
             # 4. Format Missing Data
             for item in missing_final:
@@ -138,4 +152,74 @@ class AnalysisService:
             traceback.print_exc()
             results["error"] = f"Lỗi phân tích: {str(e)}"
 
-        return results
\ No newline at end of file
+        if profiler is not None:
+            results["profile"] = profiler.as_dict()
+        return results
+
+    def analyze_many(self, patients, analysis_date=None, max_workers=None, chunksize=16):
+        """
+        Analyzes an iterable of (patient_info, raw_vaccine_list) pairs and yields the
+        results in input order. All patients share the compiled rules and one analysis date.
+
+        max_workers=None (or <= 1) runs in this process; otherwise the work is fanned out to a
+        ProcessPoolExecutor where each worker process compiles the rules once. Input is read
+        lazily: at most 2 chunks per worker are in flight (see imap_bounded).
+        """
+        if analysis_date is None:
+            analysis_date = self.get_analysis_date()
+
+        if not max_workers or max_workers <= 1:
+            for patient_info, raw_vaccine_list in patients:
+                yield self.analyze(patient_info, raw_vaccine_list, analysis_date)
+            return
+
+        jobs = ((patient_info, raw_vaccine_list, analysis_date) for patient_info, raw_vaccine_list in patients)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_pool_worker) as executor:
+            yield from imap_bounded(executor, _analyze_in_pool_worker, jobs, chunksize, window=max_workers * 2)
+
+    @staticmethod
+    def get_due_items(result, on_date):
+        """Các mục cần tiêm (tag 'due') có ngày sớm nhất <= on_date, dùng để lọc danh sách tiêm trong ngày."""
+        return [
+            item for item in result.get("missing", [])
+            if "due" in item.get("status_tags", []) and item.get("raw_date") and item["raw_date"] <= on_date
+        ]
+
+
+# --- Process pool helpers (module level so they can be pickled on Windows spawn) ---
+_POOL_SERVICE = None
+
+def _init_pool_worker():
+    global _POOL_SERVICE
+    _POOL_SERVICE = AnalysisService()
+
+def _analyze_in_pool_worker(job):
+    patient_info, raw_vaccine_list, analysis_date = job
+    return _POOL_SERVICE.analyze(patient_info, raw_vaccine_list, analysis_date)
+
+def _run_chunk(func, chunk):
+    return [func(job) for job in chunk]
+
+def imap_bounded(executor, func, jobs, chunksize=1, window=2):
+    """
+    Như executor.map(func, jobs, chunksize=...) (kết quả theo thứ tự đầu vào) nhưng chỉ giữ tối đa
+    `window` chunk đang chờ/đang chạy. executor.map submit mọi chunk trước khi trả kết quả đầu tiên
+    (chưa có buffersize trước Python 3.14), tức là đọc hết jobs vào bộ nhớ; ở đây jobs được đọc dần.
+    func phải pickle được (hàm cấp module).
+    """
+    chunksize = max(1, int(chunksize))
+    jobs = iter(jobs)
+    pending = deque()
+
+    def submit_next():
+        chunk = list(islice(jobs, chunksize))
+        if chunk:
+            pending.append(executor.submit(_run_chunk, func, chunk))
+        return bool(chunk)
+
+    while len(pending) < max(1, window) and submit_next():
+        pass
+    while pending:
+        results = pending.popleft().result()
+        submit_next()
+        yield from results
@@ -1,6 +1,17 @@
+import threading
 from database.db_connection import DbConnection
+from database.connection_pool import ConnectionPool
+
+try:
+    from db_config import DB_POOL_SETTINGS
+except ImportError:
+    DB_POOL_SETTINGS = {}
 
 class BaseDbService:
+    # Pool dùng chung cho mọi service CSDL (PatientService, VaccineService, ...)
+    _pool = None
+    _pool_lock = threading.Lock()
+
     def __init__(self, logger_callback=None):
         self.logger = logger_callback
 
@@ -10,5 +21,24 @@ class BaseDbService:
         else:
             print(f"[DB-LOG] {message}")
 
+    @classmethod
+    def get_pool(cls):
+        with BaseDbService._pool_lock:
+            if BaseDbService._pool is None:
+                BaseDbService._pool = ConnectionPool(DbConnection.get_connection, **DB_POOL_SETTINGS)
+            return BaseDbService._pool
+
+    @classmethod
+    def close_pool(cls):
+        with BaseDbService._pool_lock:
+            pool, BaseDbService._pool = BaseDbService._pool, None
+        if pool:
+            pool.close_all()
+
     def get_connection(self):
-        return DbConnection.get_connection()
\ No newline at end of file
+        # conn.close() trả kết nối về pool thay vì đóng thật
+        return self.get_pool().acquire()
+
+    def prewarm_connections(self, count=1):
+        """Mở sẵn kết nối ở luồng nền để lần truy vấn đầu tiên không phải chờ đăng nhập SQL Server."""
+        threading.Thread(target=self.get_pool().prewarm, args=(count,), daemon=True).start()
@@ -0,0 +1,177 @@
+import json
+import os
+import sqlite3
+import time
+from datetime import date
+
+from app_paths import get_base_path
+from vaccine_record import VaccineRecord
+
+DEFAULT_TTL_HOURS = 24
+DEFAULT_SEARCH_TTL_MINUTES = 30
+CACHE_FILE_NAME = "history_cache.sqlite3"
+
+
+class HistoryCacheService:
+    """
+    Bộ nhớ đệm trên đĩa (SQLite) cho lịch sử tiêm đã tải từ VNCDC, theo doiTuongId.
+    - get(): trả về lịch sử còn hạn (TTL) để hiển thị ngay trong khi worker tải bản mới ở nền.
+    - put(): ghi lại mỗi lần worker tải thành công; invalidate(): xoá sau khi thêm mũi tiêm.
+    - get_subjects()/put_subjects(): kết quả tìm theo SĐT (TTL ngắn hơn, tính bằng phút).
+    Chỉ dùng trên luồng giao diện. Lỗi SQLite chỉ được ghi log, cache khi đó coi như trống.
+    """
+
+    def __init__(self, ttl_hours=DEFAULT_TTL_HOURS, db_path=None, logger_callback=None,
+                 search_ttl_minutes=DEFAULT_SEARCH_TTL_MINUTES):
+        self.ttl_seconds = self._seconds(ttl_hours, 3600, DEFAULT_TTL_HOURS)
+        self.search_ttl_seconds = self._seconds(search_ttl_minutes, 60, DEFAULT_SEARCH_TTL_MINUTES)
+        self.db_path = db_path or os.path.join(get_base_path(), CACHE_FILE_NAME)
+        self.logger = logger_callback
+        self._conn = None
+        self._open()
+
+    @staticmethod
+    def _seconds(value, unit, default):
+        try:
+            return max(0.0, float(value)) * unit
+        except (TypeError, ValueError):
+            return default * unit
+
+    def log(self, message):
+        if self.logger:
+            self.logger(f"[CACHE] {message}")
+        else:
+            print(f"[CACHE] {message}")
+
+    def _open(self):
+        try:
+            self._conn = sqlite3.connect(self.db_path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                " doi_tuong_id TEXT PRIMARY KEY,"
+                " fetched_at REAL NOT NULL,"
+                " records TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search ("
+                " phone TEXT PRIMARY KEY,"
+                " fetched_at REAL NOT NULL,"
+                " subjects TEXT NOT NULL)"
+            )
+            self._conn.commit()
+            self.purge_expired()
+        except sqlite3.Error as e:
+            self.log(f"Không mở được cache lịch sử ({self.db_path}): {e}")
+            self._conn = None
+
+    @property
+    def enabled(self):
+        return self._conn is not None and self.ttl_seconds > 0
+
+    # --- (De)serialize: ngày lưu dạng ISO để đọc lại không cần strptime ---
+    @staticmethod
+    def _dump(records):
+        return json.dumps([
+            [r.name, r.norm_name, r.dose, r.date.isoformat(), r.dose_text, r.date_text] for r in records
+        ], ensure_ascii=False)
+
+    @staticmethod
+    def _load(text):
+        return [
+            VaccineRecord(name, norm_name, dose, date.fromisoformat(iso), dose_text, date_text)
+            for name, norm_name, dose, iso, dose_text, date_text in json.loads(text)
+        ]
+
+    def get(self, doi_tuong_id):
+        """(records, tuổi dữ liệu theo giây) nếu còn hạn, ngược lại None."""
+        if not self.enabled or not doi_tuong_id:
+            return None
+        try:
+            row = self._conn.execute(
+                "SELECT fetched_at, records FROM history WHERE doi_tuong_id = ?", (str(doi_tuong_id),)
+            ).fetchone()
+            if not row:
+                return None
+            age = time.time() - row[0]
+            if age > self.ttl_seconds:
+                return None
+            return self._load(row[1]), age
+        except (sqlite3.Error, ValueError, TypeError) as e:
+            self.log(f"Lỗi đọc cache cho ID {doi_tuong_id}: {e}")
+            return None
+
+    def put(self, doi_tuong_id, records, empty_table=False):
+        """
+        Ghi lịch sử vừa tải. Danh sách rỗng chỉ được ghi khi empty_table=True (worker đã thấy bảng tblVacxin
+        không có hàng nào); nếu không, một trang lỗi sẽ làm đối tượng trông như chưa tiêm mũi nào suốt TTL.
+        """
+        if not self.enabled or not doi_tuong_id:
+            return
+        if not records and not empty_table:
+            self.log(f"Không lưu lịch sử rỗng chưa xác nhận cho ID {doi_tuong_id}.")
+            return
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO history (doi_tuong_id, fetched_at, records) VALUES (?, ?, ?)",
+                (str(doi_tuong_id), time.time(), self._dump(records))
+            )
+            self._conn.commit()
+        except (sqlite3.Error, AttributeError) as e:
+            self.log(f"Lỗi ghi cache cho ID {doi_tuong_id}: {e}")
+
+    def invalidate(self, doi_tuong_id):
+        if self._conn is None or not doi_tuong_id:
+            return
+        try:
+            self._conn.execute("DELETE FROM history WHERE doi_tuong_id = ?", (str(doi_tuong_id),))
+            self._conn.commit()
+        except sqlite3.Error as e:
+            self.log(f"Lỗi xoá cache cho ID {doi_tuong_id}: {e}")
+
+    # --- Kết quả tìm kiếm theo SĐT ---
+    def get_subjects(self, phone):
+        """Danh sách đối tượng {'name', 'birth', 'id'} của SĐT nếu còn hạn, ngược lại None."""
+        if self._conn is None or self.search_ttl_seconds <= 0 or not phone:
+            return None
+        try:
+            row = self._conn.execute(
+                "SELECT fetched_at, subjects FROM search WHERE phone = ?", (phone,)
+            ).fetchone()
+            if not row or time.time() - row[0] > self.search_ttl_seconds:
+                return None
+            return json.loads(row[1])
+        except (sqlite3.Error, ValueError) as e:
+            self.log(f"Lỗi đọc cache SĐT {phone}: {e}")
+            return None
+
+    def put_subjects(self, phone, subjects):
+        # Không lưu kết quả rỗng: worker cũng trả về danh sách rỗng khi lỗi mạng
+        if self._conn is None or self.search_ttl_seconds <= 0 or not phone or not subjects:
+            return
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search (phone, fetched_at, subjects) VALUES (?, ?, ?)",
+                (phone, time.time(), json.dumps(subjects, ensure_ascii=False))
+            )
+            self._conn.commit()
+        except (sqlite3.Error, TypeError) as e:
+            self.log(f"Lỗi ghi cache SĐT {phone}: {e}")
+
+    def purge_expired(self):
+        if self._conn is None:
+            return
+        try:
+            now = time.time()
+            self._conn.execute("DELETE FROM history WHERE fetched_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute("DELETE FROM search WHERE fetched_at < ?", (now - self.search_ttl_seconds,))
+            self._conn.commit()
+        except sqlite3.Error as e:
+            self.log(f"Lỗi dọn cache: {e}")
+
+    def close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+            self._conn = None
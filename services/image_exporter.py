@@ -4,7 +4,7 @@ import sys
 import unicodedata
 import shutil
 from datetime import datetime
-from PIL import Image, ImageDraw, ImageFont
+# PIL (Pillow) chỉ được import khi xuất ảnh lần đầu - không nằm trên đường khởi động
 
 DEFAULT_FONT_FAMILY = "Arial"
 MISSING_OUTPUT_DIR = "Output"
@@ -25,6 +25,7 @@ class ImageExportService:
     @staticmethod
     def generate_image(items_data, metadata, is_missing_list=True):
         try:
+            from PIL import Image, ImageDraw, ImageFont
             patient_name = metadata.get('patient_name', '')
             patient_dob = metadata.get('patient_dob', '')
             
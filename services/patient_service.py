@@ -1,8 +1,15 @@
 import datetime
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from services.base_db_service import BaseDbService
 from db_config import APP_SETTINGS
 
+# Chạy song song 2 truy vấn hàng chờ (Chờ khám / Đã chỉ định), mỗi truy vấn một kết nối trong pool
+_QUEUE_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="his-queue")
+# Khoá gắn vào mỗi dòng của get_vaccination_queue(status=-1): 0 = Chờ khám, 1 = Đã chỉ định
+QUEUE_STATUS_KEY = "_queue_status"
+QUEUE_STATUS_WAITING = 0
+
 class PatientService(BaseDbService):
     def get_table_columns(self, cursor, table_name):
         try:
@@ -57,8 +64,14 @@ class PatientService(BaseDbService):
 
     def get_vaccination_queue(self, from_date, to_date, patient_name="", status=1):
         if status == -1:
-            data_0 = self.get_vaccination_queue(from_date, to_date, patient_name, 0) or []
-            data_1 = self.get_vaccination_queue(from_date, to_date, patient_name, 1) or []
+            future_0 = _QUEUE_EXECUTOR.submit(self.get_vaccination_queue, from_date, to_date, patient_name, 0)
+            future_1 = _QUEUE_EXECUTOR.submit(self.get_vaccination_queue, from_date, to_date, patient_name, 1)
+            data_0 = future_0.result() or []
+            data_1 = future_1.result() or []
+            # Đánh dấu trạng thái để hàng chờ tự làm mới biết lượt nào còn đang chờ (chỉ định còn thay đổi)
+            for status_val, rows in ((0, data_0), (1, data_1)):
+                for item in rows:
+                    item[QUEUE_STATUS_KEY] = status_val
             return data_0 + data_1
         
         data = []
@@ -107,50 +120,172 @@ class PatientService(BaseDbService):
             if conn: conn.close()
         return data
 
+    # Số lượt khám mỗi batch khi lấy chỉ định hàng loạt (5 tham số/lượt, SQL Server giới hạn 2100 tham số)
+    ASSIGNED_BATCH_SIZE = 100
+    _ASSIGNED_MARKER_COL = "__ma_luotkham"
+
+    @staticmethod
+    def _read_cls_names(cursor):
+        """Tên dịch vụ CLS (result set thứ nhất của Kcb_Thamkham_Laythongtincls_Thuoc_Theolankham)."""
+        names = []
+        columns = [column[0].lower() for column in cursor.description]
+        rows = cursor.fetchall()
+        name_col = 'ten_chitietdichvu' if 'ten_chitietdichvu' in columns else 'ten_dichvu'
+        for row in rows:
+            idx = -1
+            try: idx = columns.index(name_col)
+            except: 
+                if len(row) > 3: idx = 2 
+            if idx != -1: names.append(str(row[idx]))
+        return names
+
+    @staticmethod
+    def _read_thuoc_names(cursor):
+        """Tên thuốc/vắc-xin (result set thứ hai)."""
+        names = []
+        columns = [column[0].lower() for column in cursor.description]
+        rows = cursor.fetchall()
+        name_col = 'ten_thuoc'
+        for row in rows:
+            idx = -1
+            try: idx = columns.index(name_col) 
+            except: 
+                if len(row) > 2: idx = 1
+            if idx != -1: names.append(str(row[idx]))
+        return names
+
     def get_assigned_vaccines(self, ma_luotkham, id_benhnhan):
-        vaccines = []
         conn = None
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            sql_get_idkham = "SELECT TOP 1 id_kham FROM kcb_dangky_kcb WHERE ma_luotkham = ? AND id_benhnhan = ?"
-            cursor.execute(sql_get_idkham, (ma_luotkham, id_benhnhan))
-            row_kham = cursor.fetchone()
-            
-            if not row_kham:
-                return []
-            id_kham = row_kham[0]
+            return self._fetch_assigned_single(conn.cursor(), ma_luotkham, id_benhnhan)
+        except Exception as e:
+            self.log(f"Lỗi lấy chi tiết: {str(e)}")
+            return []
+        finally:
+            if conn: conn.close()
 
-            cursor.execute("{CALL Kcb_Thamkham_Laythongtincls_Thuoc_Theolankham (?, ?, ?)}", (id_benhnhan, ma_luotkham, id_kham))
-            
-            if cursor.description:
-                columns = [column[0].lower() for column in cursor.description]
-                rows = cursor.fetchall()
-                name_col = 'ten_chitietdichvu' if 'ten_chitietdichvu' in columns else 'ten_dichvu'
-                for row in rows:
-                    idx = -1
-                    try: idx = columns.index(name_col)
-                    except: 
-                        if len(row) > 3: idx = 2 
-                    if idx != -1: vaccines.append(str(row[idx]))
+    def _fetch_assigned_single(self, cursor, ma_luotkham, id_benhnhan):
+        """Chỉ định của một lượt khám trên cursor có sẵn (2 round-trip: tra id_kham rồi gọi thủ tục)."""
+        vaccines = []
+        sql_get_idkham = "SELECT TOP 1 id_kham FROM kcb_dangky_kcb WHERE ma_luotkham = ? AND id_benhnhan = ?"
+        cursor.execute(sql_get_idkham, (ma_luotkham, id_benhnhan))
+        row_kham = cursor.fetchone()
 
-            if cursor.nextset() and cursor.description:
-                columns = [column[0].lower() for column in cursor.description]
-                rows = cursor.fetchall()
-                name_col = 'ten_thuoc'
-                for row in rows:
-                    idx = -1
-                    try: idx = columns.index(name_col) 
-                    except: 
-                        if len(row) > 2: idx = 1
-                    if idx != -1: vaccines.append(str(row[idx]))
-            
+        if not row_kham:
+            return []
+        id_kham = row_kham[0]
+
+        cursor.execute("{CALL Kcb_Thamkham_Laythongtincls_Thuoc_Theolankham (?, ?, ?)}", (id_benhnhan, ma_luotkham, id_kham))
+
+        if cursor.description:
+            vaccines.extend(self._read_cls_names(cursor))
+
+        if cursor.nextset() and cursor.description:
+            vaccines.extend(self._read_thuoc_names(cursor))
+        return vaccines
+
+    def get_assigned_vaccines_bulk(self, visits):
+        """
+        Chỉ định (CLS + thuốc) cho nhiều lượt khám: visits là các cặp (ma_luotkham, id_benhnhan).
+        Trả về {ma_luotkham: [tên, ...]}. Mỗi batch ASSIGNED_BATCH_SIZE lượt là một round-trip:
+        tra id_kham và gọi thủ tục cho từng lượt trong cùng một lô lệnh, trước mỗi lượt có một
+        result set đánh dấu ma_luotkham để tách kết quả. Batch lỗi -> lấy lại từng lượt như cũ.
+        """
+        visits = [(ma, id_bn) for ma, id_bn in visits if ma and id_bn]
+        result = {ma: [] for ma, _ in visits}
+        if not visits:
+            return result
+
+        conn = None
+        try:
+            conn = self.get_connection()
+            for start in range(0, len(visits), self.ASSIGNED_BATCH_SIZE):
+                chunk = visits[start:start + self.ASSIGNED_BATCH_SIZE]
+                try:
+                    result.update(self._fetch_assigned_chunk(conn.cursor(), chunk))
+                except Exception as e:
+                    self.log(f"Lỗi lấy chỉ định hàng loạt ({len(chunk)} lượt), chuyển sang lấy từng lượt: {str(e)}")
+                    # Dùng lại kết nối đang giữ: không mượn thêm kết nối thứ hai từ pool (tối đa 4, chờ 15s)
+                    for ma_luotkham, id_benhnhan in chunk:
+                        try:
+                            result[ma_luotkham] = self._fetch_assigned_single(conn.cursor(), ma_luotkham, id_benhnhan)
+                        except Exception as e_row:
+                            self.log(f"Lỗi lấy chi tiết (MaLK {ma_luotkham}): {str(e_row)}")
+            self.log(f"[QUEUE] Chỉ định: {len(visits)} lượt khám")
         except Exception as e:
             self.log(f"Lỗi lấy chi tiết: {str(e)}")
         finally:
             if conn: conn.close()
-        return vaccines
+        return result
+
+    # Kiểu SQL của kcb_dangky_kcb.id_kham (đọc một lần từ INFORMATION_SCHEMA), dùng cho DECLARE @id_kham
+    _id_kham_type = None
+
+    def _get_id_kham_type(self, cursor):
+        """
+        Khai báo biến đúng kiểu cột để thủ tục nhận cùng kiểu như khi get_assigned_vaccines truyền thẳng giá trị
+        (sql_variant không chuyển ngầm sang tham số int được). Không đọc được thì dùng BIGINT (chứa được mọi khoá nguyên).
+        """
+        if PatientService._id_kham_type is None:
+            sql_type = "BIGINT"
+            try:
+                cursor.execute(
+                    "SELECT DATA_TYPE, CHARACTER_MAXIMUM_LENGTH, NUMERIC_PRECISION, NUMERIC_SCALE "
+                    "FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME = 'kcb_dangky_kcb' AND COLUMN_NAME = 'id_kham'"
+                )
+                row = cursor.fetchone()
+                if row:
+                    data_type, char_len, precision, scale = row
+                    data_type = str(data_type).upper()
+                    if data_type in ("DECIMAL", "NUMERIC"):
+                        sql_type = f"{data_type}({precision}, {scale})"
+                    elif data_type in ("VARCHAR", "NVARCHAR", "CHAR", "NCHAR"):
+                        sql_type = f"{data_type}({'MAX' if char_len == -1 else char_len})"
+                    elif data_type.isalnum():
+                        sql_type = data_type
+            except Exception as e:
+                self.log(f"Không đọc được kiểu cột id_kham, dùng BIGINT: {str(e)}")
+            PatientService._id_kham_type = sql_type
+        return PatientService._id_kham_type
+
+    def _fetch_assigned_chunk(self, cursor, chunk):
+        # Nếu lô lệnh lỗi, get_assigned_vaccines_bulk tự lấy lại từng lượt trên cùng kết nối
+        statements = ["SET NOCOUNT ON;", f"DECLARE @id_kham {self._get_id_kham_type(cursor)};"]
+        params = []
+        for ma_luotkham, id_benhnhan in chunk:
+            statements.append(
+                "SET @id_kham = NULL; "
+                "SELECT TOP 1 @id_kham = id_kham FROM kcb_dangky_kcb WHERE ma_luotkham = ? AND id_benhnhan = ?; "
+                "IF @id_kham IS NOT NULL BEGIN "
+                f"SELECT ? AS {self._ASSIGNED_MARKER_COL}; "
+                "EXEC Kcb_Thamkham_Laythongtincls_Thuoc_Theolankham ?, ?, @id_kham; "
+                "END"
+            )
+            params.extend([ma_luotkham, id_benhnhan, ma_luotkham, id_benhnhan, ma_luotkham])
+        cursor.execute("\n".join(statements), params)
+
+        chunk_result = {}
+        current_key = None
+        set_index = 0
+        while True:
+            if cursor.description:
+                first_col = cursor.description[0][0].lower()
+                if first_col == self._ASSIGNED_MARKER_COL:
+                    row = cursor.fetchone()
+                    current_key = str(row[0]) if row else None
+                    chunk_result.setdefault(current_key, [])
+                    set_index = 0
+                elif current_key is not None:
+                    # Result set đầu sau đánh dấu là CLS, tiếp theo là thuốc (như get_assigned_vaccines)
+                    if set_index == 0:
+                        chunk_result[current_key].extend(self._read_cls_names(cursor))
+                    elif set_index == 1:
+                        chunk_result[current_key].extend(self._read_thuoc_names(cursor))
+                    set_index += 1
+            if not cursor.nextset():
+                break
+        return chunk_result
 
     def delete_patient_visit(self, ma_luotkham, id_benhnhan):
         conn = None
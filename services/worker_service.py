@@ -1,18 +1,21 @@
+import itertools
 import multiprocessing
-import queue
-import time
-from PySide6.QtCore import QObject, QThread, Signal, Slot
+import os
+import socket
+from multiprocessing.connection import Connection, answer_challenge, deliver_challenge
+from PySide6.QtCore import QObject, QSocketNotifier, QTimer, Signal, Slot
 
-# Import the worker logic from the existing backend module
-try:
-    from live_worker.process_worker import playwright_process_worker
-except ImportError:
-    playwright_process_worker = None
-    print("CRITICAL ERROR: Could not import 'live_worker.process_worker'. Ensure the folder exists.")
+from live_worker.protocol import (
+    PROTOCOL_VERSION, LOG_LEVELS, MSG_READY, MSG_LOG, MSG_LOGIN_FINISHED, MSG_RELOGIN_FINISHED,
+    MSG_SEARCH_FINISHED, MSG_VACCINES_LOADED, MSG_SESSION_EXPIRED, MSG_ADD_VACCINE_FAILED,
+    MSG_TASK_CANCELLED, MSG_HISTORY_FAILED, MSG_VACCINE_ADDED, MSG_SEARCH_FAILED, make_envelope
+)
+# Chỉ thư viện chuẩn: process_worker (requests/lxml) được import trong tiến trình con
+from live_worker.bootstrap import run_worker, ACTIVATE
 
 class WorkerSignals(QObject):
     """
-    Defines the signals available from the running worker thread.
+    Defines the signals available from the worker process.
     """
     log_received = Signal(str)
     login_finished = Signal(bool, str)
@@ -21,65 +24,229 @@ class WorkerSignals(QObject):
     session_expired = Signal()
     add_vaccine_failed = Signal(str)
     relogin_finished = Signal(bool, str) # New signal for relogin
+    # (task_id, loại message, payload) cho mọi message gắn task_id - dùng để định tuyến theo tác vụ
+    task_message = Signal(int, str, object)
+    task_cancelled = Signal(int, str)  # (task_id, loại tác vụ)
+    # (doi_tuong_id, danh sách mũi tiêm, bảng rỗng thật) cho mọi lần tải lịch sử thành công, kể cả kết quả cũ
+    # và tác vụ tải trước (dùng cho cache)
+    history_loaded = Signal(str, list, bool)
+    search_loaded = Signal(str, list)  # (SĐT, danh sách đối tượng) cho mọi lần tìm kiếm có kết quả
+    history_failed = Signal(str, str)  # (doi_tuong_id, thông báo lỗi) - lỗi mạng/máy chủ, không phải hết phiên
+    vaccine_added = Signal(str)        # doi_tuong_id vừa được thêm mũi tiêm
+    search_failed = Signal(str)        # thông báo lỗi - tìm kiếm bị mất (worker chết giữa chừng)
+    # doi_tuong_id có thể vừa được thêm mũi tiêm mà không chắc (mất worker khi đang thêm): bỏ cache lịch sử
+    history_stale = Signal(str)
     
     # Internal signal to indicate the worker process has started/ready
     worker_ready = Signal()
 
-class WorkerMonitor(QThread):
+# Kênh kết quả của từng loại tác vụ: kết quả của tác vụ cũ hơn tác vụ mới nhất cùng kênh bị bỏ qua
+# (worker chạy song song nên kết quả có thể về không theo thứ tự gửi)
+RESULT_CHANNELS = {
+    "search_phone": "search",
+    "get_vaccines": "history",
+    "add_vaccine": "history",
+}
+# Tác vụ chỉ đọc, huỷ được an toàn (add_vaccine thì không)
+CANCELLABLE_TASKS = ("search_phone", "get_vaccines")
+CHANNEL_RESULTS = {
+    "search_finished": "search",
+    "vaccines_loaded": "history",
+    "history_failed": "history",
+    "search_failed": "search",
+}
+# Khoá cache của từng loại tác vụ (doiTuongId / SĐT) - WorkerService nhớ task_id -> khoá
+TASK_KEYS = {
+    "get_vaccines": "doi_tuong_id",
+    "add_vaccine": "DOI_TUONG_ID",
+    "search_phone": "phone",
+}
+# Message kết thúc một tác vụ (sau đó không còn message nào cùng task_id)
+FINAL_MESSAGES = (MSG_SEARCH_FINISHED, MSG_VACCINES_LOADED, MSG_HISTORY_FAILED, MSG_TASK_CANCELLED,
+                  MSG_SESSION_EXPIRED, MSG_ADD_VACCINE_FAILED, MSG_SEARCH_FAILED)
+# Thông báo cho tác vụ đang chạy dở khi worker chết (không gửi lại cho worker mới)
+LOST_TASK_MESSAGE = "Mất kết nối với tiến trình worker, vui lòng thử lại."
+LOST_ADD_MESSAGE = ("Mất kết nối với tiến trình worker khi đang thêm mũi tiêm. Mũi tiêm có thể đã được lưu: "
+                    "hãy xem lại lịch sử tiêm trước khi thêm lại.")
+
+STANDBY_DELAY_MS = 3000
+
+class WorkerChannel(QObject):
+    """
+    Đầu nhận của kênh message từ worker: socket loopback + multiprocessing Connection.
+    QSocketNotifier đánh thức vòng lặp sự kiện Qt khi có dữ liệu nên không có polling
+    khi rảnh. Worker kết nối tới `address` bằng `authkey` (xem live_worker/protocol.py).
+    """
+    message_received = Signal(object)
+    disconnected = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.authkey = os.urandom(32)
+        self._server = socket.create_server(("127.0.0.1", 0))
+        self._server.setblocking(False)
+        self.address = self._server.getsockname()
+        self._accept_notifier = QSocketNotifier(self._server.fileno(), QSocketNotifier.Type.Read, self)
+        self._accept_notifier.activated.connect(self._on_accept)
+        self._conn = None
+        self._read_notifier = None
+
+    def _on_accept(self):
+        try:
+            sock, _ = self._server.accept()
+        except (BlockingIOError, OSError):
+            return
+        sock.setblocking(True)
+        conn = Connection(sock.detach())
+        try:
+            # Cùng bước xác thực với multiprocessing.connection.Listener.accept()
+            deliver_challenge(conn, self.authkey)
+            answer_challenge(conn, self.authkey)
+        except Exception as e:
+            print(f"WorkerChannel: từ chối kết nối không hợp lệ: {e}")
+            conn.close()
+            return
+
+        self._close_connection()
+        self._conn = conn
+        self._read_notifier = QSocketNotifier(conn.fileno(), QSocketNotifier.Type.Read, self)
+        self._read_notifier.activated.connect(self._on_readable)
+
+    def _on_readable(self):
+        conn = self._conn
+        if conn is None:
+            return
+        try:
+            # Đọc hết các message đang có (notifier chỉ báo một lần cho nhiều message)
+            while conn.poll():
+                self.message_received.emit(conn.recv())
+        except (EOFError, OSError):
+            self._close_connection()
+            self.disconnected.emit()
+
+    def _close_connection(self):
+        if self._read_notifier:
+            self._read_notifier.setEnabled(False)
+            self._read_notifier.deleteLater()
+            self._read_notifier = None
+        if self._conn:
+            try:
+                self._conn.close()
+            except OSError:
+                pass
+            self._conn = None
+
+    def close(self):
+        self._close_connection()
+        self._accept_notifier.setEnabled(False)
+        try:
+            self._server.close()
+        except OSError:
+            pass
+
+class WorkerMonitor(QObject):
     """
-    A background thread that polls the multiprocessing queue for messages 
-    from the worker process and emits PySide6 signals.
+    Chuyển envelope từ worker thành các PySide6 signal (chạy trên luồng GUI, gọi bởi WorkerChannel).
     """
-    def __init__(self, out_queue, signals):
+    def __init__(self, signals, latest_tasks=None, task_keys=None, background_tasks=None, pending_tasks=None):
         super().__init__()
-        self.out_queue = out_queue
         self.signals = signals
-        self._is_running = True
+        self.latest_tasks = latest_tasks if latest_tasks is not None else {}
+        self.task_keys = task_keys if task_keys is not None else {}
+        self.pending_tasks = pending_tasks if pending_tasks is not None else {}
+        self.background_tasks = background_tasks if background_tasks is not None else set()
+        self._expired_pending = False
 
-    def run(self):
-        while self._is_running:
-            try:
-                # Non-blocking get with timeout to allow checking _is_running
-                message = self.out_queue.get(timeout=0.1)
-                
-                if message is None:
-                    break
-
-                msg_type = message.get("type")
-                payload = message.get("payload")
-
-                if msg_type == "log":
-                    self.signals.log_received.emit(payload)
-                    # Detect readiness based on log message (legacy behavior adaptation)
-                    if "Trình duyệt (giả mạo) đã sẵn sàng" in str(payload):
-                        self.signals.worker_ready.emit()
-                        
-                elif msg_type == "login_finished":
-                    self.signals.login_finished.emit(payload.get("ok"), payload.get("message", ""))
-                    
-                elif msg_type == "search_finished":
-                    self.signals.search_finished.emit(payload)
-                    
-                elif msg_type == "vaccines_loaded":
-                    self.signals.vaccines_loaded.emit(payload)
-                    
-                elif msg_type == "session_expired":
+    def _is_stale(self, msg_type, task_id):
+        channel = CHANNEL_RESULTS.get(msg_type)
+        if channel is None or task_id is None:
+            return False
+        return task_id < self.latest_tasks.get(channel, 0)
+
+    @Slot(object)
+    def handle_message(self, message):
+        try:
+            if not isinstance(message, dict) or message.get("v") != PROTOCOL_VERSION:
+                self.signals.log_received.emit(f"[WARNING] Bỏ qua message sai phiên bản giao thức: {message!r:.120}")
+                return
+
+            msg_type = message.get("type")
+            payload = message.get("payload")
+            task_id = message.get("task_id")
+
+            # Log gom theo tác vụ đi kèm envelope (kể cả khi kết quả bị bỏ qua)
+            for line in message.get("logs") or ():
+                self.signals.log_received.emit(line)
+
+            if task_id is not None:
+                self.signals.task_message.emit(task_id, msg_type, payload)
+                if msg_type == MSG_VACCINE_ADDED and task_id in self.pending_tasks:
+                    self.pending_tasks[task_id]["added"] = True
+                if msg_type in FINAL_MESSAGES:
+                    self.pending_tasks.pop(task_id, None)
+                    key = self.task_keys.pop(task_id, None)
+                    # Kết quả thành công luôn đúng với khoá của nó, dù đã cũ với màn hình
+                    if key and msg_type == MSG_VACCINES_LOADED:
+                        self.signals.history_loaded.emit(key, payload, bool(message.get("empty_table")))
+                    elif key and msg_type == MSG_SEARCH_FINISHED and payload:
+                        self.signals.search_loaded.emit(key, payload)
+                if task_id in self.background_tasks:
+                    # Tác vụ nền chỉ nạp cache; hết phiên thì vẫn báo để đăng nhập lại
+                    if msg_type in FINAL_MESSAGES:
+                        self.background_tasks.discard(task_id)
+                    if msg_type == MSG_HISTORY_FAILED:
+                        self.signals.log_received.emit(f"[WARNING] Tải trước lịch sử thất bại (tác vụ #{task_id}): {(payload or {}).get('message', '')}")
+                    if msg_type != MSG_SESSION_EXPIRED:
+                        return
+                elif self._is_stale(msg_type, task_id):
+                    self.signals.log_received.emit(f"[INFO] Bỏ qua kết quả cũ '{msg_type}' (tác vụ #{task_id}).")
+                    return
+
+            if msg_type == MSG_LOG:
+                self.signals.log_received.emit(payload)
+
+            elif msg_type == MSG_READY:
+                self.signals.log_received.emit(f"[INFO] Worker sẵn sàng (PID {payload.get('pid')}, {payload.get('max_concurrency')} luồng).")
+                self.signals.worker_ready.emit()
+
+            elif msg_type == MSG_LOGIN_FINISHED:
+                self._expired_pending = False
+                self.signals.login_finished.emit(payload.get("ok"), payload.get("message", ""))
+
+            elif msg_type == MSG_SEARCH_FINISHED:
+                self.signals.search_finished.emit(payload)
+
+            elif msg_type == MSG_VACCINES_LOADED:
+                self.signals.vaccines_loaded.emit(payload)
+
+            elif msg_type == MSG_SESSION_EXPIRED:
+                # Nhiều tác vụ song song có thể cùng báo hết phiên: chỉ đăng nhập lại một lần
+                if not self._expired_pending:
+                    self._expired_pending = True
                     self.signals.session_expired.emit()
-                    
-                elif msg_type == "add_vaccine_failed":
-                    self.signals.add_vaccine_failed.emit(payload.get("message", "Lỗi không xác định"))
-                
-                elif msg_type == "relogin_finished":
-                    self.signals.relogin_finished.emit(payload.get("ok"), payload.get("message", ""))
-
-            except queue.Empty:
-                continue
-            except Exception as e:
-                print(f"WorkerMonitor Error: {e}")
-
-    def stop(self):
-        self._is_running = False
-        self.wait()
+
+            elif msg_type == MSG_ADD_VACCINE_FAILED:
+                self.signals.add_vaccine_failed.emit(payload.get("message", "Lỗi không xác định"))
+
+            elif msg_type == MSG_HISTORY_FAILED:
+                payload = payload or {}
+                self.signals.history_failed.emit(str(payload.get("doi_tuong_id", "")), payload.get("message", ""))
+
+            elif msg_type == MSG_VACCINE_ADDED:
+                self.signals.vaccine_added.emit(str((payload or {}).get("doi_tuong_id", "")))
+
+            elif msg_type == MSG_SEARCH_FAILED:
+                self.signals.search_failed.emit((payload or {}).get("message", ""))
+
+            elif msg_type == MSG_TASK_CANCELLED:
+                self.signals.task_cancelled.emit(task_id or 0, (payload or {}).get("task_type", ""))
+
+            elif msg_type == MSG_RELOGIN_FINISHED:
+                self._expired_pending = False
+                self.signals.relogin_finished.emit(payload.get("ok"), payload.get("message", ""))
+
+        except Exception as e:
+            print(f"WorkerMonitor Error: {e}")
 
 class WorkerService(QObject):
     """
@@ -89,79 +256,222 @@ class WorkerService(QObject):
         super().__init__()
         self.signals = WorkerSignals()
         self.in_queue = multiprocessing.Queue()
-        self.out_queue = multiprocessing.Queue()
+        self.channel = None
         self.process = None
         self.monitor = None
+        self._task_ids = itertools.count(1)
+        # Kênh kết quả -> task_id mới nhất (WorkerMonitor đọc để bỏ kết quả cũ)
+        self.latest_tasks = {}
+        # Kênh -> task_id chỉ đọc mới nhất (dùng cho cancel_channel)
+        self._latest_cancellable = {}
+        # task_id -> doi_tuong_id / SĐT của tác vụ đang chạy (WorkerMonitor dùng để phát history_loaded/search_loaded)
+        self.task_keys = {}
+        # task_id của các tác vụ nền (tải trước lịch sử): kết quả chỉ vào cache, không lên màn hình
+        self.background_tasks = set()
+        # task_id -> {"type", "key", "added"} của tác vụ có kết quả chưa về (xử lý khi worker chết: _settle_lost_tasks)
+        self.pending_tasks = {}
+        # Worker dự phòng nóng: (Process, Queue riêng) - xem start_worker
+        self.standby = None
+        self.hot_standby = True
+        self._max_concurrency = None
+        self._stopping = False
+        self._log_level = None
+        # Spawn worker dự phòng sau khi worker chính sẵn sàng, lùi lại để không tranh CPU với lần đăng nhập đầu
+        self.signals.worker_ready.connect(lambda: QTimer.singleShot(STANDBY_DELAY_MS, self._ensure_standby))
 
-    def start_worker(self):
-        if playwright_process_worker is None:
-            self.signals.log_received.emit("❌ Lỗi: Không tìm thấy module worker.")
-            return
-
+    def start_worker(self, max_concurrency=None, standby=True):
+        """
+        Khởi động worker (không làm gì nếu đang chạy).
+        standby=True: khi worker sẵn sàng, spawn thêm một worker dự phòng nóng (đã nạp sẵn module,
+        chưa kết nối); nếu worker đang chạy chết, worker dự phòng thay thế ngay.
+        """
         if self.process and self.process.is_alive():
             return
 
-        self.process = multiprocessing.Process(
-            target=playwright_process_worker,
-            args=(self.in_queue, self.out_queue)
+        try:
+            self._max_concurrency = int(max_concurrency) if max_concurrency else None
+        except (TypeError, ValueError):
+            self._max_concurrency = None
+            self.signals.log_received.emit(f"[WARNING] worker_concurrency không hợp lệ: {max_concurrency}")
+        self.hot_standby = bool(standby)
+        self._stopping = False
+
+        if self.channel is None:
+            self.channel = WorkerChannel(self)
+            self.monitor = WorkerMonitor(self.signals, self.latest_tasks, self.task_keys, self.background_tasks,
+                                         self.pending_tasks)
+            self.channel.message_received.connect(self.monitor.handle_message)
+            self.channel.disconnected.connect(self._on_worker_disconnected)
+
+        self.process = self._spawn(self.in_queue)
+
+    def _spawn(self, in_queue, standby=False):
+        process = multiprocessing.Process(
+            target=run_worker,
+            args=(in_queue, (self.channel.address, self.channel.authkey), self._max_concurrency, standby),
+            daemon=standby  # worker dự phòng không giữ trạng thái, thoát theo GUI
         )
-        self.process.start()
+        process.start()
+        return process
 
-        self.monitor = WorkerMonitor(self.out_queue, self.signals)
-        self.monitor.start()
+    @Slot()
+    def _ensure_standby(self):
+        if not self.hot_standby or self._stopping or self.channel is None:
+            return
+        if self.standby and self.standby[0].is_alive():
+            return
+        queue = multiprocessing.Queue()
+        self.standby = (self._spawn(queue, standby=True), queue)
+
+    @Slot()
+    def _on_worker_disconnected(self):
+        self.signals.log_received.emit("[WARNING] Mất kết nối với tiến trình worker.")
+        if self._stopping or self.process is None:
+            return
+        # Kết nối mất nghĩa là worker không còn báo được gì nữa: dọn hẳn rồi thay worker khác
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
+        self._failover()
+
+    def _settle_lost_tasks(self):
+        """
+        Kết thúc các tác vụ worker cũ chưa trả kết quả bằng message lỗi tự tạo (qua WorkerMonitor nên tác vụ
+        nền/kết quả cũ vẫn bị bỏ qua như thường). Không gửi lại tác vụ nào cho worker mới: add_vaccine có thể
+        đã được lưu trên VNCDC trước khi worker chết.
+        """
+        lost = dict(self.pending_tasks)
+        for task_id, task in sorted(lost.items()):
+            key = task["key"]
+            if task["type"] == "search_phone":
+                message = {"type": MSG_SEARCH_FAILED, "payload": {"phone": key, "message": LOST_TASK_MESSAGE}}
+            elif task["type"] == "get_vaccines":
+                message = {"type": MSG_HISTORY_FAILED, "payload": {"doi_tuong_id": key, "message": LOST_TASK_MESSAGE}}
+            elif task["added"]:
+                # Đã thêm xong, chỉ mất lần tải lại lịch sử
+                message = {"type": MSG_HISTORY_FAILED, "payload": {"doi_tuong_id": key, "message": LOST_TASK_MESSAGE}}
+            else:
+                if key:
+                    self.signals.history_stale.emit(key)
+                message = {"type": MSG_ADD_VACCINE_FAILED, "payload": {"message": LOST_ADD_MESSAGE}}
+            self.signals.log_received.emit(f"[WARNING] Tác vụ '{task['type']}' #{task_id} bị mất cùng worker cũ.")
+            message["task_id"] = task_id
+            self.monitor.handle_message(make_envelope(message))
+        self.pending_tasks.clear()
+
+    def _failover(self):
+        old_queue = self.in_queue
+        # Tác vụ đã gửi cho worker cũ không còn kết quả: báo lỗi cho từng tác vụ, không chạy lại
+        self._settle_lost_tasks()
+        self.task_keys.clear()
+        self.background_tasks.clear()
+        standby, self.standby = self.standby, None
+        if standby and standby[0].is_alive():
+            self.process, self.in_queue = standby
+            self.in_queue.put({"type": ACTIVATE})
+            self.signals.log_received.emit(f"[WARNING] Chuyển sang worker dự phòng (PID {self.process.pid}).")
+        else:
+            self.in_queue = multiprocessing.Queue()
+            self.process = self._spawn(self.in_queue)
+            self.signals.log_received.emit("[WARNING] Không có worker dự phòng, đang khởi động worker mới...")
+        if self._log_level:
+            self.set_log_level(self._log_level)
+        # Hàng đợi cũ không còn ai đọc: không chờ đẩy hết dữ liệu khi thoát
+        old_queue.close()
+        old_queue.cancel_join_thread()
 
     def stop_worker(self):
-        if self.monitor:
-            self.monitor.stop()
-        
+        self._stopping = True
         if self.process and self.process.is_alive():
             self.in_queue.put(None)  # Sentinel to stop worker loop
             self.process.join(timeout=2)
             if self.process.is_alive():
                 self.process.terminate()
-        
+
+        if self.standby:
+            process, queue = self.standby
+            if process.is_alive():
+                queue.put(None)
+                process.join(timeout=1)
+                if process.is_alive():
+                    process.terminate()
+            self.standby = None
+
+        if self.channel:
+            self.channel.close()
         self.process = None
+        self.channel = None
         self.monitor = None
+        self.task_keys.clear()
+        self.background_tasks.clear()
+        self.pending_tasks.clear()
 
     # --- Task Commands ---
+    # Mỗi request_* trả về task_id; message trả về từ worker mang cùng task_id.
+
+    def _submit(self, task_type, payload, background=False):
+        task_id = next(self._task_ids)
+        channel = None if background else RESULT_CHANNELS.get(task_type)
+        if channel:
+            self.latest_tasks[channel] = task_id
+            if task_type in CANCELLABLE_TASKS:
+                self._latest_cancellable[channel] = task_id
+            else:
+                self._latest_cancellable.pop(channel, None)
+        key_name = TASK_KEYS.get(task_type)
+        if key_name and payload.get(key_name):
+            self.task_keys[task_id] = str(payload[key_name])
+        if key_name:
+            self.pending_tasks[task_id] = {"type": task_type, "key": str(payload.get(key_name) or ""), "added": False}
+        task = {"type": task_type, "payload": payload, "task_id": task_id}
+        if background:
+            task["background"] = True
+            self.background_tasks.add(task_id)
+        self.in_queue.put(task)
+        return task_id
 
     def request_login(self, username, password):
-        self.in_queue.put({
-            "type": "login", 
-            "payload": {"username": username, "password": password}
-        })
+        return self._submit("login", {"username": username, "password": password})
 
     def request_relogin(self, username, password):
         # Triggers the specific relogin logic in worker which clears cookies first
-        self.in_queue.put({
-            "type": "relogin", 
-            "payload": {"username": username, "password": password}
-        })
+        return self._submit("relogin", {"username": username, "password": password})
 
     def request_search(self, phone):
-        self.in_queue.put({
-            "type": "search_phone", 
-            "payload": {"phone": phone}
-        })
+        return self._submit("search_phone", {"phone": phone})
 
-    def request_history(self, subject_id):
-        self.in_queue.put({
-            "type": "get_vaccines", 
-            "payload": {"doi_tuong_id": subject_id}
-        })
+    def request_history(self, subject_id, background=False):
+        """background=True: tải trước vào cache (history_loaded), không ảnh hưởng tác vụ đang hiển thị."""
+        return self._submit("get_vaccines", {"doi_tuong_id": subject_id}, background=background)
 
     def request_add_vaccine(self, subject_id, vaccine_id, date_str):
-        self.in_queue.put({
-            "type": "add_vaccine", 
-            "payload": {
-                "DOI_TUONG_ID": subject_id,
-                "VACXIN_ID": vaccine_id,
-                "NGAY_TIEM": date_str
-            }
+        return self._submit("add_vaccine", {
+            "DOI_TUONG_ID": subject_id,
+            "VACXIN_ID": vaccine_id,
+            "NGAY_TIEM": date_str
         })
 
     def request_ping(self):
-        self.in_queue.put({
-            "type": "ping", 
-            "payload": {}
-        })
\ No newline at end of file
+        return self._submit("ping", {})
+
+    def set_log_level(self, level):
+        """Đổi mức log của worker lúc đang chạy (DEBUG/INFO/WARNING/ERROR)."""
+        level = str(level or "").upper()
+        if level in LOG_LEVELS:
+            self._log_level = level  # gửi lại cho worker dự phòng khi chuyển đổi
+            self.in_queue.put({"type": "set_log_level", "payload": {"level": level}})
+
+    def cancel_tasks(self, *task_ids):
+        """Huỷ các tác vụ đang chờ/đang chạy trong worker; kết quả của chúng sẽ không được gửi về."""
+        task_ids = [tid for tid in task_ids if tid]
+        if task_ids:
+            self.in_queue.put({"type": "cancel", "payload": {"task_ids": task_ids}})
+
+    def cancel_background(self):
+        """Huỷ mọi tác vụ tải trước còn đang chờ/đang chạy."""
+        # Giữ lại task_id: task_cancelled trả về vẫn được nhận ra là tác vụ nền
+        self.cancel_tasks(*self.background_tasks)
+
+    def cancel_channel(self, channel):
+        """Huỷ tác vụ chỉ đọc mới nhất của một kênh kết quả ('search' / 'history')."""
+        self.cancel_tasks(self._latest_cancellable.pop(channel, None))
@@ -0,0 +1,234 @@
+# startup.py
+"""
+Khởi động ứng dụng theo công việc thật thay cho chuỗi QTimer cố định của splash cũ.
+
+Ngay khi hiện splash:
+- tạo WorkerService, khởi động tiến trình worker; worker sẵn sàng là đăng nhập VNCDC luôn
+- luồng nền: nạp/biên dịch quy tắc (AnalysisService), đọc vaccine_list.json, mở sẵn kết nối HIS
+trong khi luồng GUI dựng MainWindow. MainController được tạo khi cửa sổ và quy tắc đã xong,
+rồi nhận lại worker/đăng nhập đang chạy. Thanh tiến trình chạy theo tác vụ đã hoàn thành.
+Khi mọi tác vụ xong (hoặc quá REPORT_TIMEOUT_MS), báo cáo thời gian được ghi vào log.
+"""
+import atexit
+import threading
+import time
+
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+
+from services.analysis_service import AnalysisService
+from services.base_db_service import BaseDbService
+from services.config_service import ConfigService
+from services.worker_service import WorkerService
+from live_worker.vaccine_data import get_vaccine_list
+from ui_pyside.splash_screen import SplashScreen
+
+# Tác vụ khởi động: tên -> (mô tả, trọng số trên thanh tiến trình; 0 = không chờ trước khi hiện cửa sổ)
+STARTUP_TASKS = {
+    "worker": ("Khởi động tiến trình worker", 0),
+    "login": ("Đăng nhập VNCDC", 0),
+    "rules": ("Nạp quy tắc tiêm chủng", 30),
+    "vaccine_list": ("Đọc danh sách vắc-xin", 0),
+    "his": ("Kết nối CSDL HIS", 0),
+    "window": ("Dựng giao diện", 50),
+    "controller": ("Kết nối services", 20),
+}
+REPORT_TIMEOUT_MS = 60000
+
+
+class StartupOrchestrator(QObject):
+    # (tên tác vụ, lỗi hoặc "") - phát từ luồng nền, nhận trên luồng GUI
+    task_finished = Signal(str, str)
+
+    def __init__(self, main_window_class, controller_class):
+        super().__init__()
+        self.main_window_class = main_window_class
+        self.controller_class = controller_class
+        self.splash = None
+        self.main_window = None
+        self.controller = None
+        self.services = {}
+
+        self._t0 = None
+        self._started = {}
+        self._finished = {}   # tên -> (thời điểm xong, lỗi)
+        self._shown_at = None
+        self._reported = False
+        self._login_status = None
+        self._login_result = None
+        self._early_logs = []
+        self.task_finished.connect(self._on_task_finished)
+
+    # --- Theo dõi tác vụ ---
+    def _now(self):
+        return time.perf_counter() - self._t0
+
+    def _begin(self, name):
+        self._started[name] = self._now()
+
+    def _run_in_background(self, name, func):
+        self._begin(name)
+
+        def target():
+            try:
+                func()
+            except Exception as e:
+                self.task_finished.emit(name, str(e) or type(e).__name__)
+            else:
+                self.task_finished.emit(name, "")
+
+        threading.Thread(target=target, name=f"startup-{name}", daemon=True).start()
+
+    @Slot(str, str)
+    def _on_task_finished(self, name, error):
+        if name in self._finished:
+            return
+        self._finished[name] = (self._now(), error)
+        self._update_progress()
+        if self.controller is None:
+            self._maybe_build_controller()
+        else:
+            self._maybe_finish()
+        self._maybe_report()
+
+    def _update_progress(self):
+        if self.splash is None:
+            return
+        total = sum(weight for _, weight in STARTUP_TASKS.values())
+        done = sum(STARTUP_TASKS[name][1] for name in self._finished if name in STARTUP_TASKS)
+        pending = [desc for name, (desc, weight) in STARTUP_TASKS.items() if weight and name not in self._finished]
+        status = f"Đang {pending[0][0].lower()}{pending[0][1:]}..." if pending else "Sẵn sàng!"
+        self.splash.set_progress(int(done * 100 / total), status)
+
+    def _awaited_done(self):
+        return all(name in self._finished for name, (_, weight) in STARTUP_TASKS.items() if weight)
+
+    # --- Trình tự khởi động ---
+    def start(self):
+        self._t0 = time.perf_counter()
+        self.splash = SplashScreen()
+        self.splash.show()
+        self.splash.start_animation()
+
+        # 1. Worker + đăng nhập sớm (tiến trình con khởi động song song với việc dựng giao diện)
+        config = self.services['config'] = ConfigService()
+        worker = self.services['worker'] = WorkerService()
+        worker.signals.worker_ready.connect(self._on_worker_ready)
+        worker.signals.login_finished.connect(self._on_login_finished)
+        worker.signals.log_received.connect(self._buffer_log)
+        atexit.register(worker.stop_worker)  # nếu ứng dụng thoát trước khi có MainController
+        self._begin("worker")
+        worker.start_worker(config.get_value("worker_concurrency"), config.get_value("worker_standby", "1") != "0")
+
+        # 2. Việc nền
+        self._run_in_background("rules", self._load_rules)
+        self._run_in_background("vaccine_list", get_vaccine_list)
+        self._run_in_background("his", lambda: BaseDbService.get_pool().prewarm(1))
+
+        # 3. Dựng cửa sổ sau khi splash đã kịp vẽ
+        QTimer.singleShot(0, self._build_window)
+        QTimer.singleShot(REPORT_TIMEOUT_MS, lambda: self._maybe_report(force=True))
+
+    def _load_rules(self):
+        self.services['analysis'] = AnalysisService()
+        if self.services['analysis'].rule_plan is None:
+            raise RuntimeError("không nạp được quy tắc")
+
+    def _build_window(self):
+        self._begin("window")
+        self.main_window = self.main_window_class()
+        self._on_task_finished("window", "")
+
+    def _maybe_build_controller(self):
+        if self.main_window is None or "rules" not in self._finished or self.controller is not None:
+            return
+        self._begin("controller")
+        prebuilt = {key: self.services[key] for key in ("config", "worker", "analysis") if key in self.services}
+        self.controller = self.controller_class(self.main_window, prebuilt)
+        # Hiện cửa sổ rồi bàn giao ngay trong cùng lượt, không để signal nào của worker lọt giữa chừng
+        self._on_task_finished("controller", "")
+        self._handoff()
+
+    def _handoff(self):
+        """Từ giờ MainController nhận các signal của worker; phát lại những gì đã xảy ra trước đó."""
+        signals = self.services['worker'].signals
+        signals.worker_ready.disconnect(self._on_worker_ready)
+        signals.login_finished.disconnect(self._on_login_finished)
+        signals.log_received.disconnect(self._buffer_log)
+        # Chỉ còn ghi thời gian cho báo cáo; AuthController tự đăng nhập/xử lý kết quả
+        signals.worker_ready.connect(self._on_worker_ready_late)
+        signals.login_finished.connect(self._on_login_finished_late)
+        for line in self._early_logs:
+            self.controller.on_worker_log(line)
+        self._early_logs = []
+        self.controller.auth_ctrl.adopt_startup_login(self._login_status, self._login_result)
+
+    @Slot(str)
+    def _buffer_log(self, line):
+        self._early_logs.append(line)
+
+    def _maybe_finish(self):
+        if self._shown_at is not None or not self._awaited_done():
+            return
+        self._shown_at = self._now()
+        self.splash.stop_animation()
+        self.splash.close()
+        self.splash = None
+        self.main_window.show()
+
+    # --- Đăng nhập sớm (trước khi có AuthController) ---
+    @Slot()
+    def _on_worker_ready(self):
+        self._on_task_finished("worker", "")
+        creds = self.services['config'].load_config()
+        if creds.get("username") and creds.get("password"):
+            self._begin("login")
+            self._login_status = "pending"
+            self.services['worker'].request_login(creds["username"], creds["password"])
+        else:
+            self._login_status = "skipped"
+            self._begin("login")
+            self._on_task_finished("login", "thiếu thông tin đăng nhập")
+
+    @Slot(bool, str)
+    def _on_login_finished(self, ok, message):
+        self._login_status = "done"
+        self._login_result = (ok, message)
+        self._on_task_finished("login", "" if ok else message)
+
+    @Slot()
+    def _on_worker_ready_late(self):
+        self._on_task_finished("worker", "")
+        self._begin("login")
+
+    @Slot(bool, str)
+    def _on_login_finished_late(self, ok, message):
+        self._on_task_finished("login", "" if ok else message)
+
+    # --- Báo cáo ---
+    def _maybe_report(self, force=False):
+        if self._reported or self.controller is None:
+            return
+        if not force and (self._shown_at is None or any(name not in self._finished for name in STARTUP_TASKS)):
+            return
+        self._reported = True
+        for line in self.format_report():
+            print(line)
+            self.controller.on_worker_log(line)
+
+    def format_report(self):
+        lines = [f"[STARTUP] Cửa sổ hiện sau {self._shown_at * 1000:.0f} ms." if self._shown_at is not None
+                 else "[STARTUP] Cửa sổ chưa hiện."]
+        for name, (desc, weight) in STARTUP_TASKS.items():
+            start = self._started.get(name)
+            if start is None:
+                lines.append(f"[STARTUP]   {desc:<28} chưa bắt đầu")
+                continue
+            if name not in self._finished:
+                lines.append(f"[STARTUP]   {desc:<28} {start * 1000:7.0f} ms -> (chưa xong)")
+                continue
+            end, error = self._finished[name]
+            note = f"  LỖI: {error}" if error else ""
+            wait = "" if weight else "  (nền)"
+            lines.append(f"[STARTUP]   {desc:<28} {start * 1000:7.0f} ms -> {end * 1000:7.0f} ms "
+                         f"({(end - start) * 1000:.0f} ms){wait}{note}")
+        return lines
@@ -2,13 +2,16 @@ import qtawesome as qta
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QLineEdit, QPushButton, QListWidget, QListWidgetItem,
-    QTableWidget, QHeaderView, QAbstractItemView,
+    QTableView, QHeaderView, QAbstractItemView,
     QFrame, QSizePolicy, QStyledItemDelegate
 )
 from PySide6.QtCore import Qt, QPropertyAnimation, QEasingCurve, QRegularExpression, Signal, QSize, QRect, QEvent
 from PySide6.QtGui import QColor, QBrush, QRegularExpressionValidator
 from .loading_overlay import LoadingOverlay
 from .assigned_list_view import AssignedListView
+from .analysis_table_models import (
+    AdministeredTableModel, MissingTableModel, ResultFilterProxyModel, StatusIconDelegate
+)
 
 class AutoClearLineEdit(QLineEdit):
     def focusInEvent(self, event):
@@ -201,9 +204,15 @@ class AnalysisTab(QWidget):
         hist_header.addWidget(self.export_vaccinated_btn)
         hist_header.addWidget(self.delete_vaccinated_img_btn)
         
-        self.admin_table = QTableWidget()
-        self.admin_table.setColumnCount(3)
-        self.admin_table.setHorizontalHeaderLabels(["Vắc-xin", "Mũi", "Ngày tiêm"])
+        # Model/view: dữ liệu là các dict kết quả phân tích, icon/màu lấy từ cache theo nhóm trạng thái
+        self.admin_model = AdministeredTableModel(self)
+        self.admin_proxy = ResultFilterProxyModel(self)
+        self.admin_proxy.setSourceModel(self.admin_model)
+        self.status_delegate = StatusIconDelegate(self)
+        
+        self.admin_table = QTableView()
+        self.admin_table.setModel(self.admin_proxy)
+        self.admin_table.setItemDelegate(self.status_delegate)
         
         h_header = self.admin_table.horizontalHeader()
         h_header.setSectionResizeMode(0, QHeaderView.Stretch)
@@ -253,9 +262,13 @@ class AnalysisTab(QWidget):
         plan_header.addWidget(self.export_missing_btn)
         plan_header.addWidget(self.delete_missing_img_btn)
         
-        self.missing_table = QTableWidget()
-        self.missing_table.setColumnCount(2)
-        self.missing_table.setHorizontalHeaderLabels(["Nội dung", "Dự kiến"])
+        self.missing_model = MissingTableModel(self)
+        self.missing_proxy = ResultFilterProxyModel(self)
+        self.missing_proxy.setSourceModel(self.missing_model)
+        
+        self.missing_table = QTableView()
+        self.missing_table.setModel(self.missing_proxy)
+        self.missing_table.setItemDelegate(self.status_delegate)
         
         m_header = self.missing_table.horizontalHeader()
         m_header.setSectionResizeMode(0, QHeaderView.Stretch)
@@ -0,0 +1,200 @@
+import qtawesome as qta
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel
+from PySide6.QtGui import QColor, QBrush, QFont
+from PySide6.QtWidgets import QStyledItemDelegate, QStyleOptionViewItem
+
+from services.data_formatter import DataFormattingService
+
+ROW_DATA_ROLE = Qt.ItemDataRole.UserRole      # dict kết quả gốc (như QTableWidgetItem.data(UserRole) trước đây)
+SORT_ROLE = Qt.ItemDataRole.UserRole + 1
+ICON_KEY_ROLE = Qt.ItemDataRole.UserRole + 2  # khoá icon, delegate vẽ icon từ cache
+
+# --- Kiểu hiển thị theo nhóm trạng thái: (màu, icon, đậm) ---
+STYLE_GROUPS = {
+    "due": ("#0284C7", "fa5s.syringe", True),                   # Urgent/Due -> Bold Blue (Sky 600)
+    "warning": ("#D97706", "fa5s.exclamation-triangle", False),  # Warning -> Amber 600
+    "error": ("#DC2626", "fa5s.times-circle", False),            # Error -> Red 600
+    "info": ("#475569", "fa5s.clock", False),                    # Info/Future -> Slate 600
+}
+ADMIN_ICONS = {
+    "administered": ("fa5s.check-circle", "#10B981"),  # Green Check
+    "date": ("fa5s.calendar-alt", "#94A3B8"),
+}
+
+# Brush/font/icon được tạo một lần khi cần đến (QIcon cần QApplication đã khởi tạo)
+_brushes = {}
+_icons = {}
+_bold_font = None
+
+
+def _brush(color_code):
+    brush = _brushes.get(color_code)
+    if brush is None:
+        brush = _brushes[color_code] = QBrush(QColor(color_code))
+    return brush
+
+
+def _bold():
+    global _bold_font
+    if _bold_font is None:
+        _bold_font = QFont()
+        _bold_font.setBold(True)
+    return _bold_font
+
+
+def cached_icon(key):
+    icon = _icons.get(key)
+    if icon is None:
+        if key in STYLE_GROUPS:
+            color_code, icon_name, _ = STYLE_GROUPS[key]
+        else:
+            icon_name, color_code = ADMIN_ICONS[key]
+        icon = _icons[key] = qta.icon(icon_name, color=color_code)
+    return icon
+
+
+def missing_style_group(tags):
+    """Nhóm hiển thị của một mục cần tiêm (giữ đúng thứ tự ưu tiên cũ: due > warning > error > info)."""
+    if "due" in tags:
+        return "due"
+    if DataFormattingService.get_status_tags_for_missing_item(tags) == "warning":
+        return "warning"
+    if any(t.startswith("error") for t in tags):
+        return "error"
+    return "info"
+
+
+def _date_sort_key(raw_date):
+    return raw_date.toordinal() if raw_date else 0
+
+
+class _ResultTableModel(QAbstractTableModel):
+    """
+    Model chỉ đọc trên danh sách dict của AnalysisService.analyze; thông tin hiển thị tính một lần mỗi dòng.
+    Lớp con khai báo HEADERS và _prepare(item) -> tuple, phần tử đầu là chuỗi để tìm kiếm, phần tử cuối là dict gốc.
+    """
+    HEADERS = ()
+
+    def __init__(self, parent=None, normalizer=None):
+        super().__init__(parent)
+        self._rows = []
+        self._search_texts = []
+        self._normalizer = normalizer or DataFormattingService.remove_vietnamese_accents
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def set_rows(self, items):
+        self.beginResetModel()
+        self._rows = [self._prepare(item) for item in items]
+        self._search_texts = [self._normalizer(row[0].lower()) for row in self._rows]
+        self.endResetModel()
+
+    def row_data(self, row):
+        return self._rows[row][-1] if 0 <= row < len(self._rows) else None
+
+    def search_text(self, row):
+        return self._search_texts[row]
+
+
+class AdministeredTableModel(_ResultTableModel):
+    HEADERS = ("Vắc-xin", "Mũi", "Ngày tiêm")
+    BRUSH_SECONDARY = "#334155"  # Slate 700 for text
+    BRUSH_DIM = "#64748B"        # Slate 500 for date/dose
+
+    def _prepare(self, item):
+        # (tên, mũi, ngày, khoá sắp xếp mũi, khoá sắp xếp ngày, dict gốc)
+        dose = str(item['dose'])
+        try: dose_key = int(dose)
+        except ValueError: dose_key = 0
+        return (str(item['name']), dose, str(item['date']), dose_key, _date_sort_key(item.get('raw_date')), item)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        col = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return row[col]
+        if role == ROW_DATA_ROLE:
+            return row[-1]
+        if role == SORT_ROLE:
+            return (row[0].lower(), row[3], row[4])[col]
+        if role == ICON_KEY_ROLE:
+            return "administered" if col == 0 else "date" if col == 2 else None
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return _brush(self.BRUSH_SECONDARY if col == 0 else self.BRUSH_DIM)
+        if role == Qt.ItemDataRole.TextAlignmentRole and col == 1:
+            return int(Qt.AlignmentFlag.AlignCenter)
+        return None
+
+
+class MissingTableModel(_ResultTableModel):
+    HEADERS = ("Nội dung", "Dự kiến")
+
+    def _prepare(self, item):
+        # (mô tả, ngày, nhóm hiển thị, khoá sắp xếp ngày, dict gốc)
+        group = missing_style_group(item.get("status_tags", []))
+        return (str(item['description']), str(item['date_str']), group, _date_sort_key(item.get('raw_date')), item)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        col = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return row[col]
+        if role == ROW_DATA_ROLE:
+            return row[-1]
+        if role == SORT_ROLE:
+            return row[0].lower() if col == 0 else row[3]
+        if role == ICON_KEY_ROLE:
+            return row[2] if col == 0 else None
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return _brush(STYLE_GROUPS[row[2]][0])
+        if role == Qt.ItemDataRole.FontRole:
+            return _bold() if STYLE_GROUPS[row[2]][2] else None
+        if role == Qt.ItemDataRole.ToolTipRole and col == 0:
+            return row[0]
+        return None
+
+
+class ResultFilterProxyModel(QSortFilterProxyModel):
+    """Lọc theo cột đầu (không dấu, không phân biệt hoa thường) và sắp xếp theo SORT_ROLE."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._term = ""
+        self.setSortRole(SORT_ROLE)
+
+    def set_search_term(self, term):
+        if term != self._term:
+            self._term = term
+            self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self._term:
+            return True
+        return self._term in self.sourceModel().search_text(source_row)
+
+    def visible_row_data(self):
+        return [self.data(self.index(r, 0), ROW_DATA_ROLE) for r in range(self.rowCount())]
+
+
+class StatusIconDelegate(QStyledItemDelegate):
+    """Vẽ icon theo ICON_KEY_ROLE từ cache chung thay vì tạo QIcon cho từng ô."""
+
+    def initStyleOption(self, option, index):
+        super().initStyleOption(option, index)
+        key = index.data(ICON_KEY_ROLE)
+        if key:
+            option.icon = cached_icon(key)
+            option.features |= QStyleOptionViewItem.ViewItemFeature.HasDecoration
@@ -1,31 +1,53 @@
 import csv
 import re
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QFrame, 
-    QDateEdit, QLineEdit, QPushButton, QApplication,
-    QLabel, QTableWidget, QTableWidgetItem, QAbstractItemView, QHeaderView, 
+    QDateEdit, QLineEdit, QPushButton,
+    QLabel, QTableView, QAbstractItemView, QHeaderView, 
     QMessageBox, QFileDialog
 )
-from PySide6.QtCore import Qt, QDate, Signal, QUrl, QStandardPaths
+from PySide6.QtCore import Qt, QDate, Signal, QUrl, QStandardPaths, QTimer, QSortFilterProxyModel
 from PySide6.QtGui import QDesktopServices
 import qtawesome as qta
 
-try:
-    import xlsxwriter
-    HAS_XLSXWRITER = True
-except ImportError:
-    HAS_XLSXWRITER = False
+from ui_pyside.assigned_queue_model import (
+    AssignedQueueModel, QUEUE_COLUMNS, SORT_ROLE, queue_row_key, same_queue_row
+)
+from services.patient_service import QUEUE_STATUS_KEY, QUEUE_STATUS_WAITING
 
 class AssignedListView(QWidget):
     request_vncdc_search = Signal(str)
     log_message = Signal(str)
+    # (generation, data) - phát từ luồng nền, Qt chuyển về luồng giao diện
+    queue_loaded = Signal(int, object)
+
+    AUTO_REFRESH_MS = 10000
+    # Cứ chừng này nhịp tự làm mới thì lấy lại chỉ định của MỌI lượt khám (vẫn một lần gọi hàng loạt):
+    # chỉ định thêm/bớt trên lượt đã có trong hàng chờ không làm đổi các cột HIS dùng để so sánh
+    FULL_REFRESH_TICKS = 6
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.patient_service = None
         self.current_data = []
+        # Truy vấn HIS chạy nền; mỗi lần tải có một "generation", kết quả cũ hơn bị bỏ qua
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="assigned-list")
+        self._load_generation = 0
+        self._pending_future = None
+        self._pending_full = False
+        self._auto_ticks = 0
+        self._indications_refreshed_at = None
         self.setup_ui()
+        self.queue_loaded.connect(self.on_queue_loaded)
+
+        # Tự động làm mới (tăng dần): lấy lại chỉ định cho lượt mới/thay đổi/còn chờ khám,
+        # mỗi FULL_REFRESH_TICKS nhịp thì lấy lại toàn bộ
+        self.auto_refresh_timer = QTimer(self)
+        self.auto_refresh_timer.setInterval(self.AUTO_REFRESH_MS)
+        self.auto_refresh_timer.timeout.connect(self.refresh_incremental)
 
     def setup_ui(self):
         layout = QVBoxLayout(self)
@@ -51,6 +73,10 @@ class AssignedListView(QWidget):
         self.date_to.setDisplayFormat("dd/MM")
         self.date_to.setFixedWidth(80)
         
+        # Đổi khoảng ngày -> huỷ lần tải đang chạy cho khoảng cũ
+        self.date_from.dateChanged.connect(self.cancel_pending_load)
+        self.date_to.dateChanged.connect(self.cancel_pending_load)
+        
         # Refresh
         btn_refresh = QPushButton()
         btn_refresh.setIcon(qta.icon('fa5s.sync-alt', color='#4F46E5'))
@@ -58,6 +84,15 @@ class AssignedListView(QWidget):
         btn_refresh.setCursor(Qt.CursorShape.PointingHandCursor)
         btn_refresh.clicked.connect(self.load_data)
         
+        # Auto refresh toggle
+        self.btn_auto_refresh = QPushButton()
+        self.btn_auto_refresh.setIcon(qta.icon('fa5s.clock', color='#64748B'))
+        self._update_auto_refresh_tooltip()
+        self.btn_auto_refresh.setCheckable(True)
+        self.btn_auto_refresh.setFixedSize(36, 34)
+        self.btn_auto_refresh.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_auto_refresh.toggled.connect(self.set_auto_refresh)
+        
         # Search
         self.search_name = QLineEdit()
         self.search_name.setPlaceholderText("Tìm...")
@@ -75,13 +110,20 @@ class AssignedListView(QWidget):
         ctrl_layout.addWidget(lbl_sep)
         ctrl_layout.addWidget(self.date_to)
         ctrl_layout.addWidget(btn_refresh)
+        ctrl_layout.addWidget(self.btn_auto_refresh)
         ctrl_layout.addWidget(self.search_name)
         ctrl_layout.addWidget(self.btn_export)
 
         layout.addLayout(ctrl_layout)
 
         # --- Modern Data Table ---
-        self.table = QTableWidget()
+        self.model = AssignedQueueModel(self)
+        self.proxy_model = QSortFilterProxyModel(self)
+        self.proxy_model.setSourceModel(self.model)
+        self.proxy_model.setSortRole(SORT_ROLE)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy_model)
         self.table.setAlternatingRowColors(True)
         self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.table.setSelectionMode(QAbstractItemView.SingleSelection)
@@ -90,74 +132,24 @@ class AssignedListView(QWidget):
         self.table.setShowGrid(False)
         self.table.verticalHeader().setVisible(False)
         self.table.setSortingEnabled(True)
+        self.table.sortByColumn(0, Qt.SortOrder.AscendingOrder)
         self.table.setWordWrap(False)
+        self.apply_column_layout()
         
-        self.table.itemDoubleClicked.connect(self.on_item_double_clicked)
+        self.table.doubleClicked.connect(self.on_item_double_clicked)
         
         layout.addWidget(self.table)
 
-    def set_service(self, service):
-        self.patient_service = service
-
-    def load_data(self):
-        if self.patient_service is None:
-            return
-
-        f_date = f"{self.date_from.date().toString('yyyy-MM-dd')} 00:00:00"
-        t_date = f"{self.date_to.date().toString('yyyy-MM-dd')} 23:59:59"
-        name = self.search_name.text().strip()
-        
-        status_val = -1
-        
-        self.setCursor(Qt.WaitCursor)
-        self.table.setSortingEnabled(False)
-        
-        data = self.patient_service.get_vaccination_queue(f_date, t_date, name, status=status_val)
-        
-        if data is None: 
-            self.setCursor(Qt.ArrowCursor)
-            self.table.setSortingEnabled(True)
-            return
-        
-        self.current_data = data 
-        
-        try:
-            data.sort(key=lambda x: int(x.get('stt_kham', 0) or 0))
-        except: pass
-        
-        self.display_data(data)
-        
-        self.table.setSortingEnabled(True)
-        self.setCursor(Qt.ArrowCursor)
-
-    def display_data(self, data):
-        self.table.clear()
-        if not data:
-            self.table.setRowCount(0)
-            self.table.setColumnCount(0)
-            return
-
+    def apply_column_layout(self):
         # --- FIX: Condensed Layout for HIS ---
         # Removed Age & Phone to prioritize Name & Indication visibility.
         # STT: Fixed 40px
         # Name: ResizeToContents (or 130px min)
         # Indication: Stretch (Remaining space)
-        columns_config = [
-            ("STT", "stt_kham", 0, 40),
-            ("Họ và Tên", "ten_benhnhan", 1, 0),
-            ("Chỉ định (Vắc-xin)", "chi_dinh", 2, 0),
-            ("SĐT", "dien_thoai", 0, 0),   # Hidden, kept for data retrieval
-            ("ID", "id_benhnhan", 0, 0),   # Hidden
-            ("MA", "ma_luotkham", 0, 0)    # Hidden
-        ]
-        
-        self.table.setColumnCount(len(columns_config))
-        self.table.setHorizontalHeaderLabels([c[0] for c in columns_config])
-        
         header = self.table.horizontalHeader()
         header.setDefaultAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
         
-        for i, (title, key, w_type, w_val) in enumerate(columns_config):
+        for i, (title, key, w_type, w_val) in enumerate(QUEUE_COLUMNS):
             if w_type == 0: # Fixed
                 if w_val == 0: self.table.setColumnHidden(i, True)
                 else: 
@@ -168,47 +160,129 @@ class AssignedListView(QWidget):
             elif w_type == 2: # Stretch
                 header.setSectionResizeMode(i, QHeaderView.Stretch)
 
-        self.table.setRowCount(len(data))
+    def set_service(self, service):
+        self.patient_service = service
+
+    def load_data(self, incremental=False, refresh_indications=False):
+        """
+        Tải hàng chờ ở nền. incremental=True giữ lại chỉ định đã có của các lượt khám đã chỉ định và không đổi
+        (chỉ truy vấn chỉ định cho lượt mới/thay đổi/còn chờ khám/chưa có chỉ định); refresh_indications=True
+        lấy lại chỉ định của mọi lượt. Bảng luôn được cập nhật theo diff.
+        """
+        if self.patient_service is None:
+            return
+
+        f_date = f"{self.date_from.date().toString('yyyy-MM-dd')} 00:00:00"
+        t_date = f"{self.date_to.date().toString('yyyy-MM-dd')} 23:59:59"
+        name = self.search_name.text().strip()
         
-        for row_idx, item in enumerate(data):
-            if row_idx > 0 and row_idx % 20 == 0:
-                QApplication.processEvents()
+        self.cancel_pending_load()
+        generation = self._load_generation
+        known_rows = self.model.rows_by_key() if incremental and not refresh_indications else {}
+        self._pending_full = not known_rows
+        if not incremental:
+            self.setCursor(Qt.BusyCursor)
+        self._pending_future = self._executor.submit(self._fetch_queue, generation, f_date, t_date, name, known_rows)
+
+    def refresh_incremental(self):
+        # Bỏ qua nhịp này nếu lần tải trước chưa xong
+        if self._pending_future is not None and not self._pending_future.done():
+            return
+        self._auto_ticks += 1
+        self.load_data(incremental=True, refresh_indications=self._auto_ticks % self.FULL_REFRESH_TICKS == 0)
+
+    def set_auto_refresh(self, enabled):
+        if enabled:
+            self._auto_ticks = 0
+            self.auto_refresh_timer.start()
+        else:
+            self.auto_refresh_timer.stop()
+
+    def _update_auto_refresh_tooltip(self):
+        interval = self.AUTO_REFRESH_MS // 1000
+        last = time.strftime("%H:%M:%S", time.localtime(self._indications_refreshed_at)) \
+            if self._indications_refreshed_at else "chưa có"
+        self.btn_auto_refresh.setToolTip(
+            f"Tự động làm mới mỗi {interval} giây.\n"
+            f"Chỉ định của lượt đã chỉ định có thể chậm tới {interval * self.FULL_REFRESH_TICKS} giây "
+            f"(làm mới toàn bộ lần cuối: {last}); bấm nút làm mới để cập nhật ngay."
+        )
+
+    def cancel_pending_load(self):
+        """Đánh dấu lần tải hiện tại là cũ (kết quả sẽ bị bỏ qua) và huỷ nếu chưa bắt đầu chạy."""
+        self._load_generation += 1
+        if self._pending_future is not None:
+            self._pending_future.cancel()
+            self._pending_future = None
+        self.setCursor(Qt.ArrowCursor)
 
-            ma_luotkham = item.get('ma_luotkham')
-            id_benhnhan = item.get('id_benhnhan')
-            
-            vaccines = []
-            if ma_luotkham and id_benhnhan and self.patient_service:
+    def _is_stale(self, generation):
+        return generation != self._load_generation
+
+    def _fetch_queue(self, generation, f_date, t_date, name, known_rows=None):
+        """
+        Chạy trên luồng nền: lấy hàng chờ (cả 2 trạng thái song song) và chỉ định của các lượt khám.
+        known_rows ({khoá: dòng đã hiển thị}) cho phép dùng lại chỉ định của các dòng không thay đổi.
+        """
+        known_rows = known_rows or {}
+        data = None
+        try:
+            status_val = -1
+            data = self.patient_service.get_vaccination_queue(f_date, t_date, name, status=status_val)
+            if data is not None:
                 try:
-                    vaccines = self.patient_service.get_assigned_vaccines(ma_luotkham, id_benhnhan)
+                    data.sort(key=lambda x: int(x.get('stt_kham', 0) or 0))
                 except: pass
-            
-            vaccine_str = "; ".join(vaccines) if vaccines else ""
-            item['chi_dinh'] = vaccine_str
 
-            for col_idx, (title, key, _, _) in enumerate(columns_config):
-                val = item.get(key, "")
-                
-                table_item = QTableWidgetItem(str(val))
-                
-                if key == "stt_kham":
-                    table_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                
-                if key == "chi_dinh" and val:
-                    table_item.setForeground(Qt.GlobalColor.darkBlue)
-                    table_item.setToolTip(str(val))
+                if self._is_stale(generation):
+                    return
+                to_fetch = []
+                for item in data:
+                    old = known_rows.get(queue_row_key(item))
+                    if (old is not None and old.get('chi_dinh') and same_queue_row(old, item)
+                            and item.get(QUEUE_STATUS_KEY) != QUEUE_STATUS_WAITING):
+                        item['chi_dinh'] = old['chi_dinh']
+                    else:
+                        to_fetch.append(item)
+
+                # Một lần gọi cho cả hàng chờ thay vì 2 truy vấn cho mỗi dòng
+                assigned = self.patient_service.get_assigned_vaccines_bulk(
+                    (item.get('ma_luotkham'), item.get('id_benhnhan')) for item in to_fetch
+                ) if to_fetch else {}
+                for item in to_fetch:
+                    vaccines = assigned.get(item.get('ma_luotkham')) or []
+                    item['chi_dinh'] = "; ".join(vaccines) if vaccines else ""
+        except Exception as e:
+            self.log_message.emit(f"Lỗi tải danh sách chỉ định: {e}")
+            data = None
+        if not self._is_stale(generation):
+            self.queue_loaded.emit(generation, data)
 
-                self.table.setItem(row_idx, col_idx, table_item)
+    def on_queue_loaded(self, generation, data):
+        if self._is_stale(generation):
+            return
+        self._pending_future = None
+        self.setCursor(Qt.ArrowCursor)
+        if data is None:
+            return
+        if self._pending_full:
+            self._indications_refreshed_at = time.time()
+            self._update_auto_refresh_tooltip()
 
-    def on_item_double_clicked(self, item):
-        row = item.row()
-        # Phone is now at index 3 (Hidden)
-        phone_number = None
-        try:
-            item_phone = self.table.item(row, 3) 
-            if item_phone:
-                phone_number = item_phone.text().strip()
-        except AttributeError: pass
+        self.current_data = data
+        self.display_data(data)
+
+    def display_data(self, data):
+        # Cập nhật theo diff (theo ma_luotkham): giữ vùng chọn và vị trí cuộn
+        added, updated, removed = self.model.apply_rows(data or [])
+        if added or updated or removed:
+            self.log_message.emit(f"[QUEUE] Cập nhật bảng: +{added} ~{updated} -{removed}")
+
+    def on_item_double_clicked(self, index):
+        if index is None or not index.isValid():
+            return
+        item = self.model.row_data(self.proxy_model.mapToSource(index).row())
+        phone_number = str(item.get('dien_thoai', '') or '').strip() if item else None
         
         if not phone_number:
             QMessageBox.warning(self, "Thiếu thông tin", "Bệnh nhân này không có số điện thoại để tra cứu.")
@@ -217,7 +291,7 @@ class AssignedListView(QWidget):
         self.request_vncdc_search.emit(phone_number)
 
     def handle_copy_and_execute(self):
-        self.on_item_double_clicked(self.table.currentItem())
+        self.on_item_double_clicked(self.table.currentIndex())
 
     def _simplify_address(self, addr):
         if not addr: return ""
@@ -250,7 +324,9 @@ class AssignedListView(QWidget):
             QMessageBox.warning(self, "Thông báo", "Không có dữ liệu để xuất!")
             return
 
-        if not HAS_XLSXWRITER:
+        try:
+            import xlsxwriter  # chỉ cần khi xuất Excel
+        except ImportError:
             QMessageBox.critical(self, "Thiếu thư viện", 
                 "Chức năng này cần thư viện 'xlsxwriter'.\nVui lòng cài đặt bằng lệnh: pip install XlsxWriter")
             return
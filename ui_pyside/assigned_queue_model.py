@@ -0,0 +1,131 @@
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PySide6.QtGui import QColor
+
+# (Tiêu đề, key trong dict dữ liệu HIS, kiểu độ rộng, giá trị) - xem AssignedListView.apply_column_layout
+# kiểu độ rộng: 0 = cố định (0 = ẩn), 1 = ResizeToContents, 2 = Stretch
+QUEUE_COLUMNS = [
+    ("STT", "stt_kham", 0, 40),
+    ("Họ và Tên", "ten_benhnhan", 1, 0),
+    ("Chỉ định (Vắc-xin)", "chi_dinh", 2, 0),
+    ("SĐT", "dien_thoai", 0, 0),   # Hidden, kept for data retrieval
+    ("ID", "id_benhnhan", 0, 0),   # Hidden
+    ("MA", "ma_luotkham", 0, 0)    # Hidden
+]
+
+SORT_ROLE = Qt.ItemDataRole.UserRole + 1
+
+
+def queue_row_key(item):
+    """Khoá ổn định của một dòng hàng chờ: ma_luotkham (dự phòng: id_benhnhan + stt_kham)."""
+    return item.get('ma_luotkham') or f"{item.get('id_benhnhan', '')}|{item.get('stt_kham', '')}"
+
+
+def same_queue_row(old, new):
+    """So sánh 2 dòng HIS, bỏ qua cột 'chi_dinh' (được điền riêng)."""
+    keys = (set(old) | set(new)) - {'chi_dinh'}
+    return all(old.get(k) == new.get(k) for k in keys)
+
+
+class AssignedQueueModel(QAbstractTableModel):
+    """
+    Model hàng chờ tiêm chủng HIS, theo dõi dòng theo ma_luotkham.
+    apply_rows() chỉ thêm/sửa/xoá các dòng thay đổi nên vùng chọn và vị trí cuộn được giữ nguyên.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._index_by_key = {}
+
+    # --- Qt model API ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(QUEUE_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return QUEUE_COLUMNS[section][0]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        item = self._rows[index.row()]
+        key = QUEUE_COLUMNS[index.column()][1]
+        val = item.get(key, "")
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            return str(val)
+        if role == SORT_ROLE:
+            if key == "stt_kham":
+                try: return int(val or 0)
+                except (TypeError, ValueError): return 0
+            return str(val)
+        if role == Qt.ItemDataRole.TextAlignmentRole and key == "stt_kham":
+            return int(Qt.AlignmentFlag.AlignCenter)
+        if key == "chi_dinh" and val:
+            if role == Qt.ItemDataRole.ForegroundRole:
+                return QColor(Qt.GlobalColor.darkBlue)
+            if role == Qt.ItemDataRole.ToolTipRole:
+                return str(val)
+        return None
+
+    # --- Data access ---
+    def row_data(self, row):
+        return self._rows[row] if 0 <= row < len(self._rows) else None
+
+    def rows_by_key(self):
+        return {queue_row_key(item): item for item in self._rows}
+
+    def apply_rows(self, new_rows):
+        """
+        Đồng bộ model với danh sách mới theo khoá dòng. Trả về (số thêm, số sửa, số xoá).
+        """
+        new_by_key = {}
+        for item in new_rows:
+            new_by_key.setdefault(queue_row_key(item), item)
+
+        # 1. Xoá (từ cuối lên để chỉ số không bị lệch)
+        removed = 0
+        for row in range(len(self._rows) - 1, -1, -1):
+            if queue_row_key(self._rows[row]) not in new_by_key:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._rows[row]
+                self.endRemoveRows()
+                removed += 1
+        if removed:
+            self._reindex()
+
+        # 2. Sửa tại chỗ
+        updated = 0
+        last_col = len(QUEUE_COLUMNS) - 1
+        for row, item in enumerate(self._rows):
+            new_item = new_by_key[queue_row_key(item)]
+            if new_item is not item and (not same_queue_row(item, new_item) or item.get('chi_dinh') != new_item.get('chi_dinh')):
+                self._rows[row] = new_item
+                self.dataChanged.emit(self.index(row, 0), self.index(row, last_col))
+                updated += 1
+            else:
+                self._rows[row] = new_item
+
+        # 3. Thêm mới (cuối bảng; proxy sắp xếp lại theo cột đang sort)
+        added_items = [item for key, item in new_by_key.items() if key not in self._index_by_key]
+        if added_items:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(added_items) - 1)
+            self._rows.extend(added_items)
+            self.endInsertRows()
+            self._reindex()
+
+        return len(added_items), updated, removed
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self._index_by_key = {}
+        self.endResetModel()
+
+    def _reindex(self):
+        self._index_by_key = {queue_row_key(item): row for row, item in enumerate(self._rows)}
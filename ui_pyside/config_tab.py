@@ -1,7 +1,7 @@
 import qtawesome as qta
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QGroupBox, QFormLayout, 
-    QLineEdit, QPushButton, QLabel, QComboBox, QHBoxLayout, QFrame
+    QLineEdit, QPushButton, QLabel, QComboBox, QHBoxLayout, QFrame, QCheckBox
 )
 from PySide6.QtCore import Qt
 
@@ -34,8 +34,13 @@ class ConfigTab(QWidget):
         self.update_vaccine_btn.setCursor(Qt.CursorShape.PointingHandCursor)
         self.update_vaccine_btn.setFixedWidth(250)
         
+        self.prefetch_checkbox = QCheckBox("Tự động tải trước lịch sử tiêm của các đối tượng cùng SĐT")
+        self.prefetch_checkbox.setToolTip("Khi tìm thấy nhiều đối tượng, tải và phân tích sẵn lịch sử của tất cả ở nền "
+                                          "để chuyển qua lại không phải chờ (tốn thêm request lên VNCDC).")
+
         data_layout.addWidget(lbl_data)
         data_layout.addWidget(self.update_vaccine_btn)
+        data_layout.addWidget(self.prefetch_checkbox)
 
         # --- Account ---
         acc_frame = QFrame()
@@ -1,4 +1,4 @@
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QPlainTextEdit
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QPlainTextEdit, QCheckBox, QLabel, QComboBox
 
 class DebugTab(QWidget):
     def __init__(self, parent=None):
@@ -9,10 +9,21 @@ class DebugTab(QWidget):
         layout = QVBoxLayout(self)
         
         self.generate_btn = QPushButton("📊 Tạo báo cáo & Copy vào Clipboard")
+        self.profile_checkbox = QCheckBox("Đo thời gian từng quy tắc khi phân tích (profiling)")
+
+        log_level_row = QHBoxLayout()
+        self.log_level_combo = QComboBox()
+        self.log_level_combo.addItems(["DEBUG", "INFO", "WARNING", "ERROR"])
+        self.log_level_combo.setCurrentText("INFO")
+        log_level_row.addWidget(QLabel("Mức log worker:"))
+        log_level_row.addWidget(self.log_level_combo)
+        log_level_row.addStretch()
         
         self.log_viewer = QPlainTextEdit()
         self.log_viewer.setReadOnly(True)
         self.log_viewer.setStyleSheet("font-family: Consolas, Monospace; font-size: 10pt;")
         
         layout.addWidget(self.generate_btn)
+        layout.addWidget(self.profile_checkbox)
+        layout.addLayout(log_level_row)
         layout.addWidget(self.log_viewer)
\ No newline at end of file
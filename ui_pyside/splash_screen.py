@@ -250,55 +250,3 @@ class SplashScreen(QWidget):
         painter.drawRoundedRect(center_x - 11, center_y - 5, 22, 8, 2, 2)
         
         painter.restore()
-
-
-class SplashScreenManager:
-    """Manager class to handle splash screen lifecycle"""
-    
-    def __init__(self, main_window_class, controller_class):
-        self.main_window_class = main_window_class
-        self.controller_class = controller_class
-        self.splash = None
-        self.main_window = None
-        self.controller = None
-    
-    def start(self):
-        """Show splash and start loading"""
-        self.splash = SplashScreen()
-        self.splash.show()
-        self.splash.start_animation()
-        
-        # Simulate loading stages
-        QTimer.singleShot(100, lambda: self._load_stage(1))
-    
-    def _load_stage(self, stage):
-        """Handle different loading stages"""
-        if stage == 1:
-            self.splash.set_progress(20, "Đang tải giao diện...")
-            QTimer.singleShot(300, lambda: self._load_stage(2))
-        
-        elif stage == 2:
-            self.splash.set_progress(40, "Đang khởi tạo components...")
-            # Actually create main window
-            self.main_window = self.main_window_class()
-            QTimer.singleShot(200, lambda: self._load_stage(3))
-        
-        elif stage == 3:
-            self.splash.set_progress(60, "Đang kết nối services...")
-            # Create controller
-            self.controller = self.controller_class(self.main_window)
-            QTimer.singleShot(300, lambda: self._load_stage(4))
-        
-        elif stage == 4:
-            self.splash.set_progress(80, "Đang hoàn tất...")
-            QTimer.singleShot(200, lambda: self._load_stage(5))
-        
-        elif stage == 5:
-            self.splash.set_progress(100, "Sẵn sàng!")
-            QTimer.singleShot(400, self._finish)
-    
-    def _finish(self):
-        """Finish loading and show main window"""
-        self.splash.stop_animation()
-        self.splash.close()
-        self.main_window.show()
@@ -219,7 +219,7 @@ class AppTheme:
             border: 2px solid {c['input_focus']}; padding: 5px 11px;
         }}
 
-        QTableWidget, QListWidget {{
+        QTableView, QListWidget {{
             background-color: {c['bg_card']}; alternate-background-color: {c['table_row_alt']};
             border: none; gridline-color: transparent; outline: none;
         }}
@@ -228,8 +228,8 @@ class AppTheme:
             padding: 8px; border: none; border-bottom: 2px solid {c['border']};
             font-weight: 700; text-transform: uppercase; font-size: 11px;
         }}
-        QTableWidget::item {{ padding: 6px; border-bottom: 1px solid {c['border']}; }}
-        QTableWidget::item:selected, QListWidget::item:selected {{
+        QTableView::item {{ padding: 6px; border-bottom: 1px solid {c['border']}; }}
+        QTableView::item:selected, QListWidget::item:selected {{
             background-color: {c['selection_bg']}; color: {c['selection_txt']};
         }}
         
@@ -1,23 +1,40 @@
 # utils.py
 import re
+from functools import lru_cache
 from datetime import datetime, date, timedelta
 
+# Các pattern chuẩn hóa tên vắc-xin, biên dịch một lần khi import
+_MCG_ML_SUFFIX_RE = re.compile(r'\s*\d+mcg/\d+(\.\d+)?ml\s*$', flags=re.IGNORECASE) # hậu tố " 3mcg/0.5ml"
+_PARENTHESES_RE = re.compile(r'\s*\(.*?\)\s*') # text in parentheses
+_YEAR_RANGE_SUFFIX_RE = re.compile(r'\s+\d{4}/\d{4}\s*$') # year/year suffix like 2023/2024
+_YEAR_PLACEHOLDER_SUFFIX_RE = re.compile(r'\s+20XX/20XX\s*$') # 20XX/20XX suffix
+_ML_SUFFIX_RE = re.compile(r'\s+\d+(\.\d+)?ml\s*$') # dosage like 0.5ml
+
+# Số tên vắc-xin thô từ VNCDC chỉ vài trăm, cache này đủ giữ toàn bộ
+NORMALIZE_CACHE_SIZE = 2048
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize_vaccine_name_cached(name):
+    name = name.replace(',', '.') # Chuyển "0,5ml" thành "0.5ml"
+
+    # Each pattern only runs when its cheap precondition holds, so most names take
+    # one or two regex passes instead of five. Order is kept identical to the original.
+    tail = name.rstrip()
+    if tail[-2:] in ('ml', 'mL', 'Ml', 'ML') and 'mcg/' in name.lower():
+        name = _MCG_ML_SUFFIX_RE.sub('', name) # Xóa hậu tố " 3mcg/0.5ml"
+    if '(' in name:
+        name = _PARENTHESES_RE.sub('', name) # Remove text in parentheses
+    if '/' in name:
+        name = _YEAR_RANGE_SUFFIX_RE.sub('', name) # Remove year/year suffix like 2023/2024
+        name = _YEAR_PLACEHOLDER_SUFFIX_RE.sub('', name) # Remove 20XX/20XX suffix
+    if name.rstrip().endswith('ml'):
+        name = _ML_SUFFIX_RE.sub('', name) # Remove dosage like 0.5ml
+    return name.strip().lower()
+
 class VaccineAnalysisUtils:
     @staticmethod
     def normalize_vaccine_name(name):
-        name = str(name)
-        
-        # --- SỬA ĐỔI: Thêm 2 dòng để chuẩn hóa tốt hơn ---
-        name = name.replace(',', '.') # Chuyển "0,5ml" thành "0.5ml"
-        name = re.sub(r'\s*\d+mcg/\d+(\.\d+)?ml\s*$', '', name, flags=re.IGNORECASE) # Xóa hậu tố " 3mcg/0.5ml"
-        # --- KẾT THÚC SỬA ĐỔI ---
-
-        name = re.sub(r'\s*\(.*?\)\s*', '', name) # Remove text in parentheses
-        name = re.sub(r'\s+\d{4}/\d{4}\s*$', '', name) # Remove year/year suffix like 2023/2024
-        name = re.sub(r'\s+20XX/20XX\s*$', '', name) # Remove 20XX/20XX suffix
-        name = re.sub(r'\s+\d+(\.\d+)?ml\s*$', '', name) # Remove dosage like 0.5ml
-        name = name.strip().lower()
-        return name
+        return _normalize_vaccine_name_cached(str(name))
 
     @staticmethod
     def get_age_at_date(dob, target_date):
@@ -58,6 +75,11 @@ class VaccineAnalysisUtils:
             # Fallback to today if current_date_str is invalid or not provided properly
             current_dt = date.today()
 
+        return VaccineAnalysisUtils.get_age_string_at(dob, current_dt)
+
+    @staticmethod
+    def get_age_string_at(dob, current_dt):
+        """Như get_age_string nhưng nhận date đã parse."""
         if dob > current_dt:
             return "Ngày sinh trong tương lai"
 
@@ -95,9 +117,13 @@ class VaccineAnalysisUtils:
             # For RULE_TYPE_MMR_EQUIVALENT_GROUP
             if "raw_names_members" in new_details:
                 all_member_names_norm = []
+                names_norm_members = {}
                 for member_key, raw_names_list in new_details["raw_names_members"].items():
-                    all_member_names_norm.extend([normalizer(n) for n in raw_names_list])
+                    member_names_norm = [normalizer(n) for n in raw_names_list]
+                    names_norm_members[member_key] = list(set(member_names_norm))
+                    all_member_names_norm.extend(member_names_norm)
                 new_details["names_norm_group"] = list(set(all_member_names_norm))
+                new_details["names_norm_members"] = names_norm_members
             
             # For groups with alternative courses (Rota, Pneumo, HepA)
             if "courses" in new_details and isinstance(new_details["courses"], list):
@@ -0,0 +1,53 @@
+# vaccine_record.py
+"""
+Bản ghi một mũi tiêm đã parse sẵn, dùng chung cho worker (lịch sử VNCDC), HTMLVaccineParser và AnalysisService.
+Worker tạo VaccineRecord ngay khi đọc bảng tblVacxin và gửi nguyên qua kênh message,
+nên tiến trình GUI không phải strptime/int()/chuẩn hoá tên lại cho từng dòng.
+"""
+from datetime import datetime, date
+from typing import NamedTuple
+
+from utils import VaccineAnalysisUtils
+
+
+class VaccineRecord(NamedTuple):
+    name: str          # tên gốc trên VNCDC
+    norm_name: str     # VaccineAnalysisUtils.normalize_vaccine_name(name)
+    dose: int          # số mũi (0 nếu không phải số)
+    date: date
+    dose_text: str     # chuỗi gốc để hiển thị
+    date_text: str
+
+    @classmethod
+    def parse(cls, name, dose_text, date_text):
+        """Tạo bản ghi từ chuỗi trong bảng; None nếu thiếu tên/ngày hoặc ngày không hợp lệ."""
+        if not name or not date_text:
+            return None
+        try:
+            date_obj = datetime.strptime(date_text.replace(" ", ""), "%d/%m/%Y").date()
+        except ValueError:
+            return None
+        try:
+            dose_int = int(dose_text)
+        except ValueError:
+            dose_int = 0
+        return cls(name, VaccineAnalysisUtils.normalize_vaccine_name(name), dose_int, date_obj, dose_text, date_text)
+
+    @classmethod
+    def from_dict(cls, record):
+        """Dict kiểu cũ {"vaccine_name", "dose", "date"} (utils.extract_vaccine_info, batch/benchmark)."""
+        return cls.parse(record.get("vaccine_name", ""), record.get("dose", ""), record.get("date", ""))
+
+    def administered_tuple(self):
+        """Tuple trong administered_map của bộ máy quy tắc: (mũi, ngày, tên gốc, mũi gốc, ngày gốc)."""
+        return (self.dose, self.date, self.name, self.dose_text, self.date_text)
+
+
+def ensure_records(raw_vaccine_list):
+    """Chuyển danh sách hỗn hợp VaccineRecord/dict thành VaccineRecord (bỏ dòng không hợp lệ)."""
+    records = []
+    for item in raw_vaccine_list:
+        record = item if isinstance(item, VaccineRecord) else VaccineRecord.from_dict(item)
+        if record is not None:
+            records.append(record)
+    return records